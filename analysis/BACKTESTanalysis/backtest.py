@@ -0,0 +1,367 @@
+import numpy as np
+import pandas as pd
+import analysis.LEVELanalysis.averges as avg
+import analysis.LEVELanalysis.level as level
+import analysis.HISAnalysis.rollingRank as rollingRank
+import tools.panelTools as PT
+
+# 交易成本（比例）：佣金双边收取，印花税仅卖出收取
+DEFAULT_COSTS = {
+    'commission': 0.00025,
+    'stamp_tax': 0.0005,
+    'slippage': 0.0
+}
+
+# 每年交易日数
+TRADING_DAYS = 250
+
+
+def price_limit_ratio(stock_code):
+    """
+    按股票代码判断涨跌停幅度：创业板(300/301)、科创板(688/689)为20%，北交所为30%，其余为10%
+    （ST股票的5%限制无法从代码判断，按10%处理）
+    """
+    code = str(stock_code)
+    if code.startswith(('300', '301', '688', '689')):
+        return 0.20
+    if code.startswith(('4', '8', '920')):
+        return 0.30
+    return 0.10
+
+
+def prepare_market(stock_data_dict):
+    """
+    把多只股票的数据整理为回测使用的宽表数组（行为日期，列为股票）
+
+    参数:
+    stock_data_dict: {股票代码: 股票DataFrame}，或build_panel生成的面板数据
+
+    返回:
+    dict: 日期、股票代码、开盘、收盘（停牌为NaN）、涨跌停幅度
+    """
+    panel = stock_data_dict if isinstance(stock_data_dict, pd.DataFrame) else PT.build_panel(stock_data_dict)
+    panel = panel.assign(日期=pd.to_datetime(panel['日期']))
+    open_wide = PT.to_wide(panel, '开盘')
+    close_wide = PT.to_wide(panel, '收盘').reindex(index=open_wide.index, columns=open_wide.columns)
+    symbols = list(open_wide.columns)
+    return {
+        '日期': open_wide.index,
+        '股票代码': symbols,
+        '开盘': open_wide.to_numpy(dtype=float),
+        '收盘': close_wide.to_numpy(dtype=float),
+        '涨跌停幅度': np.array([price_limit_ratio(code) for code in symbols])
+    }
+
+
+def align_signal(market, signal_dict):
+    """
+    把按股票计算的信号序列对齐为宽表数组
+
+    参数:
+    market: prepare_market的返回值
+    signal_dict: {股票代码: 与该股票数据逐行对应、带日期的Series或(日期, 数值)的DataFrame}
+
+    返回:
+    ndarray: 形状(日期数, 股票数)，缺失为NaN（布尔信号缺失视为False）
+    """
+    columns = {}
+    for code in market['股票代码']:
+        series = signal_dict.get(code)
+        if series is None:
+            continue
+        columns[code] = series
+    frame = pd.DataFrame(columns).reindex(index=market['日期'], columns=market['股票代码'])
+    return frame.to_numpy(dtype=float)
+
+
+def _forward_fill(values):
+    """按列向前填充（停牌日沿用最近收盘价计算市值）"""
+    frame = pd.DataFrame(values)
+    return frame.ffill().to_numpy()
+
+
+def run_backtest(market, entries, exits, execution='open', costs=None, stop_loss=None, max_hold_days=None):
+    """
+    向量化回测：逐个交易日推进，每一步同时处理所有参数组和所有股票
+
+    规则：
+    - execution='open'时用前一日收盘后的信号在当日开盘价成交，'close'时用当日信号在当日收盘价成交
+    - T+1：每个仓位每天最多一次操作，先卖后买，当天买入的仓位最早下一交易日卖出
+    - 涨跌停：成交价达到涨停价时不能买入，达到跌停价时不能卖出（卖出信号保留到下一交易日继续尝试）
+    - 停牌（价格为空）时不能交易，持仓按最近收盘价计值
+    - 每只股票为独立的等额资金仓位，组合收益为所有股票仓位收益的平均（空仓部分收益为0）
+
+    参数:
+    market: prepare_market的返回值
+    entries: 买入条件，形状(日期数, 股票数)或(参数组数, 日期数, 股票数)的布尔数组
+    exits: 卖出条件，形状同entries
+    execution: 'open'或'close'
+    costs: 交易成本，覆盖DEFAULT_COSTS中的对应项
+    stop_loss: 止损比例（如0.08），可为每个参数组一个值的数组
+    max_hold_days: 最长持仓交易日数，可为每个参数组一个值的数组
+
+    返回:
+    dict: '组合净值'(日期×参数组)、'统计'(每个参数组一行)、'个股统计'(参数组×股票)
+    """
+    costs = dict(DEFAULT_COSTS, **(costs or {}))
+    buy_cost = costs['commission'] + costs['slippage']
+    sell_cost = costs['commission'] + costs['stamp_tax'] + costs['slippage']
+
+    open_price, close_price = market['开盘'], market['收盘']
+    n_days, n_symbols = close_price.shape
+    entries = _as_3d(entries, n_days, n_symbols)
+    exits = _as_3d(exits, n_days, n_symbols)
+    n_params = max(entries.shape[0], exits.shape[0])
+    shape = (n_params, n_symbols)
+
+    stop_loss = _per_param(stop_loss, n_params)
+    max_hold_days = _per_param(max_hold_days, n_params)
+
+    trade_price = open_price if execution == 'open' else close_price
+    marked_close = _forward_fill(close_price)
+    previous_close = np.vstack([np.full((1, n_symbols), np.nan), marked_close[:-1]])
+    limit = market['涨跌停幅度']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        price_change = trade_price / previous_close - 1
+    # 复权价格无法精确还原涨跌停价，留出0.2%的容差
+    limit_up = price_change >= limit - 0.002
+    limit_down = price_change <= -limit + 0.002
+
+    # 状态：是否持仓、成本价、买入日、是否有待执行的卖出
+    holding = np.zeros(shape, dtype=bool)
+    entry_price = np.full(shape, np.nan)
+    entry_day = np.zeros(shape, dtype=int)
+    pending_exit = np.zeros(shape, dtype=bool)
+
+    # 统计
+    equity = np.ones(shape)
+    peak = np.ones(shape)
+    max_drawdown = np.zeros(shape)
+    trade_count = np.zeros(shape, dtype=int)
+    win_count = np.zeros(shape, dtype=int)
+    hold_days_total = np.zeros(shape)
+    portfolio_returns = np.zeros((n_days, n_params))
+
+    for t in range(n_days):
+        signal_day = t - 1 if execution == 'open' else t
+        price = trade_price[t]
+        tradable = ~np.isnan(price)
+        daily_return = np.zeros(shape)
+
+        # 卖出：卖出条件、止损、持仓到期，或之前因跌停未能卖出
+        if signal_day >= 0:
+            want_exit = holding & (exits[:, signal_day] | pending_exit)
+            if stop_loss is not None:
+                with np.errstate(invalid='ignore'):
+                    want_exit |= holding & (marked_close[signal_day] <= entry_price * (1 - stop_loss[:, None]))
+            if max_hold_days is not None:
+                want_exit |= holding & (t - entry_day >= max_hold_days[:, None])
+        else:
+            want_exit = np.zeros(shape, dtype=bool)
+        sell = want_exit & tradable & ~limit_down[t] & (t > entry_day)
+        pending_exit = want_exit & ~sell
+
+        # 持有到收盘的仓位按收盘价计值
+        stay = holding & ~sell
+        with np.errstate(invalid='ignore', divide='ignore'):
+            close_return = marked_close[t] / previous_close[t] - 1
+        daily_return = np.where(stay & (t > entry_day), np.nan_to_num(close_return), daily_return)
+
+        if sell.any():
+            sell_price = np.broadcast_to(price, shape)[sell]
+            daily_return[sell] = sell_price * (1 - sell_cost) / np.broadcast_to(previous_close[t], shape)[sell] - 1
+            trade_return = sell_price * (1 - sell_cost) / (entry_price[sell] * (1 + buy_cost)) - 1
+            trade_count[sell] += 1
+            win_count[sell] += trade_return > 0
+            hold_days_total[sell] += t - entry_day[sell]
+            holding[sell] = False
+            entry_price[sell] = np.nan
+
+        # 买入：当日未持仓也未卖出的仓位
+        if signal_day >= 0:
+            buy = ~holding & ~sell & entries[:, signal_day] & tradable & ~limit_up[t]
+        else:
+            buy = np.zeros(shape, dtype=bool)
+        if buy.any():
+            buy_price = np.broadcast_to(price, shape)[buy]
+            holding[buy] = True
+            entry_price[buy] = buy_price
+            entry_day[buy] = t
+            pending_exit[buy] = False
+            daily_return[buy] = np.broadcast_to(marked_close[t], shape)[buy] / (buy_price * (1 + buy_cost)) - 1
+
+        equity *= 1 + daily_return
+        np.maximum(peak, equity, out=peak)
+        np.maximum(max_drawdown, 1 - equity / peak, out=max_drawdown)
+        portfolio_returns[t] = daily_return.mean(axis=1)
+
+    return _summarize(market, portfolio_returns, equity, max_drawdown, trade_count, win_count, hold_days_total,
+                      holding)
+
+
+def _as_3d(signal, n_days, n_symbols):
+    signal = np.asarray(signal)
+    if signal.ndim == 2:
+        signal = signal[None]
+    if signal.shape[1:] != (n_days, n_symbols):
+        raise ValueError(f"信号形状{signal.shape}与行情({n_days}, {n_symbols})不一致")
+    # 空值视为不满足条件
+    return np.nan_to_num(signal.astype(float), nan=0.0).astype(bool)
+
+
+def _per_param(value, n_params):
+    if value is None:
+        return None
+    value = np.asarray(value, dtype=float)
+    return np.broadcast_to(value, (n_params,)) if value.ndim == 0 else value
+
+
+def _summarize(market, portfolio_returns, equity, max_drawdown, trade_count, win_count, hold_days_total, holding):
+    """整理回测统计"""
+    n_days, n_params = portfolio_returns.shape
+    curve = np.cumprod(1 + portfolio_returns, axis=0)
+    curve_peak = np.maximum.accumulate(curve, axis=0)
+    portfolio_drawdown = (1 - curve / curve_peak).max(axis=0) if n_days else np.zeros(n_params)
+    total_return = curve[-1] - 1 if n_days else np.zeros(n_params)
+    years = n_days / TRADING_DAYS
+    with np.errstate(invalid='ignore', divide='ignore'):
+        annual_return = np.where(years > 0, (1 + total_return) ** (1 / max(years, 1e-9)) - 1, np.nan)
+        std = portfolio_returns.std(axis=0)
+        sharpe = np.where(std > 0, portfolio_returns.mean(axis=0) / std * np.sqrt(TRADING_DAYS), np.nan)
+        trades = trade_count.sum(axis=1)
+        win_rate = np.where(trades > 0, win_count.sum(axis=1) / trades * 100, np.nan)
+        average_hold = np.where(trades > 0, hold_days_total.sum(axis=1) / trades, np.nan)
+
+    stats = pd.DataFrame({
+        '总收益(%)': total_return * 100,
+        '年化收益(%)': annual_return * 100,
+        '最大回撤(%)': portfolio_drawdown * 100,
+        '夏普比率': sharpe,
+        '交易次数': trades,
+        '胜率(%)': win_rate,
+        '平均持仓天数': average_hold,
+        '期末持仓数': holding.sum(axis=1)
+    })
+    stats.index.name = '参数组'
+
+    symbols = market['股票代码']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        symbol_win_rate = np.where(trade_count > 0, win_count / trade_count * 100, np.nan)
+    per_symbol = pd.DataFrame({
+        '参数组': np.repeat(np.arange(n_params), len(symbols)),
+        '股票代码': np.tile(symbols, n_params),
+        '总收益(%)': (equity - 1).ravel() * 100,
+        '最大回撤(%)': max_drawdown.ravel() * 100,
+        '交易次数': trade_count.ravel(),
+        '胜率(%)': symbol_win_rate.ravel(),
+        '期末持仓': holding.ravel()
+    })
+
+    return {
+        '组合净值': pd.DataFrame(curve, index=market['日期']),
+        '统计': stats,
+        '个股统计': per_symbol
+    }
+
+
+# ---------- 信号构建：把已有分析的逐日结果转为买卖条件 ----------
+
+def trend_signals(stock_data_dict, market):
+    """
+    趋势信号：趋势为强势上行/上行趋势时买入，下行趋势/强势下行时卖出
+
+    返回:
+    tuple: (entries, exits)，形状(日期数, 股票数)
+    """
+    labels = {}
+    for code, stock_data in stock_data_dict.items():
+        stock_data = avg.calculate_moving_averages(stock_data)
+        labels[code] = pd.Series(avg.trend_series(stock_data).to_numpy(),
+                                 index=pd.to_datetime(stock_data['日期']))
+    frame = pd.DataFrame(labels).reindex(index=market['日期'], columns=market['股票代码'])
+    entries = frame.isin(['强势上行', '上行趋势']).to_numpy()
+    exits = frame.isin(['下行趋势', '强势下行']).to_numpy()
+    return entries, exits
+
+
+def position_values(stock_data_dict, market, period_years=3):
+    """历史位置百分比宽表（0-100），用于threshold_signals"""
+    values = {}
+    for code, stock_data in stock_data_dict.items():
+        position = level.historical_position_series(stock_data, [period_years])[f'位置百分比_{period_years}年']
+        values[code] = pd.Series(position.to_numpy(), index=pd.to_datetime(stock_data['日期']))
+    return align_signal(market, values)
+
+
+def suggestion_signals(stock_data_dict, market, period_years=3, low=40, high=60):
+    """
+    综合建议信号（对应generate_investment_suggestion中不含估值的部分）：
+    处于相对低位/历史低位且趋势向上时买入，进入相对高位以上或趋势转为下行时卖出
+
+    返回:
+    tuple: (entries, exits)
+    """
+    position = position_values(stock_data_dict, market, period_years)
+    trend_up, trend_down = trend_signals(stock_data_dict, market)
+    with np.errstate(invalid='ignore'):
+        entries = (position < low) & trend_up
+        exits = (position >= high) | trend_down
+    return entries, exits
+
+
+def percentile_values(stock_data_dict, market, analysis_target='成交量', window=None):
+    """分析目标的每日历史分位宽表（0-100），口径同getHis，用于threshold_signals"""
+    values = {}
+    for code, stock_data in stock_data_dict.items():
+        frame = rollingRank.rolling_percentile_frame(stock_data, analysis_target, window, with_level=False)
+        values[code] = pd.Series(frame[f'{analysis_target}历史分位'].to_numpy(),
+                                 index=pd.to_datetime(stock_data['日期']))
+    return align_signal(market, values)
+
+
+def feature_values(stock_data_dict, market, features, directions=None, window=250):
+    """
+    多个特征（如PCA排名靠前的特征）的综合分位宽表
+
+    每个特征先计算滚动历史分位，方向为负的特征取100-分位，再取平均
+
+    参数:
+    features: 特征列名或表达式列表，如PCA.rank_features()结果中的前几名
+    directions: 与features对应的方向（1或-1），默认全为1
+    window: 滚动分位窗口
+    """
+    directions = directions or [1] * len(features)
+    values = {}
+    for code, stock_data in stock_data_dict.items():
+        frame = rollingRank.rolling_percentile_frame(stock_data, features, window, with_level=False)
+        scores = [frame[f'{feature}历史分位'] if direction >= 0 else 100 - frame[f'{feature}历史分位']
+                  for feature, direction in zip(features, directions)]
+        values[code] = pd.Series(pd.concat(scores, axis=1).mean(axis=1).to_numpy(),
+                                 index=pd.to_datetime(stock_data['日期']))
+    return align_signal(market, values)
+
+
+def threshold_signals(values, entry_below=None, exit_above=None, entry_above=None, exit_below=None):
+    """
+    阈值信号：数值低于entry_below（或高于entry_above）时买入，高于exit_above（或低于exit_below）时卖出
+
+    阈值可以是标量或一维数组（每个参数组一个值），数组时结果增加参数组维度，
+    所有参数组在一次广播比较中完成
+
+    返回:
+    tuple: (entries, exits)
+    """
+    values = np.asarray(values, dtype=float)
+
+    def compare(threshold, above):
+        if threshold is None:
+            return np.zeros(values.shape, dtype=bool)
+        threshold = np.asarray(threshold, dtype=float)
+        if threshold.ndim == 1:
+            threshold = threshold[:, None, None]
+        with np.errstate(invalid='ignore'):
+            return values > threshold if above else values < threshold
+
+    entries = compare(entry_below, False) | compare(entry_above, True)
+    exits = compare(exit_above, True) | compare(exit_below, False)
+    return entries, exits
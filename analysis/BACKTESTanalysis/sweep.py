@@ -0,0 +1,266 @@
+import itertools
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+import analysis.LEVELanalysis.maEngine as maEngine
+import analysis.HISAnalysis.rollingRank as rollingRank
+import tools.windowTools as WT
+
+# 默认参数网格，包含各模块当前写死的取值：
+# 压力位 lookback_period=60、quantile=0.8；位置分档80/60/40/20；均线偏离±5%；超量提示70%/90%
+DEFAULT_SWEEP_GRID = {
+    'lookback_period': [20, 60, 120, 250],
+    'quantile': [0.6, 0.7, 0.8, 0.9],
+    'position_years': [1, 3, 5],
+    'position_band': [10, 20, 30, 40, 60, 70, 80, 90],
+    'ma_period': [10, 20, 30],
+    'ma_distance': [2, 3, 5, 8, 10],
+    'quantity_days': [20, 60, 120],
+    'volume_alert': [60, 70, 80, 90, 95]
+}
+
+DEFAULT_FORWARD_DAYS = (5, 10, 20)
+
+
+def forward_returns(close_price, forward_days):
+    """
+    每个交易日之后N日的收益率(%)，数据不足时为NaN
+
+    返回:
+    ndarray: 形状(len(forward_days), n)
+    """
+    close_price = np.asarray(close_price, dtype=float)
+    n = len(close_price)
+    result = np.full((len(forward_days), n), np.nan)
+    for i, days in enumerate(forward_days):
+        if days < n:
+            result[i, :n - days] = (close_price[days:] / close_price[:n - days] - 1) * 100
+    return result
+
+
+def rolling_quantiles(values, window, quantiles):
+    """
+    滑动窗口分位数（与pandas quantile的线性插值口径一致）
+
+    每个窗口只排序一次，所有分位数都从同一组排序结果中按位置插值取出
+
+    返回:
+    ndarray: 形状(len(quantiles), n)，窗口未满或含空值时为NaN
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    result = np.full((len(quantiles), n), np.nan)
+    if n < window:
+        return result
+
+    sorted_windows = np.sort(sliding_window_view(values, window), axis=1)
+    has_missing = np.convolve(np.isnan(values), np.ones(window, dtype=int), mode='valid') > 0
+    for i, q in enumerate(quantiles):
+        position = q * (window - 1)
+        lower, upper = int(np.floor(position)), int(np.ceil(position))
+        value = sorted_windows[:, lower] + (sorted_windows[:, upper] - sorted_windows[:, lower]) * (position - lower)
+        value[has_missing] = np.nan
+        result[i, window - 1:] = value
+    return result
+
+
+def _event_stats(events, returns):
+    """
+    对一组事件（形状(G, n)的布尔数组）统计之后N日收益
+
+    用矩阵乘法一次完成所有网格点、所有N的汇总
+
+    返回:
+    tuple: (信号次数, 收益合计, 上涨次数)，形状均为(G, len(forward_days))
+    """
+    valid = ~np.isnan(returns)
+    events = events.astype(float)
+    counts = events @ valid.T.astype(float)
+    sums = events @ np.where(valid, returns, 0.0).T
+    wins = events @ (returns > 0).T.astype(float)
+    return counts, sums, wins
+
+
+def _family_rows(stock_code, keys, signals, events, returns):
+    """把一个规则族的事件统计整理为cube的行"""
+    counts, sums, wins = _event_stats(events, returns)
+    rows = []
+    for i, (key, signal) in enumerate(zip(keys, signals)):
+        rows.append((*key, signal, stock_code, counts[i], sums[i], wins[i]))
+    return rows
+
+
+def sweep_symbol(stock_data, grid, forward_days, stock_code=None):
+    """
+    对单只股票计算所有规则族、所有网格点的事件统计
+
+    每个规则族的中间结果只按"决定它的参数"计算一次，阈值类参数在其上广播比较：
+    - 压力位：每个回看窗口排序一次，所有分位数共用
+    - 历史位置：每个周期一次滑动最高/最低，所有分档阈值共用
+    - 均线偏离：所有均线共用一组前缀和，所有偏离阈值共用
+    - 超量提示：每个量比窗口一次滑动排名，所有提示阈值共用
+
+    返回:
+    dict: {规则族: [行元组]}
+    """
+    close_price = stock_data['收盘'].to_numpy(dtype=float)
+    returns = forward_returns(close_price, forward_days)
+    result = {}
+
+    # 压力位：收盘价达到回看窗口收盘价分位数（成交密集区上沿的无成交量口径）
+    keys, events = [], []
+    for lookback in grid['lookback_period']:
+        levels = rolling_quantiles(close_price, lookback, grid['quantile'])
+        with np.errstate(invalid='ignore'):
+            events.append(close_price[None, :] >= levels)
+        keys.extend((lookback, q) for q in grid['quantile'])
+    result['压力位'] = _family_rows(stock_code, keys, ['收盘达到压力位'] * len(keys),
+                                   np.vstack(events), returns)
+
+    # 历史位置：位置百分比高于/低于分档阈值
+    bands = np.asarray(grid['position_band'], dtype=float)
+    high = stock_data['最高'].to_numpy(dtype=float)
+    low = stock_data['最低'].to_numpy(dtype=float)
+    keys, signals, events = [], [], []
+    for years in grid['position_years']:
+        window = 250 * years
+        historical_high = WT.rolling_max(high, window)
+        historical_low = WT.rolling_min(low, window)
+        price_range = historical_high - historical_low
+        with np.errstate(divide='ignore', invalid='ignore'):
+            position = np.where(price_range > 0, (close_price - historical_low) / price_range * 100, np.nan)
+            events.append(position[None, :] >= bands[:, None])
+            events.append(position[None, :] < bands[:, None])
+        keys.extend([(years, band) for band in bands] * 2)
+        signals.extend(['高于阈值'] * len(bands) + ['低于阈值'] * len(bands))
+    result['历史位置'] = _family_rows(stock_code, keys, signals, np.vstack(events), returns)
+
+    # 均线偏离：收盘价相对均线的偏离超过±阈值
+    distances = np.asarray(grid['ma_distance'], dtype=float)
+    engine = maEngine.MovingAverageEngine([f'SMA{period}' for period in grid['ma_period']])
+    averages = engine.compute(close_price)
+    keys, signals, events = [], [], []
+    for period in grid['ma_period']:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            diff_percent = (close_price - averages[f'MA{period}']) / averages[f'MA{period}'] * 100
+            events.append(diff_percent[None, :] > distances[:, None])
+            events.append(diff_percent[None, :] <= -distances[:, None])
+        keys.extend([(period, distance) for distance in distances] * 2)
+        signals.extend(['大幅高于均线'] * len(distances) + ['大幅低于均线'] * len(distances))
+    result['均线偏离'] = _family_rows(stock_code, keys, signals, np.vstack(events), returns)
+
+    # 超量提示：成交量在近quantity_days天中的排名百分比达到阈值
+    if '成交量' in stock_data.columns:
+        alerts = np.asarray(grid['volume_alert'], dtype=float)
+        volume = stock_data['成交量'].to_numpy(dtype=float)
+        keys, events = [], []
+        for quantity_days in grid['quantity_days']:
+            rank_percentage = rollingRank.rolling_percentile_rank(volume, quantity_days)
+            # 窗口未满时不计
+            rank_percentage[:quantity_days - 1] = np.nan
+            with np.errstate(invalid='ignore'):
+                events.append(rank_percentage[None, :] >= alerts[:, None])
+            keys.extend((quantity_days, alert) for alert in alerts)
+        result['超量提示'] = _family_rows(stock_code, keys, ['超量'] * len(keys), np.vstack(events), returns)
+
+    return result
+
+
+# 各规则族的参数维度
+FAMILY_DIMENSIONS = {
+    '压力位': ['lookback_period', 'quantile'],
+    '历史位置': ['position_years', 'position_band'],
+    '均线偏离': ['ma_period', 'ma_distance'],
+    '超量提示': ['quantity_days', 'volume_alert']
+}
+
+
+def run_sweep(stock_data_dict, grid=None, forward_days=DEFAULT_FORWARD_DAYS):
+    """
+    参数扫描：在多只股票的全历史上评估各规则的参数网格
+
+    参数:
+    stock_data_dict: {股票代码: 按日期排序的股票DataFrame}
+    grid: 参数网格，覆盖DEFAULT_SWEEP_GRID中的对应项
+    forward_days: 统计信号之后收益的天数
+
+    返回:
+    dict: {规则族: 结果立方体}，结果立方体为DataFrame，
+          索引为(参数..., 信号, 股票代码)，列为每个N的信号次数、平均收益(%)、上涨比例(%)
+    """
+    grid = dict(DEFAULT_SWEEP_GRID, **(grid or {}))
+    forward_days = list(forward_days)
+    rows = {family: [] for family in FAMILY_DIMENSIONS}
+    for code, stock_data in stock_data_dict.items():
+        if stock_data is None or stock_data.empty:
+            continue
+        for family, family_rows in sweep_symbol(stock_data, grid, forward_days, code).items():
+            rows[family].extend(family_rows)
+
+    cubes = {}
+    for family, dimensions in FAMILY_DIMENSIONS.items():
+        if rows[family]:
+            cubes[family] = _build_cube(rows[family], dimensions, forward_days)
+    return cubes
+
+
+def _build_cube(rows, dimensions, forward_days):
+    names = dimensions + ['信号', '股票代码']
+    index = pd.MultiIndex.from_tuples([row[:len(names)] for row in rows], names=names)
+    counts = np.array([row[-3] for row in rows])
+    sums = np.array([row[-2] for row in rows])
+    wins = np.array([row[-1] for row in rows])
+
+    columns = {}
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for i, days in enumerate(forward_days):
+            columns[f'后{days}日信号次数'] = counts[:, i].astype(int)
+            columns[f'后{days}日平均收益(%)'] = np.where(counts[:, i] > 0, sums[:, i] / counts[:, i], np.nan)
+            columns[f'后{days}日上涨比例(%)'] = np.where(counts[:, i] > 0, wins[:, i] / counts[:, i] * 100, np.nan)
+    return pd.DataFrame(columns, index=index)
+
+
+def sensitivity(cube, by=None):
+    """
+    按参数汇总结果立方体（信号次数加权，汇总结果与把所有股票的信号合在一起统计一致）
+
+    参数:
+    cube: run_sweep返回的某个规则族的结果
+    by: 保留的索引维度，默认保留除股票代码外的全部维度
+
+    返回:
+    DataFrame: 索引为by，列同cube
+    """
+    if by is None:
+        by = [name for name in cube.index.names if name != '股票代码']
+    count_columns = [column for column in cube.columns if column.endswith('信号次数')]
+    weighted = {}
+    for count_column in count_columns:
+        prefix = count_column[:-len('信号次数')]
+        counts = cube[count_column]
+        weighted[count_column] = counts
+        for metric in ['平均收益(%)', '上涨比例(%)']:
+            weighted[prefix + metric] = cube[prefix + metric].fillna(0) * counts
+    grouped = pd.DataFrame(weighted).groupby(level=by, sort=True).sum()
+
+    result = pd.DataFrame(index=grouped.index)
+    for count_column in count_columns:
+        prefix = count_column[:-len('信号次数')]
+        counts = grouped[count_column]
+        result[count_column] = counts
+        for metric in ['平均收益(%)', '上涨比例(%)']:
+            result[prefix + metric] = grouped[prefix + metric] / counts.where(counts > 0)
+    return result[cube.columns]
+
+
+def cube_array(cube, metric):
+    """
+    把结果立方体的一个指标转为多维数组，便于切片和作图
+
+    返回:
+    tuple: (ndarray, {维度名: 坐标列表})，缺失组合为NaN
+    """
+    levels = [list(level) for level in cube.index.levels]
+    full_index = pd.MultiIndex.from_tuples(list(itertools.product(*levels)), names=cube.index.names)
+    values = cube[metric].reindex(full_index).to_numpy(dtype=float)
+    return values.reshape([len(level) for level in levels]), dict(zip(cube.index.names, levels))
@@ -0,0 +1,124 @@
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import analysis.HISAnalysis.getHis as getHis
+
+
+def cross_section_rank(values):
+    """
+    按行（每个交易日）对二维数组做截面排名
+
+    口径与历史分位一致：排名为当日小于等于该值的股票数（并列取最大排名），
+    分位 = 排名 / 当日有效股票数 * 100；每行一次argsort，整体向量化
+
+    参数:
+    values: 二维数组，行为日期，列为股票
+
+    返回:
+    tuple: (排名数组, 分位数组, 每行有效数量)，空值位置为NaN
+    """
+    values = np.asarray(values, dtype=float)
+    rows, cols = values.shape
+    ranks = np.full((rows, cols), np.nan)
+    if rows == 0 or cols == 0:
+        return ranks, ranks.copy(), np.zeros(rows, dtype=int)
+
+    order = np.argsort(values, axis=1, kind='stable')
+    sorted_values = np.take_along_axis(values, order, axis=1)
+
+    # 并列组的最后一个位置即"小于等于"的个数（空值排在最后，每个空值自成一组）
+    positions = np.broadcast_to(np.arange(1, cols + 1, dtype=float), (rows, cols))
+    group_end = np.ones((rows, cols), dtype=bool)
+    group_end[:, :-1] = sorted_values[:, :-1] != sorted_values[:, 1:]
+    end_positions = np.where(group_end, positions, np.inf)
+    sorted_ranks = np.minimum.accumulate(end_positions[:, ::-1], axis=1)[:, ::-1]
+
+    np.put_along_axis(ranks, order, sorted_ranks, axis=1)
+    valid = ~np.isnan(values)
+    ranks[~valid] = np.nan
+    counts = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        percentile = ranks / counts[:, None] * 100
+    return ranks, percentile, counts
+
+
+class CrossSectionRanker:
+    """
+    全市场（或任意股票集合）截面分位
+
+    基于build_panel生成的面板数据，对列名或四则运算表达式按日期计算截面排名。
+    结果按(分析目标, 日期)缓存，同一交易日的多次查询（如逐只股票生成报告）只计算一次
+    """
+
+    def __init__(self, panel, max_entries=1000):
+        self.panel = panel
+        self.max_entries = max_entries
+        self._wide = {}
+        self._cache = OrderedDict()
+
+    def _wide_values(self, target):
+        """分析目标的宽表（行为日期，列为股票代码）"""
+        if target not in self._wide:
+            values = getHis.evaluate_target(self.panel, target)
+            frame = pd.DataFrame({
+                '日期': pd.to_datetime(self.panel['日期']),
+                '股票代码': self.panel['股票代码'],
+                '值': values.to_numpy(dtype=float)
+            })
+            self._wide[target] = frame.pivot_table(index='日期', columns='股票代码', values='值',
+                                                   aggfunc='last', dropna=False).sort_index()
+        return self._wide[target]
+
+    def frame(self, target):
+        """
+        所有日期的截面分位
+
+        返回:
+        DataFrame: index为日期，columns为股票代码，值为全市场分位（0-100）
+        """
+        wide = self._wide_values(target)
+        _, percentile, _ = cross_section_rank(wide.to_numpy())
+        return pd.DataFrame(percentile, index=wide.index, columns=wide.columns)
+
+    def on_date(self, date, target):
+        """
+        某个交易日的截面排名
+
+        返回:
+        DataFrame: index为股票代码，列为"全市场排名"、"全市场分位"、"有效数量"；该日无数据时为空表
+        """
+        date = pd.Timestamp(date)
+        key = (target, date)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        wide = self._wide_values(target)
+        if date in wide.index:
+            row = wide.loc[[date]]
+            ranks, percentile, counts = cross_section_rank(row.to_numpy())
+            result = pd.DataFrame({'全市场排名': ranks[0], '全市场分位': percentile[0], '有效数量': counts[0]},
+                                  index=row.columns)
+        else:
+            result = pd.DataFrame(columns=['全市场排名', '全市场分位', '有效数量'])
+
+        self._cache[key] = result
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return result
+
+    def lookup(self, symbol, date, target):
+        """
+        单只股票在某日的截面排名
+
+        返回:
+        dict: {'全市场分位': 0-100的数值, '全市场排名': 排名, '全市场有效数量': 当日有效股票数}，无数据时返回None
+        """
+        table = self.on_date(date, target)
+        if symbol not in table.index or np.isnan(table.at[symbol, '全市场分位']):
+            return None
+        return {
+            '全市场分位': float(table.at[symbol, '全市场分位']),
+            '全市场排名': int(table.at[symbol, '全市场排名']),
+            '全市场有效数量': int(table.at[symbol, '有效数量'])
+        }
@@ -1,12 +1,29 @@
+import ast
+import functools
+import re
 import numpy as np
 import analysis.PCAanalysis.directParams as DP
+import analysis.LEVELanalysis.indicators as indicators
 import pandas as pd
 
 
-def getHisAnalysis(history_data, quantity_data, analysis_target):
+def getHisAnalysis(history_data, quantity_data, analysis_target, symbol=None, cache=None, sketches=None,
+                   cross_section=None):
     """
     历史分位分析函数 - 支持analysis_target为列表，保持原始顺序
+
+    所有分析目标先计算为一个二维数组（每列一个目标），历史分位、近期排名和近期统计
+    按列在单次NumPy调用中完成，分析多个目标的耗时与单个目标接近
+
+    symbol/cache: 同时提供时使用有序索引缓存（见sortedCache.SortedIndexCache）回答分位和排名查询，
+    同一股票重复分析或窗口滑动时无需重新扫描和排序
+    sketches: {分析目标: KLLSketch}，提供时该目标的历史分位改用近似草图计算（见quantileSketch），
+    不再需要历史原始数据，误差界见KLLSketch说明
+    cross_section: crossSection.CrossSectionRanker，与symbol同时提供时增加当日的全市场分位和全市场排名
     """
+    sketches = sketches or {}
+    if symbol is None:
+        cache = None
     results = {}
 
     # 确保analysis_target是列表格式
@@ -16,27 +33,35 @@ def getHisAnalysis(history_data, quantity_data, analysis_target):
     # 获取所有可用列名
     available_columns = list(history_data.columns)
 
+    # 逐个目标计算数值序列（表达式只求值一次），失败的目标记录错误信息
+    prepared = []
     for target in analysis_target:
-        target_results = {}
-
         try:
-            # 检查是否为复合表达式（包含运算符）
-            if any(op in target for op in ['+', '-', '*', '/']):
-                # 处理复合表达式
-                target_results = _process_compound_expression(history_data, quantity_data, target, available_columns)
-            else:
-                # 处理简单列名
-                target_results = _process_simple_column(history_data, quantity_data, target, available_columns)
-
+            history_values, quantity_values, used_columns = _evaluate_pair(
+                history_data, quantity_data, target, available_columns)
+            prepared.append((target, history_values, quantity_values, used_columns))
+            # 占位，确保结果顺序与输入一致
+            results[target] = None
         except Exception as e:
-            target_results = {
-                '分析目标': target,
-                '错误信息': f"处理失败: {str(e)}",
-                '可用列名': available_columns
-            }
-
-        # 使用原始目标名称作为键，确保与输入顺序一致
-        results[target] = target_results
+            results[target] = _error_result(target, e, available_columns)
+
+    if prepared:
+        history_matrix = np.column_stack([item[1] for item in prepared])
+        quantity_matrix = np.column_stack([item[2] for item in prepared])
+        batch = _batch_metrics(history_matrix, quantity_matrix)
+
+        for j, (target, history_values, quantity_values, used_columns) in enumerate(prepared):
+            try:
+                target_results = _build_result(history_data, quantity_data, target, j, batch, history_values,
+                                               quantity_values, used_columns, symbol, cache, sketches.get(target))
+            except Exception as e:
+                target_results = _error_result(target, e, available_columns)
+
+            if cross_section is not None and symbol is not None and '错误信息' not in target_results:
+                market = _market_percentile(quantity_data, target, symbol, cross_section)
+                if market is not None:
+                    target_results.update(market)
+            results[target] = target_results
 
     # 添加总体信息
     results['总体信息'] = {
@@ -50,138 +75,373 @@ def getHisAnalysis(history_data, quantity_data, analysis_target):
     return results
 
 
-def _process_simple_column(history_data, quantity_data, column_name, available_columns):
-    """处理简单列名分析"""
-    if column_name not in available_columns:
-        raise KeyError(f"列名 '{column_name}' 不存在。可用列名: {available_columns}")
+def _error_result(target, error, available_columns):
+    return {
+        '分析目标': target,
+        '错误信息': f"处理失败: {str(error)}",
+        '可用列名': available_columns
+    }
 
-    result = {'分析目标': column_name}
 
-    # 获取当前值
-    current_value = quantity_data[column_name].iloc[-1]
+def _is_expression(target):
+    return any(op in target for op in ['+', '-', '*', '/'])
 
-    # 历史分位分析
-    history_values = history_data[column_name].dropna()
-    if len(history_values) == 0:
-        raise ValueError(f"列 '{column_name}' 的历史数据为空")
 
-    percentile_rank = np.sum(history_values <= current_value) / len(history_values) * 100
+def _evaluate_pair(history_data, quantity_data, target, available_columns):
+    """
+    计算分析目标在历史数据和近期数据上的数值
 
-    # 填充结果
-    result.update(_calculate_basic_metrics(current_value, percentile_rank))
-    result.update(_calculate_recent_metrics(quantity_data, column_name, current_value))
-    result['数据信息'] = {
-        '历史数据量': len(history_values),
-        '近期数据量': len(quantity_data[column_name].dropna())
-    }
+    返回:
+    tuple: (历史数值数组, 近期数值数组, 表达式使用的列名)，简单列名时使用列名为None
+    """
+    if not _is_expression(target):
+        if target in available_columns:
+            return (history_data[target].to_numpy(dtype=float), quantity_data[target].to_numpy(dtype=float), None)
+        if not indicators.is_indicator(target):
+            raise KeyError(f"列名 '{target}' 不存在。可用列名: {available_columns}")
+        history_values = evaluate_target(history_data, target).to_numpy(dtype=float)
+        return history_values, _align_recent(history_data, quantity_data, history_values, target), None
+
+    # 解析表达式中的列名和技术指标名（语法不允许时直接报错）
+    _, names, _ = _parse_expression(target)
+    valid_columns = [name for name in names if name in available_columns]
+    indicator_names = [name for name in names if name not in available_columns and indicators.is_indicator(name)]
+    if len(valid_columns) + len(indicator_names) < 2:
+        raise ValueError(f"表达式中需要至少两个有效列名，找到的列: {valid_columns}。可用列名: {available_columns}")
 
-    return result
+    try:
+        history_values = _evaluate_expression(history_data, target)
+        if indicator_names:
+            quantity_values = _align_recent(history_data, quantity_data, history_values, target)
+        else:
+            quantity_values = _evaluate_expression(quantity_data, target)
+    except Exception as e:
+        raise ValueError(f"计算表达式 '{target}' 处理失败: {str(e)}")
+    return history_values, quantity_values, valid_columns + indicator_names
 
 
-def _process_compound_expression(history_data, quantity_data, expression, available_columns):
-    """处理复合表达式分析"""
-    # 解析表达式中的列名
-    import re
-    potential_columns = re.findall(r'[\u4e00-\u9fa5]+', expression)
+def _align_recent(history_data, quantity_data, history_values, target):
+    """
+    技术指标需要足够的历史数据预热，近期数据的指标值按日期从历史数据的计算结果中取，
+    缺少日期列时直接在近期数据上计算
+    """
+    if '日期' in history_data.columns and '日期' in quantity_data.columns:
+        by_date = pd.Series(history_values, index=pd.to_datetime(history_data['日期']).to_numpy())
+        by_date = by_date[~by_date.index.duplicated(keep='last')]
+        return by_date.reindex(pd.to_datetime(quantity_data['日期']).to_numpy()).to_numpy(dtype=float)
+    return evaluate_target(quantity_data, target).to_numpy(dtype=float)
 
-    # 验证列名是否存在
-    valid_columns = []
-    for col in potential_columns:
-        if col in available_columns:
-            valid_columns.append(col)
 
-    if len(valid_columns) < 2:
-        raise ValueError(f"表达式中需要至少两个有效列名，找到的列: {valid_columns}。可用列名: {available_columns}")
+class _ColumnNamespace(dict):
+    """表达式求值的变量表：按需把列转为NumPy数组"""
+
+    def __init__(self, data):
+        super().__init__()
+        self.data = data
+
+    def __missing__(self, name):
+        if name in self.data.columns:
+            values = self.data[name].to_numpy(dtype=float)
+        elif indicators.is_indicator(name):
+            values = indicators.indicator_series(self.data, name).to_numpy(dtype=float)
+        else:
+            raise KeyError(name)
+        self[name] = values
+        return values
+
+
+# 表达式允许的运算
+_BINARY_OPERATORS = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.true_divide,
+                     ast.Pow: np.power}
+_UNARY_OPERATORS = {ast.UAdd: np.positive, ast.USub: np.negative}
 
-    result = {'分析目标': expression}
+
+@functools.lru_cache(maxsize=256)
+def _parse_expression(expression):
+    """
+    把四则运算表达式解析为语法树，只允许数字、变量名和+ - * / **，其他语法（函数调用、属性、下标等）一律拒绝。
+    不是合法标识符的列名可以用反引号括起，如`ATR占收盘价(%)`/成交量
+
+    返回:
+    tuple: (语法树, 表达式中的变量名, {占位名: 反引号内的列名})
+    """
+    quoted = {}
+
+    def placeholder(match):
+        name = f"_quoted_{len(quoted)}"
+        quoted[name] = match.group(1)
+        return name
 
     try:
-        # 为历史数据和近期数据计算表达式结果
-        history_data_copy = history_data.copy()
-        quantity_data_copy = quantity_data.copy()
+        tree = ast.parse(re.sub(r'`([^`]+)`', placeholder, expression).strip(), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"表达式语法错误: {e.msg}")
+
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            names.append(quoted.get(node.id, node.id))
+        elif isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ValueError(f"表达式中只允许数字常量: {node.value!r}")
+        elif isinstance(node, ast.BinOp):
+            if type(node.op) not in _BINARY_OPERATORS:
+                raise ValueError(f"表达式中不支持的运算: {type(node.op).__name__}")
+        elif isinstance(node, ast.UnaryOp):
+            if type(node.op) not in _UNARY_OPERATORS:
+                raise ValueError(f"表达式中不支持的运算: {type(node.op).__name__}")
+        elif not isinstance(node, (ast.Expression, ast.Load, ast.operator, ast.unaryop)):
+            raise ValueError(f"表达式中不允许{type(node).__name__}")
+    return tree, tuple(dict.fromkeys(names)), quoted
+
+
+def validate_target(target, columns):
+    """
+    检查分析目标只引用已有的列名或技术指标名（外部输入的分析目标在计算前调用）
 
-        # 安全地执行表达式
-        history_data_copy['复合指标'] = history_data_copy.eval(expression, engine='python')
-        quantity_data_copy['复合指标'] = quantity_data_copy.eval(expression, engine='python')
+    参数:
+    target: 列名、技术指标名或四则运算表达式
+    columns: 可用的列名
 
-        # 获取当前值
-        current_value = quantity_data_copy['复合指标'].iloc[-1]
+    异常:
+    ValueError: 引用了未知名称或表达式包含不允许的语法
+    """
+    if not isinstance(target, str) or not target.strip():
+        raise ValueError(f"分析目标必须是非空字符串: {target!r}")
+    if target in columns or indicators.is_indicator(target):
+        return
+    _, names, _ = _parse_expression(target)
+    unknown = [name for name in names if name not in columns and not indicators.is_indicator(name)]
+    if unknown:
+        raise ValueError(f"表达式中的名称不是列名或技术指标: {unknown}")
+
+
+def _evaluate_expression(data, expression):
+    """在NumPy数组上计算四则运算表达式，变量只能是data中的列或技术指标（见_parse_expression）"""
+    tree, names, quoted = _parse_expression(expression)
+    namespace = _ColumnNamespace(data)
+    unknown = [name for name in names if name not in data.columns and not indicators.is_indicator(name)]
+    if unknown:
+        raise KeyError(f"表达式中的名称不是列名或技术指标: {unknown}")
+
+    def evaluate(node):
+        if isinstance(node, ast.Expression):
+            return evaluate(node.body)
+        if isinstance(node, ast.Constant):
+            return float(node.value)
+        if isinstance(node, ast.Name):
+            return namespace[quoted.get(node.id, node.id)]
+        if isinstance(node, ast.BinOp):
+            return _BINARY_OPERATORS[type(node.op)](evaluate(node.left), evaluate(node.right))
+        return _UNARY_OPERATORS[type(node.op)](evaluate(node.operand))
+
+    with np.errstate(all='ignore'):
+        values = evaluate(tree)
+    return np.broadcast_to(np.asarray(values, dtype=float), len(data)).copy()
+
+
+def _batch_metrics(history_matrix, quantity_matrix):
+    """
+    按列计算所有分析目标的历史分位、近期排名和近期统计
 
-        # 历史分位分析
-        history_values = history_data_copy['复合指标'].dropna()
-        if len(history_values) == 0:
-            raise ValueError(f"复合表达式 '{expression}' 的历史数据为空")
+    参数:
+    history_matrix: 历史数据矩阵（行为日期，列为分析目标）
+    quantity_matrix: 近期数据矩阵
 
-        percentile_rank = np.sum(history_values <= current_value) / len(history_values) * 100
+    返回:
+    dict: 每项为长度等于目标数量的数组
+    """
+    current = quantity_matrix[-1, :] if len(quantity_matrix) else np.full(quantity_matrix.shape[1], np.nan)
+    history_count = np.count_nonzero(~np.isnan(history_matrix), axis=0)
+    recent_count = np.count_nonzero(~np.isnan(quantity_matrix), axis=0)
 
-        # 填充结果
-        result.update(_calculate_basic_metrics(current_value, percentile_rank))
-        result.update(_calculate_recent_metrics(quantity_data_copy, '复合指标', current_value))
-        result['数据信息'] = {
-            '历史数据量': len(history_values),
-            '近期数据量': len(quantity_data_copy['复合指标'].dropna()),
-            '使用列名': valid_columns
-        }
+    # 空值比较结果为False，与剔除空值后计数一致
+    history_le = np.count_nonzero(history_matrix <= current, axis=0)
+    recent_le = np.count_nonzero(quantity_matrix <= current, axis=0)
+    # 当前值为空时有序查找会排在最后（与np.searchsorted一致）
+    recent_rank = np.where(np.isnan(current), recent_count, recent_le)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        percentile = history_le / history_count * 100
+
+    metrics = {
+        '当前值': current,
+        '历史数据量': history_count,
+        '历史分位': percentile,
+        '近期数据量': recent_count,
+        '近期排名': recent_rank
+    }
+
+    has_recent = recent_count > 0
+    stats = {name: np.full(len(current), np.nan) for name in ['平均值', '中位数', '最大值', '最小值', '标准差']}
+    if has_recent.any():
+        values = quantity_matrix[:, has_recent]
+        stats['平均值'][has_recent] = np.nanmean(values, axis=0)
+        stats['中位数'][has_recent] = np.nanmedian(values, axis=0)
+        stats['最大值'][has_recent] = np.nanmax(values, axis=0)
+        stats['最小值'][has_recent] = np.nanmin(values, axis=0)
+        stats['标准差'][has_recent] = np.nanstd(values, axis=0)
+    metrics['近期统计'] = stats
+    return metrics
 
-    except Exception as e:
-        raise ValueError(f"计算表达式 '{expression}' 处理失败: {str(e)}")
+
+def _build_result(history_data, quantity_data, target, j, batch, history_values, quantity_values, used_columns,
+                  symbol=None, cache=None, sketch=None):
+    """把批量计算结果的第j列整理为单个分析目标的结果字典"""
+    current_value = batch['当前值'][j]
+    history_count = int(batch['历史数据量'][j])
+    percentile_rank = batch['历史分位'][j]
+    recent_count = int(batch['近期数据量'][j])
+    rank = int(batch['近期排名'][j])
+
+    # 使用草图或有序缓存时，分位和排名由对应结构回答
+    if sketch is not None or cache is not None:
+        history_count, percentile_rank, recent_window = _history_percentile(
+            history_data, quantity_data, history_values, quantity_values, target, current_value,
+            symbol, cache, sketch)
+        if recent_window is not None:
+            rank = recent_window.count_less_equal(current_value)
+
+    if history_count == 0:
+        if used_columns is None:
+            raise ValueError(f"列 '{target}' 的历史数据为空")
+        raise ValueError(f"计算表达式 '{target}' 处理失败: 复合表达式 '{target}' 的历史数据为空")
+
+    result = {'分析目标': target}
+    result.update(_calculate_basic_metrics(current_value, percentile_rank))
+    if recent_count > 0:
+        stats = {name: float(values[j]) for name, values in batch['近期统计'].items()}
+        result.update(_format_recent_metrics(rank, recent_count, stats))
+    result['数据信息'] = {
+        '历史数据量': history_count,
+        '近期数据量': recent_count
+    }
+    if used_columns is not None:
+        result['数据信息']['使用列名'] = used_columns
+    if sketch is not None:
+        result['数据信息']['分位误差'] = sketch.rank_error * 100
 
     return result
 
 
+def _market_percentile(quantity_data, target, symbol, cross_section):
+    """当前值所在交易日的全市场分位，缺少日期或当日无截面数据时返回None"""
+    if '日期' not in quantity_data.columns or quantity_data.empty:
+        return None
+    try:
+        return cross_section.lookup(symbol, quantity_data['日期'].iloc[-1], target)
+    except Exception as e:
+        print(f"计算全市场分位失败: {e}")
+        return None
+
+
+def _history_percentile(history_data, quantity_data, history_series, quantity_series, target, current_value,
+                        symbol=None, cache=None, sketch=None):
+    """
+    计算当前值的历史分位
+
+    返回:
+    tuple: (历史有效数据量, 历史分位, 近期有序窗口)，未使用缓存时近期有序窗口为None
+    """
+    if sketch is not None:
+        return sketch.n, sketch.rank(current_value) * 100, None
+
+    if cache is None:
+        history_values = history_series.dropna()
+        if len(history_values) == 0:
+            return 0, np.nan, None
+        percentile_rank = np.sum(history_values <= current_value) / len(history_values) * 100
+        return len(history_values), percentile_rank, None
+
+    history_window = cache.get_window(symbol, target, 'history', history_series, _window_dates(history_data))
+    recent_window = cache.get_window(symbol, target, 'quantity', quantity_series, _window_dates(quantity_data))
+    return len(history_window), history_window.percentile(current_value), recent_window
+
+
+def _window_dates(data):
+    """有序缓存使用的日期键，没有日期列时使用行索引"""
+    return data['日期'] if '日期' in data.columns else data.index
+
+
 def _calculate_basic_metrics(current_value, percentile_rank):
-    """计算基本指标"""
+    """计算基本指标（百分比均为0-100的数值）"""
     metrics = {
         '当前值': float(current_value),
-        '历史分位': f"{percentile_rank:.2f}%",
-        '高于历史比例': f"{percentile_rank:.2f}%",
-        '低于历史比例': f"{(100 - percentile_rank):.2f}%"
+        '历史分位': float(percentile_rank),
+        '高于历史比例': float(percentile_rank),
+        '低于历史比例': float(100 - percentile_rank)
     }
 
     # 判断历史水平
-    if percentile_rank >= 90:
-        metrics['历史水平'] = "极高水平(前10%)"
-    elif percentile_rank >= 70:
-        metrics['历史水平'] = "高水平(前30%)"
-    elif percentile_rank >= 30:
-        metrics['历史水平'] = "中等水平"
-    elif percentile_rank >= 10:
-        metrics['历史水平'] = "低水平(后30%)"
-    else:
-        metrics['历史水平'] = "极低水平(后10%)"
+    metrics['历史水平'] = classify_history_level(percentile_rank).item()
 
     return metrics
 
 
-def _calculate_recent_metrics(quantity_data, column_name, current_value):
-    """计算近期指标"""
-    metrics = {}
+def classify_history_level(percentile_rank):
+    """
+    根据历史分位（0-100）逐元素判断历史水平，返回标签数组
+    空值返回"数据不足"
+    """
+    percentile_rank = np.asarray(percentile_rank, dtype=float)
+    return np.select(
+        [np.isnan(percentile_rank), percentile_rank >= 90, percentile_rank >= 70, percentile_rank >= 30,
+         percentile_rank >= 10],
+        ["数据不足", "极高水平(前10%)", "高水平(前30%)", "中等水平", "低水平(后30%)"],
+        default="极低水平(后10%)"
+    )
 
-    quantity_values = quantity_data[column_name].dropna()
-    if len(quantity_values) > 0:
-        # 计算排名
-        sorted_values = np.sort(quantity_values)
-        rank = np.searchsorted(sorted_values, current_value, side='right')
-        rank_percentage = (rank / len(quantity_values)) * 100
 
-        metrics['近期排名'] = f"{rank}/{len(quantity_values)}"
-        metrics['排名百分比'] = f"{rank_percentage:.2f}%"
+def evaluate_target(data, target):
+    """
+    计算分析目标的数值序列
 
-        # 超量提示
-        if rank_percentage >= 70:
-            metrics['超量提示'] = "⚠️ 超量：处于近期前30%"
-            metrics['超量等级'] = "高风险" if rank_percentage >= 90 else "中等风险"
-        else:
-            metrics['超量提示'] = "正常范围"
-            metrics['超量等级'] = "低风险"
-
-        # 统计信息
-        metrics['近期统计'] = {
-            '平均值': float(np.mean(quantity_values)),
-            '中位数': float(np.median(quantity_values)),
-            '最大值': float(np.max(quantity_values)),
-            '最小值': float(np.min(quantity_values)),
-            '标准差': float(np.std(quantity_values))
-        }
-
-    return metrics
\ No newline at end of file
+    参数:
+    data: 股票DataFrame
+    target: 列名、技术指标名（如"RSI14"，见indicators.INDICATOR_PATTERN）或四则运算表达式（如"涨跌幅/成交量"）
+
+    返回:
+    Series: 与data索引一致的数值序列
+    """
+    if _is_expression(target):
+        return pd.Series(_evaluate_expression(data, target), index=data.index)
+    if target not in data.columns:
+        if indicators.is_indicator(target):
+            return indicators.indicator_series(data, target)
+        raise KeyError(f"列名 '{target}' 不存在。可用列名: {list(data.columns)}")
+    return data[target]
+
+
+def _format_recent_metrics(rank, recent_count, stats):
+    """
+    整理近期指标
+    rank: 当前值在近期数据中的排名（小于等于当前值的个数）
+    recent_count: 近期有效数据量
+    stats: 近期统计 {平均值, 中位数, 最大值, 最小值, 标准差}
+    """
+    rank_percentage = (rank / recent_count) * 100
+
+    metrics = {
+        '近期排名': int(rank),
+        '排名百分比': float(rank_percentage)
+    }
+
+    # 超量提示
+    metrics['超量提示'], metrics['超量等级'] = volume_alert(rank_percentage)
+
+    # 统计信息
+    metrics['近期统计'] = stats
+
+    return metrics
+
+
+def volume_alert(rank_percentage):
+    """
+    根据近期排名百分比（0-100）判断超量提示和超量等级
+
+    返回:
+    tuple: (超量提示, 超量等级)
+    """
+    if rank_percentage >= 70:
+        return "⚠️ 超量：处于近期前30%", "高风险" if rank_percentage >= 90 else "中等风险"
+    return "正常范围", "低风险"
@@ -0,0 +1,236 @@
+import os
+from collections import deque
+import numpy as np
+import pandas as pd
+import analysis.HISAnalysis.getHis as getHis
+
+# A股连续竞价每天240分钟：上午09:31-11:30，下午13:01-15:00（分钟线以结束时间标记）
+MINUTES_PER_DAY = 240
+
+# 日内累计成交量状态默认保存目录
+INTRADAY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                            'cache', 'intraday')
+
+
+def minute_index(timestamp):
+    """
+    分钟线时间对应的交易分钟序号（0-239），非交易时段返回None
+
+    09:30的集合竞价成交并入第一分钟，13:00并入上午最后一分钟
+    """
+    minutes = timestamp.hour * 60 + timestamp.minute
+    if 570 <= minutes <= 690:
+        return max(minutes - 571, 0)
+    if minutes == 780:
+        return 119
+    if 781 <= minutes <= 900:
+        return minutes - 661
+    return None
+
+
+class IntradayVolumeRatio:
+    """
+    单只股票的日内量比
+
+    按分钟序号保存最近quantity_days个完整交易日的累计成交量曲线，并维护各分钟的同时段累计量之和，
+    量比 = 当日截至当前分钟的累计成交量 / 过去quantity_days天同一时刻累计成交量的均值。
+    每来一根分钟线只更新当日累计量，为O(1)；换日时把当日曲线并入基准，为O(240)
+    """
+
+    def __init__(self, quantity_days=20):
+        self.quantity_days = quantity_days
+        self._days = deque()
+        self._baseline = np.zeros(MINUTES_PER_DAY)
+        self._date = None
+        self._reset_today()
+
+    def _reset_today(self):
+        self._today = np.zeros(MINUTES_PER_DAY)
+        self._index = -1
+        self._cumulative = 0.0
+        self._last_time = None
+        self._last_volume = 0.0
+
+    def update(self, time, volume):
+        """
+        加入一根分钟线（同一时间重复推送时视为该分钟成交量的更新）
+
+        参数:
+        time: 分钟线时间
+        volume: 该分钟成交量
+
+        返回:
+        float: 当前量比，基准不足时为NaN
+        """
+        time = pd.Timestamp(time)
+        index = minute_index(time)
+        date = time.date()
+        if index is None or (self._days and date <= self._days[-1][0]):
+            return self.ratio()
+
+        if self._date != date:
+            if self._date is not None and date < self._date:
+                return self.ratio()
+            if self._date is not None:
+                self._close_day()
+            self._date = date
+
+        volume = float(volume)
+        if time == self._last_time:
+            self._cumulative += volume - self._last_volume
+        elif index == self._index:
+            self._cumulative += volume
+        elif index > self._index:
+            # 无成交的分钟沿用之前的累计量
+            self._today[self._index + 1:index] = self._cumulative
+            self._index = index
+            self._cumulative += volume
+        else:
+            return self.ratio()
+
+        self._today[index] = self._cumulative
+        self._last_time = time
+        self._last_volume = volume
+        return self.ratio()
+
+    def _close_day(self):
+        """当日收盘：补齐剩余分钟并把当日曲线并入同时段基准"""
+        self._today[self._index + 1:] = self._cumulative
+        self._days.append((self._date, self._today))
+        self._baseline += self._today
+        while len(self._days) > self.quantity_days:
+            _, expired = self._days.popleft()
+            self._baseline -= expired
+        self._reset_today()
+
+    def fit(self, minute_data, time_column='时间', volume_column='成交量'):
+        """按时间顺序回放分钟线DataFrame，返回self"""
+        times = pd.to_datetime(minute_data[time_column]).tolist()
+        volumes = minute_data[volume_column].to_numpy(dtype=float).tolist()
+        for time, volume in zip(times, volumes):
+            self.update(time, volume)
+        return self
+
+    def ratio(self):
+        """当前量比，基准不足或尚无当日数据时为NaN"""
+        if not self._days or self._index < 0:
+            return np.nan
+        average = self._baseline[self._index] / len(self._days)
+        return self._cumulative / average if average > 0 else np.nan
+
+    def same_time_history(self):
+        """过去各交易日截至当前分钟的累计成交量"""
+        if self._index < 0:
+            return np.empty(0)
+        return np.array([curve[self._index] for _, curve in self._days])
+
+    def metrics(self):
+        """
+        当前时刻的日内量比分析，排名和超量提示口径与getHis的近期指标一致
+        （当日累计量与过去各日同时段累计量一起排名）
+
+        返回:
+        dict: 包含量比、近期排名、超量提示等信息；尚无当日数据时返回错误信息
+        """
+        if self._index < 0:
+            return {'错误信息': '没有当日分钟数据'}
+
+        values = np.append(self.same_time_history(), self._cumulative)
+        rank = int(np.count_nonzero(values <= self._cumulative))
+        rank_percentage = rank / len(values) * 100
+        alert, alert_level = getHis.volume_alert(rank_percentage)
+
+        return {
+            '日期': str(self._date),
+            '交易分钟': self._index + 1,
+            '累计成交量': self._cumulative,
+            '同时段均量': float(values[:-1].mean()) if len(values) > 1 else np.nan,
+            '量比': float(self.ratio()),
+            '近期排名': rank,
+            '排名百分比': rank_percentage,
+            '超量提示': alert,
+            '超量等级': alert_level,
+            '数据信息': {'基准天数': len(self._days), '近期数据量': len(values)}
+        }
+
+    def save(self, path):
+        """保存已收盘交易日的累计量曲线（当日未完成的数据不保存）"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        dates = np.array([str(date) for date, _ in self._days])
+        curves = np.array([curve for _, curve in self._days]).reshape(-1, MINUTES_PER_DAY)
+        np.savez(path, dates=dates, curves=curves)
+
+    @classmethod
+    def load(cls, path, quantity_days=20):
+        """读取save保存的曲线，文件不存在时返回空状态"""
+        tracker = cls(quantity_days)
+        if not os.path.exists(path):
+            return tracker
+        try:
+            with np.load(path) as data:
+                for date, curve in zip(data['dates'][-quantity_days:], data['curves'][-quantity_days:]):
+                    tracker._days.append((pd.Timestamp(str(date)).date(), curve.astype(float)))
+                    tracker._baseline += curve
+        except Exception as e:
+            print(f"读取日内量比状态失败: {e}")
+            return cls(quantity_days)
+        return tracker
+
+
+class IntradayMonitor:
+    """多只股票的日内量比，按股票代码分别维护IntradayVolumeRatio"""
+
+    def __init__(self, quantity_days=20, state_dir=INTRADAY_DIR):
+        self.quantity_days = quantity_days
+        self.state_dir = state_dir
+        self.trackers = {}
+
+    def tracker(self, symbol):
+        if symbol not in self.trackers:
+            path = self._path(symbol) if self.state_dir else None
+            self.trackers[symbol] = (IntradayVolumeRatio.load(path, self.quantity_days) if path
+                                     else IntradayVolumeRatio(self.quantity_days))
+        return self.trackers[symbol]
+
+    def _path(self, symbol):
+        return os.path.join(self.state_dir, f"{symbol}.npz")
+
+    def update(self, symbol, time, volume):
+        return self.tracker(symbol).update(time, volume)
+
+    def metrics(self, symbol):
+        return self.tracker(symbol).metrics()
+
+    def save(self):
+        if not self.state_dir:
+            return
+        for symbol, tracker in self.trackers.items():
+            tracker.save(self._path(symbol))
+
+
+def read_replay(path):
+    """
+    读取分钟线回放文件（CSV），至少包含"时间"、"成交量"列，多只股票时包含"股票代码"列
+    """
+    bars = pd.read_csv(path, dtype={'股票代码': str})
+    bars['时间'] = pd.to_datetime(bars['时间'])
+    return bars.sort_values('时间', kind='mergesort').reset_index(drop=True)
+
+
+def replay(monitor, bars, symbol=None):
+    """
+    把分钟线逐根推送给monitor，模拟实时行情
+
+    参数:
+    monitor: IntradayMonitor
+    bars: 分钟线DataFrame（如read_replay的结果）
+    symbol: bars不含"股票代码"列时使用的股票代码
+
+    返回:
+    generator: 逐根产出 (股票代码, 时间, 量比)
+    """
+    symbols = bars['股票代码'].tolist() if '股票代码' in bars.columns else [symbol] * len(bars)
+    times = pd.to_datetime(bars['时间']).tolist()
+    volumes = bars['成交量'].to_numpy(dtype=float).tolist()
+    for code, time, volume in zip(symbols, times, volumes):
+        yield code, time, monitor.update(code, time, volume)
@@ -0,0 +1,265 @@
+import json
+import math
+import os
+import datetime
+import numpy as np
+import pandas as pd
+import analysis.HISAnalysis.getHis as getHis
+
+# 每日草图默认保存目录
+SKETCH_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                          'cache', 'sketch')
+
+# 归一化排名误差系数：误差上界为 RANK_ERROR_FACTOR / k
+# 按实测标定（analysis/testQuantileSketch.py）：直接update和逐日merge两种用法下，
+# 最大排名误差分别约为1.3/k和3.5/k，取4/k作为上界（k=200时为±2个百分点）
+RANK_ERROR_FACTOR = 4.0
+
+
+class KLLSketch:
+    """
+    KLL近似分位数草图（Karnin-Lang-Liberty）
+
+    - 内存占用约为 O(k)，与数据量无关
+    - 可合并：多个草图merge后等价于对合并数据构建的草图，误差界不变
+    - 误差：归一化排名误差上界见rank_error；数据量小于k时不做压缩，结果是精确的
+
+    rank/quantile的口径与getHis一致：rank(x)为小于等于x的数据占比
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.n = 0
+        self.min_value = np.inf
+        self.max_value = -np.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def rank_error(self):
+        """归一化排名误差上界（比例），即 RANK_ERROR_FACTOR / k"""
+        return RANK_ERROR_FACTOR / self.k
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        """加入一个或一批数值，空值忽略"""
+        values = np.atleast_1d(np.asarray(values, dtype=float))
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+
+        self.n += len(values)
+        self.min_value = min(self.min_value, float(values.min()))
+        self.max_value = max(self.max_value, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """合并另一个草图（原地修改并返回self）"""
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+        self._compress()
+        return self
+
+    def _compress(self):
+        """逐层压缩：超出容量的层排序后随机取奇数位或偶数位，提升到上一层（权重翻倍）"""
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # 奇数个时保留一个在当前层
+                keep = items[-1:] if len(items) % 2 == 1 else items[:0]
+                pairs = items[:len(items) - len(keep)]
+                offset = int(self._rng.integers(2))
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], pairs[offset::2]])
+                self.levels[level] = keep
+                # 新增一层后下层容量变化，从头检查
+                level = 0
+                continue
+            level += 1
+
+    def _weighted_items(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level, dtype=float)
+                                  for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind='mergesort')
+        return values[order], weights[order]
+
+    def rank(self, value):
+        """小于等于value的数据占比（0-1），空值或空草图返回0"""
+        if self.n == 0 or np.isnan(value):
+            return 0.0
+        total = 0.0
+        for level, items in enumerate(self.levels):
+            total += np.count_nonzero(items <= value) * 2 ** level
+        weight_sum = sum(len(items) * 2 ** level for level, items in enumerate(self.levels))
+        return total / weight_sum
+
+    def quantile(self, q):
+        """近似q分位数（q为0-1之间的数或数组）"""
+        if self.n == 0:
+            return np.nan
+        values, weights = self._weighted_items()
+        cumulative = np.cumsum(weights) / weights.sum()
+        q = np.asarray(q, dtype=float)
+        index = np.minimum(np.searchsorted(cumulative, q, side='left'), len(values) - 1)
+        result = values[index]
+        return float(result) if result.ndim == 0 else result
+
+    def to_dict(self):
+        """转为可JSON序列化的字典"""
+        return {
+            'k': self.k,
+            'n': self.n,
+            'min': self.min_value if self.n else None,
+            'max': self.max_value if self.n else None,
+            'levels': [items.tolist() for items in self.levels]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(k=data['k'])
+        sketch.n = data['n']
+        sketch.min_value = data['min'] if data['min'] is not None else np.inf
+        sketch.max_value = data['max'] if data['max'] is not None else -np.inf
+        sketch.levels = [np.asarray(items, dtype=float) for items in data['levels']] or [np.empty(0)]
+        return sketch
+
+
+class SketchStore:
+    """
+    按(股票代码, 日期)持久化的每日草图
+
+    文件布局: {root}/{股票代码}/{YYYYMMDD}.json，内容为 {分析目标: 草图字典}
+    任意日期区间、任意股票集合（如行业板块）的分位只需读取并合并对应的每日草图
+    """
+
+    def __init__(self, root=SKETCH_DIR, k=200):
+        self.root = root
+        self.k = k
+
+    def _path(self, symbol, date):
+        return os.path.join(self.root, str(symbol), f"{_date_key(date)}.json")
+
+    def has(self, symbol, date):
+        return os.path.exists(self._path(symbol, date))
+
+    def save_day(self, symbol, date, sketches):
+        """保存某只股票某日的草图 {分析目标: KLLSketch}"""
+        path = self._path(symbol, date)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({target: sketch.to_dict() for target, sketch in sketches.items()}, f, ensure_ascii=False)
+
+    def load_day(self, symbol, date):
+        path = self._path(symbol, date)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return {target: KLLSketch.from_dict(data) for target, data in json.load(f).items()}
+
+    def dates(self, symbol, start=None, end=None):
+        """已保存的日期键（YYYYMMDD字符串，升序）"""
+        directory = os.path.join(self.root, str(symbol))
+        if not os.path.isdir(directory):
+            return []
+        keys = sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+        start_key = _date_key(start) if start is not None else None
+        end_key = _date_key(end) if end is not None else None
+        return [key for key in keys
+                if (start_key is None or key >= start_key) and (end_key is None or key <= end_key)]
+
+    def add_data(self, symbol, data, analysis_target, date_column='日期', overwrite=False, refresh_last=True):
+        """
+        按日期分组为每个分析目标构建每日草图并保存（日线为每天一个值，分钟线为每天一组值）
+
+        参数:
+        symbol: 股票代码
+        data: 包含日期/时间列和分析目标所需列的DataFrame
+        analysis_target: 列名/表达式，字符串或列表
+        date_column: 日期或时间列名，分钟线一般为'时间'
+        overwrite: 是否覆盖已存在的日期
+        refresh_last: 是否总是重建最新一天（盘中数据可能尚未完整）
+        """
+        if isinstance(analysis_target, str):
+            analysis_target = [analysis_target]
+
+        values = {target: getHis.evaluate_target(data, target).to_numpy(dtype=float) for target in analysis_target}
+        day_keys = pd.to_datetime(data[date_column]).dt.strftime('%Y%m%d').to_numpy()
+
+        last_day = day_keys.max() if len(day_keys) else None
+        for day in pd.unique(day_keys):
+            if not overwrite and not (refresh_last and day == last_day) and self.has(symbol, day):
+                continue
+            mask = day_keys == day
+            day_sketches = {target: KLLSketch(self.k).update(target_values[mask])
+                            for target, target_values in values.items()}
+            self.save_day(symbol, day, day_sketches)
+
+    def merged(self, symbols, target, start=None, end=None):
+        """
+        合并多只股票在日期区间内的每日草图
+
+        参数:
+        symbols: 股票代码或代码列表
+        target: 分析目标，字符串或列表
+        start/end: 起止日期（含），为None时不限
+
+        返回:
+        target为字符串时返回KLLSketch，为列表时返回 {分析目标: KLLSketch}
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        targets = [target] if isinstance(target, str) else list(target)
+        result = {name: KLLSketch(self.k) for name in targets}
+        # 每个每日文件只读取一次，同时合并所有分析目标
+        for symbol in symbols:
+            for day in self.dates(symbol, start, end):
+                day_sketches = self.load_day(symbol, day)
+                for name in targets:
+                    sketch = day_sketches.get(name)
+                    if sketch is not None:
+                        result[name].merge(sketch)
+        return result[target] if isinstance(target, str) else result
+
+
+def _date_key(date):
+    if isinstance(date, str) and len(date) == 8 and date.isdigit():
+        return date
+    if isinstance(date, (datetime.date, pd.Timestamp)):
+        return date.strftime('%Y%m%d')
+    return pd.Timestamp(date).strftime('%Y%m%d')
+
+
+def sketches_for_targets(store, symbol, history_data, analysis_target, date_column='日期', symbols=None):
+    """
+    为getHisAnalysis准备近似分位所需的草图
+
+    先把history_data中尚未保存的日期写入store，再按history_data的日期区间合并草图。
+    symbols不为None时合并这些股票（如同一板块）的草图，得到跨股票的分位；
+    history_data为分钟线时date_column传'时间'，得到分钟级的历史分位
+
+    返回:
+    dict: {分析目标: KLLSketch}
+    """
+    if isinstance(analysis_target, str):
+        analysis_target = [analysis_target]
+
+    store.add_data(symbol, history_data, analysis_target, date_column)
+    dates = pd.to_datetime(history_data[date_column])
+    start, end = dates.min(), dates.max()
+    return store.merged(symbols or [symbol], analysis_target, start, end)
@@ -0,0 +1,99 @@
+import pandas as pd
+import numpy as np
+import analysis.HISAnalysis.getHis as getHis
+
+
+class FenwickTree:
+    """树状数组：单点增减、前缀求和均为O(log n)，下标从1开始"""
+
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def add(self, index, delta=1):
+        tree = self.tree
+        while index <= self.size:
+            tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, index):
+        tree = self.tree
+        total = 0
+        while index > 0:
+            total += tree[index]
+            index -= index & -index
+        return total
+
+
+def rolling_percentile_rank(values, window=None):
+    """
+    计算每个值在其之前window个值（含自身）中的历史分位
+
+    口径与getHis一致：分位 = 窗口内小于等于当前值的个数 / 窗口内有效值个数 * 100。
+    数值先离散化为排名，再用树状数组维护窗口内各排名的计数，总复杂度O(n log n)
+
+    参数:
+    values: 一维数组
+    window: 窗口长度（按行计），为None时使用截至当前的全部历史
+
+    返回:
+    ndarray: 历史分位（0-100），空值位置为NaN
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    result = np.full(n, np.nan)
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return result
+
+    # 离散化：相同数值共享同一排名（从1开始）
+    unique_values = np.unique(values[valid])
+    ranks = np.zeros(n, dtype=int)
+    ranks[valid] = np.searchsorted(unique_values, values[valid]) + 1
+    ranks = ranks.tolist()
+    valid = valid.tolist()
+
+    tree = FenwickTree(len(unique_values))
+    count = 0
+    for i in range(n):
+        if valid[i]:
+            tree.add(ranks[i], 1)
+            count += 1
+        # 移出窗口外的值
+        if window is not None and i >= window and valid[i - window]:
+            tree.add(ranks[i - window], -1)
+            count -= 1
+        if valid[i]:
+            result[i] = tree.prefix_sum(ranks[i]) / count * 100
+
+    return result
+
+
+def rolling_percentile_frame(history_data, analysis_target, window=None, with_level=True):
+    """
+    对多个分析目标（列名或四则运算表达式）计算每日历史分位
+
+    参数:
+    history_data: 按日期排序的股票DataFrame
+    analysis_target: 列名/表达式，字符串或列表
+    window: 窗口长度（按行计），为None时使用截至当日的全部历史
+    with_level: 是否同时输出历史水平标签
+
+    返回:
+    DataFrame: 每个目标的"X历史分位"(0-100)及"X历史水平"列，索引与history_data一致
+    """
+    if isinstance(analysis_target, str):
+        analysis_target = [analysis_target]
+
+    result = pd.DataFrame(index=history_data.index)
+    if '日期' in history_data.columns:
+        result['日期'] = history_data['日期']
+
+    for target in analysis_target:
+        values = getHis.evaluate_target(history_data, target)
+        percentile = rolling_percentile_rank(values.to_numpy(dtype=float), window)
+        result[f'{target}历史分位'] = percentile
+        if with_level:
+            result[f'{target}历史水平'] = getHis.classify_history_level(percentile)
+
+    return result
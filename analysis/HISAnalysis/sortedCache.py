@@ -0,0 +1,179 @@
+import bisect
+from collections import OrderedDict, deque
+import numpy as np
+
+
+class SortedWindow:
+    """
+    滑动窗口的有序值索引
+
+    保存窗口内的原始值（按日期顺序）和去除空值后的有序列表，
+    分位和排名查询为二分查找O(log n)，窗口滑动一天只需一次插入和一次删除
+    """
+
+    def __init__(self, values, dates):
+        values = [float(v) for v in values]
+        self.values = deque(values)
+        self.dates = deque(dates)
+        self.sorted_values = sorted(v for v in values if not np.isnan(v))
+
+    def __len__(self):
+        return len(self.sorted_values)
+
+    def count_less_equal(self, value):
+        """窗口内小于等于value的有效值个数（与np.searchsorted一致，空值排在最后）"""
+        if np.isnan(value):
+            return len(self.sorted_values)
+        return bisect.bisect_right(self.sorted_values, value)
+
+    def percentile(self, value):
+        """value在窗口中的历史分位（0-100），与np.sum(values <= value)口径一致，空值为0"""
+        if not self.sorted_values:
+            return np.nan
+        if np.isnan(value):
+            return 0.0
+        return self.count_less_equal(value) / len(self.sorted_values) * 100
+
+    def slide(self, value, date):
+        """追加一天的值并移出最旧的一天，窗口长度保持不变"""
+        self.append(value, date)
+        self.popleft()
+
+    def popleft(self):
+        """移出最旧的一天"""
+        self._remove(self.values.popleft())
+        self.dates.popleft()
+
+    def drop_before(self, date):
+        """移出日期早于date的所有数据，返回移出的天数"""
+        count = 0
+        while self.dates and self.dates[0] < date:
+            self.popleft()
+            count += 1
+        return count
+
+    def append(self, value, date):
+        value = float(value)
+        self.values.append(value)
+        self.dates.append(date)
+        if not np.isnan(value):
+            bisect.insort(self.sorted_values, value)
+
+    def replace_last(self, value):
+        """替换最新一天的值（如盘中数据更新）"""
+        self._remove(self.values.pop())
+        date = self.dates.pop()
+        self.append(value, date)
+
+    def _remove(self, value):
+        if not np.isnan(value):
+            del self.sorted_values[bisect.bisect_left(self.sorted_values, value)]
+
+
+class SortedIndexCache:
+    """
+    按(股票代码, 分析目标, 窗口名称)缓存SortedWindow
+
+    再次查询时比较日期：
+    - 数据未变化: 直接复用
+    - 只替换了最新一天的值: 一次删除+一次插入
+    - 向后滑动: 移出早于新窗口起点的日期，追加新增的日期；窗口按自然日截取（sliceRecentDays），
+      跨周末、节假日时移出和追加的天数可以不同，窗口行数随之变化
+    - 其他情况: 重新排序构建
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._windows = OrderedDict()
+        self.hits = 0
+        self.slides = 0
+        self.rebuilds = 0
+
+    def get_window(self, symbol, target, name, values, dates):
+        """
+        获取与(values, dates)一致的有序窗口
+
+        参数:
+        symbol: 股票代码
+        target: 分析目标（列名或表达式）
+        name: 窗口名称，如'history'/'quantity'
+        values: 按日期排序的值序列
+        dates: 与values对应的日期序列
+
+        返回:
+        SortedWindow
+        """
+        values = np.asarray(values, dtype=float)
+        dates = np.asarray(dates)
+        key = (symbol, target, name)
+        window = self._windows.get(key)
+
+        if window is not None and self._try_update(window, values, dates):
+            self._windows.move_to_end(key)
+            return window
+
+        self.rebuilds += 1
+        window = SortedWindow(values, dates)
+        self._windows[key] = window
+        self._windows.move_to_end(key)
+        while len(self._windows) > self.max_entries:
+            self._windows.popitem(last=False)
+        return window
+
+    def _try_update(self, window, values, dates):
+        """尝试把缓存窗口更新为新数据，无法增量更新时返回False"""
+        if len(dates) == 0 or not window.dates:
+            return False
+        # 新窗口起点早于缓存窗口（窗口变长）时需要重新构建
+        if dates[0] < window.dates[0]:
+            return False
+
+        cached_last = window.dates[-1]
+        # 在新数据末尾附近查找缓存的最后日期，确定新增天数
+        shift = None
+        for k in range(min(len(dates), 32)):
+            if dates[-1 - k] == cached_last:
+                shift = k
+                break
+        if shift is None:
+            return False
+        last_index = len(values) - 1 - shift
+
+        # 缓存窗口中不早于新起点的部分应与新数据的前last_index+1行一一对应
+        dropped = 0
+        while dropped < len(window.dates) and window.dates[dropped] < dates[0]:
+            dropped += 1
+        kept = len(window.dates) - dropped
+        if kept != last_index + 1 or window.dates[dropped] != dates[0]:
+            return False
+        # 前复权数据在除权后会整体改变历史价格，用新起点的值校验
+        if not _same_value(window.values[dropped], values[0]):
+            return False
+
+        window.drop_before(dates[0])
+        if not _same_value(window.values[-1], values[last_index]):
+            window.replace_last(values[last_index])
+
+        if shift == 0 and dropped == 0:
+            self.hits += 1
+        else:
+            self.slides += 1
+            for i in range(last_index + 1, len(values)):
+                window.append(values[i], dates[i])
+        return True
+
+    def clear(self, symbol=None):
+        """清除全部或指定股票的缓存"""
+        if symbol is None:
+            self._windows.clear()
+            return
+        for key in [key for key in self._windows if key[0] == symbol]:
+            del self._windows[key]
+
+
+def _same_value(a, b):
+    return (np.isnan(a) and np.isnan(b)) or a == b
+
+
+# 进程内默认缓存
+DEFAULT_CACHE = SortedIndexCache()
@@ -1,12 +1,21 @@
 import pandas as pd
 import numpy as np
+import analysis.LEVELanalysis.maEngine as maEngine
 
 # 计算均线
-def calculate_moving_averages(stock_data):
-    """计算10日、20日、30日均线"""
-    stock_data['MA10'] = stock_data['收盘'].rolling(window=10, min_periods=1).mean()
-    stock_data['MA20'] = stock_data['收盘'].rolling(window=20, min_periods=1).mean()
-    stock_data['MA30'] = stock_data['收盘'].rolling(window=30, min_periods=1).mean()
+def calculate_moving_averages(stock_data, ma_windows=None):
+    """
+    计算均线，默认计算10日、20日、30日均线
+    ma_windows: 额外的均线配置，如["EMA12", "WMA20"]，趋势判断所需的MA10/MA20/MA30始终保留
+    返回添加了均线列的新DataFrame，不修改传入的数据
+    """
+    specs = list(maEngine.DEFAULT_MA_WINDOWS) + list(ma_windows or [])
+    engine = maEngine.MovingAverageEngine(specs)
+    ma_data = engine.fit(stock_data)
+
+    stock_data = stock_data.copy()
+    for column in ma_data.columns:
+        stock_data[column] = ma_data[column]
     return stock_data
 
 
@@ -29,20 +38,7 @@ def judge_trend(stock_data):
     }
 
     # 判断均线排列
-    if pd.isna(ma10) or pd.isna(ma20) or pd.isna(ma30):
-        trend_info['趋势'] = "数据不足，无法判断"
-    elif ma10 > ma20 > ma30 and close_price > ma10:
-        trend_info['趋势'] = "强势上行"
-    elif ma10 > ma20 > ma30:
-        trend_info['趋势'] = "上行趋势"
-    elif ma10 < ma20 < ma30 and close_price < ma10:
-        trend_info['趋势'] = "强势下行"
-    elif ma10 < ma20 < ma30:
-        trend_info['趋势'] = "下行趋势"
-    elif ma10 > ma20 and ma20 > ma30:
-        trend_info['趋势'] = "震荡偏多"
-    else:
-        trend_info['趋势'] = "震荡整理"
+    trend_info['趋势'] = classify_trend(close_price, ma10, ma20, ma30).item()
 
     return trend_info
 
@@ -82,3 +78,110 @@ def judge_ma_relationship(stock_data):
             ma_relations['均线排列'] = "交织排列"
 
     return ma_relations
+
+
+# 趋势分类（数组版本）
+def classify_trend(close_price, ma10, ma20, ma30):
+    """
+    对收盘价和均线数组逐元素判断趋势，返回趋势标签数组
+    判断规则与judge_trend一致
+    """
+    close_price = np.asarray(close_price, dtype=float)
+    ma10 = np.asarray(ma10, dtype=float)
+    ma20 = np.asarray(ma20, dtype=float)
+    ma30 = np.asarray(ma30, dtype=float)
+
+    bull = (ma10 > ma20) & (ma20 > ma30)
+    bear = (ma10 < ma20) & (ma20 < ma30)
+    conditions = [
+        np.isnan(ma10) | np.isnan(ma20) | np.isnan(ma30),
+        bull & (close_price > ma10),
+        bull,
+        bear & (close_price < ma10),
+        bear
+    ]
+    choices = ["数据不足，无法判断", "强势上行", "上行趋势", "强势下行", "下行趋势"]
+    return np.select(conditions, choices, default="震荡整理")
+
+
+# 全历史趋势序列
+def trend_series(stock_data):
+    """
+    计算每个交易日的趋势状态
+    stock_data需已包含MA10/MA20/MA30列（见calculate_moving_averages）
+
+    返回:
+    Series: 与stock_data索引一致的趋势标签
+    """
+    ma = {f'MA{period}': stock_data.get(f'MA{period}', pd.Series(np.nan, index=stock_data.index))
+          for period in [10, 20, 30]}
+    labels = classify_trend(stock_data['收盘'], ma['MA10'], ma['MA20'], ma['MA30'])
+    return pd.Series(labels, index=stock_data.index, name='趋势')
+
+
+# 全历史均线关系序列
+def ma_relationship_series(stock_data):
+    """
+    计算每个交易日与10日/20日/30日均线的关系
+    stock_data需已包含MA10/MA20/MA30列
+
+    返回:
+    DataFrame: 每条均线的偏离百分比、关系标签，以及均线排列
+    """
+    close_price = stock_data['收盘'].to_numpy(dtype=float)
+    result = pd.DataFrame(index=stock_data.index)
+
+    for ma_period in [10, 20, 30]:
+        ma_value = stock_data.get(f'MA{ma_period}', pd.Series(np.nan, index=stock_data.index)).to_numpy(dtype=float)
+        diff_percent = (close_price - ma_value) / ma_value * 100
+
+        relation = np.select(
+            [np.isnan(diff_percent), diff_percent > 5, diff_percent > 0, diff_percent > -5],
+            ["数据不足", f"大幅高于{ma_period}日均线", f"位于{ma_period}日均线上方", f"位于{ma_period}日均线下方"],
+            default=f"大幅低于{ma_period}日均线"
+        )
+        result[f'MA{ma_period}偏离(%)'] = diff_percent
+        result[f'与MA{ma_period}关系'] = relation
+
+    ma10, ma20, ma30 = (stock_data.get(f'MA{ma}', pd.Series(np.nan, index=stock_data.index)).to_numpy(dtype=float)
+                        for ma in [10, 20, 30])
+    result['均线排列'] = np.select(
+        [np.isnan(ma10) | np.isnan(ma20) | np.isnan(ma30),
+         (ma10 > ma20) & (ma20 > ma30),
+         (ma10 < ma20) & (ma20 < ma30)],
+        ["数据不足", "多头排列", "空头排列"],
+        default="交织排列"
+    )
+    return result
+
+
+# 统计趋势持续区间
+def trend_durations(trend_labels, dates=None):
+    """
+    将趋势标签序列切分为连续区间
+
+    参数:
+    trend_labels: 趋势标签Series（如trend_series的返回值）
+    dates: 与trend_labels对应的日期序列，为None时使用trend_labels的索引
+
+    返回:
+    DataFrame: 每个连续区间的趋势、开始日期、结束日期、持续天数
+    """
+    labels = np.asarray(trend_labels)
+    if dates is None:
+        dates = trend_labels.index if isinstance(trend_labels, pd.Series) else np.arange(len(labels))
+    dates = np.asarray(dates)
+
+    if len(labels) == 0:
+        return pd.DataFrame(columns=['趋势', '开始日期', '结束日期', '持续天数'])
+
+    # 标签发生变化的位置即新区间的起点
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.r_[starts[1:] - 1, len(labels) - 1]
+
+    return pd.DataFrame({
+        '趋势': labels[starts],
+        '开始日期': dates[starts],
+        '结束日期': dates[ends],
+        '持续天数': ends - starts + 1
+    })
@@ -0,0 +1,172 @@
+import pandas as pd
+import numpy as np
+
+# 缺口索引列
+GAP_COLUMNS = ['位置', '日期', '方向', '缺口上沿', '缺口下沿', '是否回补', '回补日期']
+
+
+class GapIndex:
+    """
+    全历史跳空缺口索引
+
+    向上缺口: 当日最低 > 前日最高，缺口区间为[前日最高, 当日最低]，之后最低价回落到缺口下沿即视为回补
+    向下缺口: 当日最高 < 前日最低，缺口区间为[当日最高, 前日最低]，之后最高价回升到缺口上沿即视为回补
+    位置为缺口出现当日在按日期排序后数据中的行号（从0开始）
+    """
+
+    def __init__(self, stock_data=None):
+        self.gaps = pd.DataFrame(columns=GAP_COLUMNS)
+        self.length = 0
+        self._dates = []
+        self._last_high = np.nan
+        self._last_low = np.nan
+        if stock_data is not None:
+            self.build(stock_data)
+
+    def build(self, stock_data):
+        """用数组平移一次性计算全历史缺口及回补状态"""
+        if '日期' in stock_data.columns:
+            stock_data = stock_data.sort_values('日期')
+        stock_data = stock_data.reset_index(drop=True)
+
+        high = stock_data['最高'].to_numpy(dtype=float)
+        low = stock_data['最低'].to_numpy(dtype=float)
+        dates = stock_data['日期'].to_numpy() if '日期' in stock_data.columns else np.arange(len(stock_data))
+        n = len(stock_data)
+
+        self.length = n
+        self._dates = list(dates)
+        if n == 0:
+            self.gaps = pd.DataFrame(columns=GAP_COLUMNS)
+            return self
+        self._last_high = high[-1]
+        self._last_low = low[-1]
+
+        # 前一日最高/最低
+        prev_high = np.r_[np.nan, high[:-1]]
+        prev_low = np.r_[np.nan, low[:-1]]
+
+        up_mask = low > prev_high
+        down_mask = high < prev_low
+
+        # 之后所有交易日的最低价最小值/最高价最大值（不含当日）
+        future_min_low = np.r_[np.minimum.accumulate(low[::-1])[::-1][1:], np.inf]
+        future_max_high = np.r_[np.maximum.accumulate(high[::-1])[::-1][1:], -np.inf]
+
+        up_pos = np.flatnonzero(up_mask)
+        down_pos = np.flatnonzero(down_mask)
+
+        up = pd.DataFrame({
+            '位置': up_pos,
+            '方向': '向上',
+            '缺口上沿': low[up_pos],
+            '缺口下沿': prev_high[up_pos],
+            '是否回补': future_min_low[up_pos] <= prev_high[up_pos]
+        })
+        down = pd.DataFrame({
+            '位置': down_pos,
+            '方向': '向下',
+            '缺口上沿': prev_low[down_pos],
+            '缺口下沿': high[down_pos],
+            '是否回补': future_max_high[down_pos] >= prev_low[down_pos]
+        })
+
+        # 只对已回补的缺口查找回补日期
+        up['回补日期'] = [self._first_fill(low, pos, edge, '向上') if filled else None
+                      for pos, edge, filled in zip(up['位置'], up['缺口下沿'], up['是否回补'])]
+        down['回补日期'] = [self._first_fill(high, pos, edge, '向下') if filled else None
+                        for pos, edge, filled in zip(down['位置'], down['缺口上沿'], down['是否回补'])]
+
+        gaps = pd.concat([up, down], ignore_index=True)
+        gaps['日期'] = [self._dates[pos] for pos in gaps['位置']]
+        self.gaps = gaps.sort_values('位置').reset_index(drop=True)[GAP_COLUMNS]
+        return self
+
+    def _first_fill(self, prices, pos, edge, direction):
+        """查找缺口之后第一个回补日期"""
+        later = prices[pos + 1:]
+        hit = later <= edge if direction == '向上' else later >= edge
+        return self._dates[pos + 1 + int(np.argmax(hit))]
+
+    def update(self, bar):
+        """
+        追加一根新K线并增量更新缺口索引
+
+        参数:
+        bar: 包含日期、最高、最低的dict或Series
+        """
+        high = float(bar['最高'])
+        low = float(bar['最低'])
+        date = bar.get('日期', self.length)
+        pos = self.length
+
+        # 先用新K线回补已有的未回补缺口
+        if not self.gaps.empty:
+            open_up = (~self.gaps['是否回补'].astype(bool)) & (self.gaps['方向'] == '向上') & (self.gaps['缺口下沿'] >= low)
+            open_down = (~self.gaps['是否回补'].astype(bool)) & (self.gaps['方向'] == '向下') & (self.gaps['缺口上沿'] <= high)
+            filled = open_up | open_down
+            if filled.any():
+                self.gaps.loc[filled, '是否回补'] = True
+                self.gaps.loc[filled, '回补日期'] = date
+
+        # 再判断新K线与前一日之间是否形成缺口
+        new_gap = None
+        if low > self._last_high:
+            new_gap = {'方向': '向上', '缺口上沿': low, '缺口下沿': self._last_high}
+        elif high < self._last_low:
+            new_gap = {'方向': '向下', '缺口上沿': self._last_low, '缺口下沿': high}
+
+        if new_gap is not None:
+            new_gap.update({'位置': pos, '日期': date, '是否回补': False, '回补日期': None})
+            new_row = pd.DataFrame([new_gap], columns=GAP_COLUMNS)
+            self.gaps = new_row if self.gaps.empty else pd.concat([self.gaps, new_row], ignore_index=True)
+
+        self._dates.append(date)
+        self._last_high = high
+        self._last_low = low
+        self.length += 1
+        return self
+
+    def first_gap(self, start=0, direction='向上'):
+        """查找位置不早于start的第一个缺口，返回该缺口记录（Series），没有则返回None"""
+        candidates = self.gaps[(self.gaps['位置'] >= start) & (self.gaps['方向'] == direction)]
+        if candidates.empty:
+            return None
+        return candidates.iloc[0]
+
+    def unfilled(self, direction=None):
+        """获取未回补缺口"""
+        mask = ~self.gaps['是否回补'].astype(bool)
+        if direction is not None:
+            mask &= self.gaps['方向'] == direction
+        return self.gaps[mask]
+
+    def nearest_resistance(self, price):
+        """当前价格上方最近的未回补缺口下沿，没有则返回None"""
+        open_gaps = self.unfilled()
+        above = open_gaps.loc[open_gaps['缺口下沿'] > price, '缺口下沿']
+        if above.empty:
+            return None
+        return float(above.min())
+
+
+def list_unfilled_gaps(stock_data_dict, direction=None):
+    """
+    批量列出多只股票的未回补缺口
+
+    参数:
+    stock_data_dict: {股票代码: 股票DataFrame}
+    direction: '向上'/'向下'，为None时返回全部方向
+
+    返回:
+    DataFrame: 增加了股票代码列的未回补缺口列表
+    """
+    frames = []
+    for code, stock_data in stock_data_dict.items():
+        unfilled = GapIndex(stock_data).unfilled(direction)
+        if not unfilled.empty:
+            frames.append(unfilled.assign(股票代码=code))
+
+    if not frames:
+        return pd.DataFrame(columns=['股票代码'] + GAP_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[['股票代码'] + GAP_COLUMNS]
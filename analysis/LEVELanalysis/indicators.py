@@ -0,0 +1,449 @@
+import re
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# 默认指标参数（与通达信/同花顺常用设置一致）
+DEFAULT_INDICATOR_PARAMS = {
+    'RSI': 14,
+    'MACD': (12, 26, 9),
+    'BOLL': (20, 2),
+    'ATR': 14,
+    'KDJ': (9, 3, 3)
+}
+
+# 可在分析目标表达式中直接使用的指标名，RSI/ATR可带周期，如RSI6、ATR20
+INDICATOR_PATTERN = re.compile(r'(RSI|ATR)(\d*)|MACD(_DIF|_DEA)?|BOLL_(MID|UPPER|LOWER)|KDJ_[KDJ]|OBV')
+
+
+# ---------- 分组递推工具：keys为None时按单只股票计算，否则按股票代码分组（面板数据） ----------
+
+def _shift(series, keys):
+    return series.shift() if keys is None else series.groupby(keys, sort=False).shift()
+
+
+def _ewm(series, alpha, keys, adjust=False):
+    """指数递推 y_t = (1-alpha)*y_{t-1} + alpha*x_t，从第一个有效值开始"""
+    if keys is None:
+        return series.ewm(alpha=alpha, adjust=adjust).mean()
+    result = series.groupby(keys, sort=False).ewm(alpha=alpha, adjust=adjust).mean()
+    return result.reset_index(level=0, drop=True).reindex(series.index)
+
+
+def _rolling(series, window, keys, how, min_periods=None):
+    if keys is None:
+        return getattr(series.rolling(window, min_periods=min_periods), how)()
+    result = getattr(series.groupby(keys, sort=False).rolling(window, min_periods=min_periods), how)()
+    return result.reset_index(level=0, drop=True).reindex(series.index)
+
+
+def _cumsum(series, keys):
+    return series.cumsum() if keys is None else series.groupby(keys, sort=False).cumsum()
+
+
+def _smooth_from(series, n, keys, initial=50.0):
+    """
+    通达信SMA(X,N,1)：y_t = (1-1/N)*y_{t-1} + X_t/N，初值y_{-1}=initial（KDJ使用）
+
+    带初值的递推等价于对(X-initial)做adjust=True的指数加权平均再乘以(1-(1-a)^(t+1))
+    """
+    alpha = 1 / n
+    position = np.arange(len(series)) if keys is None else series.groupby(keys, sort=False).cumcount().to_numpy()
+    weighted = _ewm(series - initial, alpha, keys, adjust=True)
+    return initial + weighted * (1 - (1 - alpha) ** (position + 1))
+
+
+# ---------- 各指标的批量计算 ----------
+
+def _rsi_parts(close, period, keys):
+    diff = close - _shift(close, keys)
+    avg_up = _ewm(diff.clip(lower=0), 1 / period, keys)
+    avg_down = _ewm((-diff).clip(lower=0), 1 / period, keys)
+    total = avg_up + avg_down
+    rsi = (avg_up / total.where(total > 0) * 100).where(total > 0, 50.0).where(avg_up.notna())
+    return rsi, avg_up, avg_down
+
+
+def rsi(close, period=14, keys=None):
+    """RSI（Wilder平滑），0-100"""
+    return _rsi_parts(close, period, keys)[0]
+
+
+def _macd_parts(close, fast, slow, signal, keys):
+    ema_fast = _ewm(close, 2 / (fast + 1), keys)
+    ema_slow = _ewm(close, 2 / (slow + 1), keys)
+    dif = ema_fast - ema_slow
+    dea = _ewm(dif, 2 / (signal + 1), keys)
+    return dif, dea, ema_fast, ema_slow
+
+
+def macd(close, fast=12, slow=26, signal=9, keys=None):
+    """MACD：DIF=EMA快-EMA慢，DEA=EMA(DIF)，MACD柱=2*(DIF-DEA)"""
+    dif, dea, _, _ = _macd_parts(close, fast, slow, signal, keys)
+    return pd.DataFrame({'MACD_DIF': dif, 'MACD_DEA': dea, 'MACD': 2 * (dif - dea)})
+
+
+def boll(close, window=20, width=2, keys=None):
+    """布林带：中轨为window日均线，上下轨为中轨±width倍标准差（样本标准差），窗口不足时为空"""
+    mid = _rolling(close, window, keys, 'mean')
+    std = _rolling(close, window, keys, 'std')
+    return pd.DataFrame({'BOLL_MID': mid, 'BOLL_UPPER': mid + width * std, 'BOLL_LOWER': mid - width * std})
+
+
+def _true_range(high, low, close, keys):
+    prev_close = _shift(close, keys)
+    ranges = np.column_stack([(high - low).to_numpy(dtype=float),
+                              (high - prev_close).abs().to_numpy(dtype=float),
+                              (low - prev_close).abs().to_numpy(dtype=float)])
+    # 第一根K线没有前收盘价，只使用最高-最低
+    return pd.Series(np.fmax.reduce(ranges, axis=1), index=close.index)
+
+
+def atr(high, low, close, period=14, keys=None):
+    """ATR（Wilder平滑的真实波幅）"""
+    return _ewm(_true_range(high, low, close, keys), 1 / period, keys)
+
+
+def kdj(high, low, close, n=9, m1=3, m2=3, keys=None):
+    """KDJ：RSV为n日内位置，K=SMA(RSV,m1,1)，D=SMA(K,m2,1)，J=3K-2D，K/D初值为50"""
+    lowest = _rolling(low, n, keys, 'min', min_periods=1)
+    highest = _rolling(high, n, keys, 'max', min_periods=1)
+    spread = highest - lowest
+    rsv = ((close - lowest) / spread.where(spread > 0) * 100).fillna(50.0)
+    k = _smooth_from(rsv, m1, keys)
+    d = _smooth_from(k, m2, keys)
+    return pd.DataFrame({'KDJ_K': k, 'KDJ_D': d, 'KDJ_J': 3 * k - 2 * d})
+
+
+def obv(close, volume, keys=None):
+    """OBV能量潮：上涨日加成交量，下跌日减成交量，第一天为0"""
+    direction = np.sign(close - _shift(close, keys)).fillna(0)
+    return _cumsum(direction * volume, keys)
+
+
+def _params(params):
+    merged = dict(DEFAULT_INDICATOR_PARAMS)
+    merged.update(params or {})
+    return merged
+
+
+def compute_indicators(stock_data, params=None, keys=None):
+    """
+    批量计算全部技术指标
+
+    参数:
+    stock_data: 包含收盘、最高、最低、成交量列的DataFrame（按日期排序）
+    params: 指标参数，覆盖DEFAULT_INDICATOR_PARAMS中的对应项
+    keys: 分组键（如面板数据的股票代码列），为None时视为单只股票
+
+    返回:
+    DataFrame: 与stock_data索引一致，列为RSI{N}、MACD_DIF、MACD_DEA、MACD、BOLL_MID/UPPER/LOWER、
+    ATR{N}、KDJ_K/D/J、OBV
+    """
+    params = _params(params)
+    close = stock_data['收盘'].astype(float)
+    high = stock_data['最高'].astype(float)
+    low = stock_data['最低'].astype(float)
+
+    result = pd.DataFrame(index=stock_data.index)
+    result[f"RSI{params['RSI']}"] = rsi(close, params['RSI'], keys)
+    result = result.join(macd(close, *params['MACD'], keys=keys))
+    result = result.join(boll(close, *params['BOLL'], keys=keys))
+    result[f"ATR{params['ATR']}"] = atr(high, low, close, params['ATR'], keys)
+    result = result.join(kdj(high, low, close, *params['KDJ'], keys=keys))
+    if '成交量' in stock_data.columns:
+        result['OBV'] = obv(close, stock_data['成交量'].astype(float), keys)
+    return result
+
+
+def panel_indicators(panel, params=None):
+    """
+    对面板数据（见panelTools.build_panel）按股票分组批量计算技术指标，
+    所有股票在同一组向量化运算中完成
+
+    返回:
+    DataFrame: 与panel索引一致的指标列
+    """
+    return compute_indicators(panel, params, keys=panel['股票代码'])
+
+
+# ---------- 表达式中的指标名 ----------
+
+def is_indicator(name):
+    return INDICATOR_PATTERN.fullmatch(name) is not None
+
+
+def indicator_series(stock_data, name):
+    """
+    按指标名计算单个指标序列，供分析目标表达式使用（如"RSI14"、"MACD_DIF"、"KDJ_J/RSI6"）
+
+    返回:
+    Series: 与stock_data索引一致
+    """
+    match = INDICATOR_PATTERN.fullmatch(name)
+    if match is None:
+        raise KeyError(f"无法识别的指标 '{name}'")
+
+    close = stock_data['收盘'].astype(float)
+    if match.group(1):
+        period = int(match.group(2)) if match.group(2) else DEFAULT_INDICATOR_PARAMS[match.group(1)]
+        if match.group(1) == 'RSI':
+            return rsi(close, period)
+        return atr(stock_data['最高'].astype(float), stock_data['最低'].astype(float), close, period)
+    if name.startswith('MACD'):
+        return macd(close, *DEFAULT_INDICATOR_PARAMS['MACD'])[name]
+    if name.startswith('BOLL'):
+        return boll(close, *DEFAULT_INDICATOR_PARAMS['BOLL'])[name]
+    if name.startswith('KDJ'):
+        return kdj(stock_data['最高'].astype(float), stock_data['最低'].astype(float), close,
+                   *DEFAULT_INDICATOR_PARAMS['KDJ'])[name]
+    return obv(close, stock_data['成交量'].astype(float))
+
+
+# ---------- 增量计算 ----------
+
+class IndicatorEngine:
+    """
+    技术指标增量引擎
+
+    fit对全历史批量计算并保存递推状态，之后每追加一根K线，
+    RSI/MACD/ATR/KDJ/OBV的递推为O(1)，BOLL的滑动和/平方和以及KDJ的单调队列最值均摊O(1)
+    """
+
+    def __init__(self, params=None):
+        self.params = _params(params)
+        self.rsi_column = f"RSI{self.params['RSI']}"
+        self.atr_column = f"ATR{self.params['ATR']}"
+        self._reset_state()
+
+    def _reset_state(self):
+        self.count = 0
+        self._prev_close = np.nan
+        self._avg_up = np.nan
+        self._avg_down = np.nan
+        self._ema_fast = np.nan
+        self._ema_slow = np.nan
+        self._dea = np.nan
+        self._atr = np.nan
+        self._k = 50.0
+        self._d = 50.0
+        self._obv = 0.0
+        window = self.params['BOLL'][0]
+        self._boll_window = deque(maxlen=window)
+        self._boll_sum = 0.0
+        self._boll_sum_sq = 0.0
+        # 单调队列：(序号, 值)
+        self._high_queue = deque()
+        self._low_queue = deque()
+
+    def fit(self, stock_data):
+        """
+        批量计算全历史指标并保存增量状态
+
+        返回:
+        DataFrame: compute_indicators的结果
+        """
+        self._reset_state()
+        result = compute_indicators(stock_data, self.params)
+        if stock_data.empty:
+            return result
+
+        close = stock_data['收盘'].astype(float)
+        high = stock_data['最高'].astype(float)
+        low = stock_data['最低'].astype(float)
+        _, avg_up, avg_down = _rsi_parts(close, self.params['RSI'], None)
+        dif, dea, ema_fast, ema_slow = _macd_parts(close, *self.params['MACD'], None)
+
+        self.count = len(stock_data)
+        self._prev_close = close.iloc[-1]
+        self._avg_up, self._avg_down = avg_up.iloc[-1], avg_down.iloc[-1]
+        self._ema_fast, self._ema_slow, self._dea = ema_fast.iloc[-1], ema_slow.iloc[-1], dea.iloc[-1]
+        self._atr = result[self.atr_column].iloc[-1]
+        self._k, self._d = result['KDJ_K'].iloc[-1], result['KDJ_D'].iloc[-1]
+        self._obv = result['OBV'].iloc[-1] if 'OBV' in result.columns else 0.0
+
+        for value in close.iloc[-self._boll_window.maxlen:]:
+            self._boll_window.append(value)
+        self._boll_sum = sum(self._boll_window)
+        self._boll_sum_sq = sum(value * value for value in self._boll_window)
+
+        n = self.params['KDJ'][0]
+        start = max(0, self.count - n)
+        for i, (h, l) in enumerate(zip(high.iloc[start:], low.iloc[start:]), start):
+            self._push_extremes(i, h, l)
+        return result
+
+    def _push_extremes(self, index, high, low):
+        while self._high_queue and self._high_queue[-1][1] <= high:
+            self._high_queue.pop()
+        self._high_queue.append((index, high))
+        while self._low_queue and self._low_queue[-1][1] >= low:
+            self._low_queue.pop()
+        self._low_queue.append((index, low))
+        # 移出窗口外的元素
+        oldest = index - self.params['KDJ'][0] + 1
+        while self._high_queue[0][0] < oldest:
+            self._high_queue.popleft()
+        while self._low_queue[0][0] < oldest:
+            self._low_queue.popleft()
+
+    def append(self, bar):
+        """
+        追加一根K线
+
+        参数:
+        bar: 包含收盘、最高、最低、成交量的dict或Series
+
+        返回:
+        dict: 与compute_indicators列名一致的最新指标值
+        """
+        close = float(bar['收盘'])
+        high = float(bar['最高'])
+        low = float(bar['最低'])
+        volume = float(bar.get('成交量', 0.0))
+        prev_close = self._prev_close
+        latest = {}
+
+        # RSI
+        period = self.params['RSI']
+        if not np.isnan(prev_close):
+            diff = close - prev_close
+            up, down = max(diff, 0.0), max(-diff, 0.0)
+            if np.isnan(self._avg_up):
+                self._avg_up, self._avg_down = up, down
+            else:
+                self._avg_up += (up - self._avg_up) / period
+                self._avg_down += (down - self._avg_down) / period
+            total = self._avg_up + self._avg_down
+            latest[self.rsi_column] = self._avg_up / total * 100 if total > 0 else 50.0
+        else:
+            latest[self.rsi_column] = np.nan
+
+        # MACD
+        fast, slow, signal = self.params['MACD']
+        self._ema_fast = _ema_step(self._ema_fast, close, 2 / (fast + 1))
+        self._ema_slow = _ema_step(self._ema_slow, close, 2 / (slow + 1))
+        dif = self._ema_fast - self._ema_slow
+        self._dea = _ema_step(self._dea, dif, 2 / (signal + 1))
+        latest.update({'MACD_DIF': dif, 'MACD_DEA': self._dea, 'MACD': 2 * (dif - self._dea)})
+
+        # BOLL
+        window, width = self.params['BOLL']
+        if len(self._boll_window) == window:
+            dropped = self._boll_window[0]
+            self._boll_sum -= dropped
+            self._boll_sum_sq -= dropped * dropped
+        self._boll_window.append(close)
+        self._boll_sum += close
+        self._boll_sum_sq += close * close
+        if len(self._boll_window) == window:
+            mid = self._boll_sum / window
+            std = np.sqrt(max(self._boll_sum_sq - window * mid * mid, 0.0) / (window - 1)) if window > 1 else np.nan
+            latest.update({'BOLL_MID': mid, 'BOLL_UPPER': mid + width * std, 'BOLL_LOWER': mid - width * std})
+        else:
+            latest.update({'BOLL_MID': np.nan, 'BOLL_UPPER': np.nan, 'BOLL_LOWER': np.nan})
+
+        # ATR
+        true_range = high - low if np.isnan(prev_close) else max(high - low, abs(high - prev_close),
+                                                                  abs(low - prev_close))
+        self._atr = _ema_step(self._atr, true_range, 1 / self.params['ATR'])
+        latest[self.atr_column] = self._atr
+
+        # KDJ
+        _, m1, m2 = self.params['KDJ']
+        self._push_extremes(self.count, high, low)
+        highest, lowest = self._high_queue[0][1], self._low_queue[0][1]
+        rsv = (close - lowest) / (highest - lowest) * 100 if highest > lowest else 50.0
+        self._k += (rsv - self._k) / m1
+        self._d += (self._k - self._d) / m2
+        latest.update({'KDJ_K': self._k, 'KDJ_D': self._d, 'KDJ_J': 3 * self._k - 2 * self._d})
+
+        # OBV
+        if not np.isnan(prev_close):
+            self._obv += np.sign(close - prev_close) * volume
+        latest['OBV'] = self._obv
+
+        self._prev_close = close
+        self.count += 1
+        return latest
+
+
+def _ema_step(previous, value, alpha):
+    return value if np.isnan(previous) else previous + alpha * (value - previous)
+
+
+# ---------- 信号判断 ----------
+
+def judge_indicators(stock_data, params=None, indicator_data=None):
+    """
+    根据最新指标值判断技术状态
+
+    参数:
+    stock_data: 股票DataFrame
+    params: 指标参数
+    indicator_data: 预先计算好的compute_indicators结果（可选）
+
+    返回:
+    dict: 各指标的最新值和状态判断
+    """
+    params = _params(params)
+    if indicator_data is None:
+        indicator_data = compute_indicators(stock_data, params)
+    if len(indicator_data) == 0:
+        return {}
+
+    latest = {column: float(value) for column, value in indicator_data.iloc[-1].items()}
+    previous = ({column: float(value) for column, value in indicator_data.iloc[-2].items()}
+                if len(indicator_data) > 1 else latest)
+    close = float(stock_data['收盘'].iloc[-1])
+    result = {}
+
+    rsi_value = latest[f"RSI{params['RSI']}"]
+    result['RSI'] = rsi_value
+    result['RSI状态'] = ("数据不足" if pd.isna(rsi_value) else "超买" if rsi_value >= 70
+                       else "超卖" if rsi_value <= 30 else "中性")
+
+    result['MACD'] = {'DIF': latest['MACD_DIF'], 'DEA': latest['MACD_DEA'], 'MACD柱': latest['MACD']}
+    result['MACD信号'] = _cross_signal(previous['MACD_DIF'], previous['MACD_DEA'],
+                                     latest['MACD_DIF'], latest['MACD_DEA'])
+
+    result['BOLL'] = {'上轨': latest['BOLL_UPPER'], '中轨': latest['BOLL_MID'], '下轨': latest['BOLL_LOWER']}
+    if pd.isna(latest['BOLL_MID']):
+        result['BOLL位置'] = "数据不足"
+    elif close > latest['BOLL_UPPER']:
+        result['BOLL位置'] = "突破上轨"
+    elif close < latest['BOLL_LOWER']:
+        result['BOLL位置'] = "跌破下轨"
+    else:
+        result['BOLL位置'] = "中轨上方" if close >= latest['BOLL_MID'] else "中轨下方"
+
+    atr_value = latest[f"ATR{params['ATR']}"]
+    result['ATR'] = atr_value
+    result['ATR占收盘价(%)'] = atr_value / close * 100 if close else np.nan
+
+    result['KDJ'] = {'K': latest['KDJ_K'], 'D': latest['KDJ_D'], 'J': latest['KDJ_J']}
+    if latest['KDJ_J'] > 100:
+        result['KDJ状态'] = "超买"
+    elif latest['KDJ_J'] < 0:
+        result['KDJ状态'] = "超卖"
+    else:
+        result['KDJ状态'] = _cross_signal(previous['KDJ_K'], previous['KDJ_D'], latest['KDJ_K'], latest['KDJ_D'])
+
+    if 'OBV' in indicator_data.columns:
+        result['OBV'] = latest['OBV']
+        obv_ma = float(indicator_data['OBV'].tail(20).mean())
+        result['OBV趋势'] = "资金流入" if latest['OBV'] > obv_ma else "资金流出"
+
+    return result
+
+
+def _cross_signal(prev_fast, prev_slow, fast, slow):
+    """快线与慢线的交叉状态"""
+    if pd.isna(fast) or pd.isna(slow):
+        return "数据不足"
+    if not pd.isna(prev_fast) and not pd.isna(prev_slow):
+        if prev_fast <= prev_slow and fast > slow:
+            return "金叉"
+        if prev_fast >= prev_slow and fast < slow:
+            return "死叉"
+    return "多头" if fast > slow else "空头"
@@ -1,25 +1,48 @@
 import analysis.LEVELanalysis.averges as avg
+import analysis.LEVELanalysis.gaps as gaps
+import analysis.LEVELanalysis.maEngine as maEngine
+import analysis.LEVELanalysis.volumeProfile as vp
+import analysis.LEVELanalysis.valuation as valuation
+import analysis.LEVELanalysis.indicators as indicators
+import tools.windowTools as WT
 import pandas as pd
 import numpy as np
-from scipy import stats
 
-def judge_resistance_levels(stock_data, lookback_period=60):
-    """判断当前位置压力位"""
+def judge_resistance_levels(stock_data, lookback_period=60, gap_index=None, volume_profile=None):
+    """
+    判断当前位置压力位
+    gap_index: 预先计算好的全历史缺口索引，为None时根据stock_data现场构建
+    volume_profile: 预先计算好的成交量分布，为None时根据stock_data现场构建
+    """
     recent_data = stock_data.tail(lookback_period)
 
     resistance_levels = {
         '近期高点': recent_data['最高'].max(),
         '近期收盘高点': recent_data['收盘'].max(),
-        '成交密集区上沿': recent_data['收盘'].quantile(0.8),  # 80%分位数
-        '近期跳空缺口': None
+        '成交密集区上沿': recent_data['收盘'].quantile(0.8),  # 无成交量数据时使用80%分位数
+        '近期跳空缺口': None,
+        '上方未回补缺口': None
     }
 
-    # 查找跳空缺口（向下跳空）
-    recent_data = recent_data.sort_values('日期')
-    for i in range(1, len(recent_data)):
-        if recent_data.iloc[i]['最低'] > recent_data.iloc[i - 1]['最高']:
-            resistance_levels['近期跳空缺口'] = recent_data.iloc[i - 1]['最高']
-            break
+    # 有成交量数据时，成交密集区上沿取回看窗口成交分布的价值区上沿
+    if volume_profile is None and '成交量' in stock_data.columns:
+        volume_profile = vp.VolumeProfile(stock_data)
+    if volume_profile is not None:
+        value_area_high = volume_profile.profile(lookback_period)['价值区上沿']
+        if value_area_high is not None:
+            resistance_levels['成交密集区上沿'] = value_area_high
+
+    if gap_index is None:
+        gap_index = gaps.GapIndex(stock_data)
+
+    # 查找回看窗口内第一个跳空缺口（缺口两侧K线都需在窗口内）
+    window_start = max(gap_index.length - len(recent_data), 0) + 1
+    first_gap = gap_index.first_gap(window_start, '向上')
+    if first_gap is not None:
+        resistance_levels['近期跳空缺口'] = first_gap['缺口下沿']
+
+    # 当前价格上方最近的未回补缺口
+    resistance_levels['上方未回补缺口'] = gap_index.nearest_resistance(recent_data['收盘'].iloc[-1])
 
     return resistance_levels
 
@@ -45,16 +68,7 @@ def judge_historical_high_low(stock_data, period_years=3):
     position_ratio = (current_price - historical_low) / (historical_high - historical_low) * 100
 
     # 判断高低位区域[3](@ref)
-    if position_ratio >= 80:
-        position_level = "历史高位"
-    elif position_ratio >= 60:
-        position_level = "相对高位"
-    elif position_ratio >= 40:
-        position_level = "中间位置"
-    elif position_ratio >= 20:
-        position_level = "相对低位"
-    else:
-        position_level = "历史低位"
+    position_level = classify_position(position_ratio).item()
 
     return {
         '当前价格': current_price,
@@ -66,54 +80,128 @@ def judge_historical_high_low(stock_data, period_years=3):
     }
 
 
-def calculate_valuation_quantiles(valuation_data, current_pe, current_pb):
+def classify_position(position_ratio):
     """
-    使用五分位法判断估值区域[6,7](@ref)
-    五线谱估值法：极高估(95%)、高估(75%)、合理(50%)、低估(25%)、极低估(5%)
+    根据位置百分比逐元素判断高低位区域，返回位置级别数组
+    空值返回"数据不足"
     """
+    position_ratio = np.asarray(position_ratio, dtype=float)
+    return np.select(
+        [np.isnan(position_ratio), position_ratio >= 80, position_ratio >= 60, position_ratio >= 40, position_ratio >= 20],
+        ["数据不足", "历史高位", "相对高位", "中间位置", "相对低位"],
+        default="历史低位"
+    )
 
-    def get_quantile_value(data, quantile):
-        return np.percentile(data, quantile * 100)
 
-    pe_quantiles = {
-        '极低估': get_quantile_value(valuation_data['pe'], 0.05),
-        '低估': get_quantile_value(valuation_data['pe'], 0.25),
-        '合理': get_quantile_value(valuation_data['pe'], 0.50),
-        '高估': get_quantile_value(valuation_data['pe'], 0.75),
-        '极高估': get_quantile_value(valuation_data['pe'], 0.95)
-    }
+def historical_position_series(stock_data, period_years=(1, 3, 5)):
+    """
+    计算每个交易日在多个历史周期内的位置百分比和位置级别
+    与judge_historical_high_low口径一致：窗口为250*年数个交易日，窗口数据不足时为空
 
-    pb_quantiles = {
-        '极低估': get_quantile_value(valuation_data['pb'], 0.05),
-        '低估': get_quantile_value(valuation_data['pb'], 0.25),
-        '合理': get_quantile_value(valuation_data['pb'], 0.50),
-        '高估': get_quantile_value(valuation_data['pb'], 0.75),
-        '极高估': get_quantile_value(valuation_data['pb'], 0.95)
-    }
+    参数:
+    stock_data: 按日期排序的股票DataFrame，包含收盘、最高、最低列
+    period_years: 历史周期（年）列表
 
-    # 判断当前PE/PB所在分位[8](@ref)
-    def get_valuation_level(current_value, quantiles):
-        if current_value <= quantiles['极低估']:
-            return '极低估'
-        elif current_value <= quantiles['低估']:
-            return '低估'
-        elif current_value <= quantiles['合理']:
-            return '合理'
-        elif current_value <= quantiles['高估']:
-            return '高估'
+    返回:
+    DataFrame: 每个周期的"位置百分比_N年"和"位置级别_N年"列，索引与stock_data一致
+    """
+    if isinstance(period_years, int):
+        period_years = [period_years]
+
+    close_price = stock_data['收盘'].to_numpy(dtype=float)
+    high = stock_data['最高'].to_numpy(dtype=float)
+    low = stock_data['最低'].to_numpy(dtype=float)
+
+    result = pd.DataFrame(index=stock_data.index)
+    for years in period_years:
+        window = 250 * years
+        historical_high = WT.rolling_max(high, window)
+        historical_low = WT.rolling_min(low, window)
+        price_range = historical_high - historical_low
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            position_ratio = np.where(price_range > 0, (close_price - historical_low) / price_range * 100, np.nan)
+
+        result[f'位置百分比_{years}年'] = np.round(position_ratio, 2)
+        result[f'位置级别_{years}年'] = classify_position(position_ratio)
+
+    return result
+
+
+def panel_position_series(panel, period_years=(1, 3, 5)):
+    """
+    对面板数据（见tools.panelTools.build_panel）按股票分别计算历史位置序列
+
+    返回:
+    DataFrame: 面板的股票代码、日期列加上各周期位置列
+    """
+    key_columns = [col for col in ['股票代码', '日期'] if col in panel.columns]
+    series = [historical_position_series(group, period_years) for _, group in panel.groupby('股票代码', sort=False)]
+    if not series:
+        return panel[key_columns].copy()
+    return pd.concat([panel[key_columns], pd.concat(series)], axis=1)
+
+
+def position_level_stats(stock_data, period_years=3, forward_days=20, position_data=None):
+    """
+    统计各位置级别出现的频率以及之后forward_days个交易日的收益表现
+
+    参数:
+    stock_data: 股票DataFrame或面板数据（含股票代码列时按股票分别计算后续收益）
+    period_years: 历史周期（年）
+    forward_days: 向后观察的交易日数
+    position_data: 预先计算好的位置序列（historical_position_series/panel_position_series的返回值）
+
+    返回:
+    DataFrame: 每个位置级别的出现次数、占比、后续平均收益、收益中位数、上涨概率
+    """
+    level_column = f'位置级别_{period_years}年'
+    if position_data is None:
+        if '股票代码' in stock_data.columns:
+            position_data = panel_position_series(stock_data, [period_years])
         else:
-            return '极高估'
+            position_data = historical_position_series(stock_data, [period_years])
+
+    # 后续收益按股票分别平移，避免跨股票取值
+    close_price = stock_data['收盘']
+    if '股票代码' in stock_data.columns:
+        future_price = close_price.groupby(stock_data['股票代码']).shift(-forward_days)
+    else:
+        future_price = close_price.shift(-forward_days)
+    forward_return = (future_price / close_price - 1) * 100
+
+    frame = pd.DataFrame({'位置级别': position_data[level_column], '后续收益': forward_return})
+    frame = frame[frame['位置级别'] != '数据不足']
+
+    stats_frame = frame.groupby('位置级别')['后续收益'].agg(
+        出现次数='size',
+        后续平均收益='mean',
+        后续收益中位数='median',
+        上涨概率=lambda x: (x.dropna() > 0).mean() * 100
+    )
+    stats_frame['占比'] = stats_frame['出现次数'] / stats_frame['出现次数'].sum() * 100
+    order = [level for level in ["历史高位", "相对高位", "中间位置", "相对低位", "历史低位"] if level in stats_frame.index]
+    return stats_frame.loc[order, ['出现次数', '占比', '后续平均收益', '后续收益中位数', '上涨概率']]
 
-    pe_level = get_valuation_level(current_pe, pe_quantiles)
-    pb_level = get_valuation_level(current_pb, pb_quantiles)
+
+def calculate_valuation_quantiles(valuation_data, current_pe, current_pb):
+    """
+    使用五分位法判断估值区域[6,7](@ref)
+    五线谱估值法：极高估(95%)、高估(75%)、合理(50%)、低估(25%)、极低估(5%)
+    """
+    quantiles = valuation.valuation_quantiles(valuation_data, ('pe', 'pb'))
+    pe_quantiles = quantiles['pe']
+    pb_quantiles = quantiles['pb']
+
+    # 判断当前PE/PB所在分位[8](@ref)
+    pe_level = valuation.valuation_level(current_pe, pe_quantiles)
+    pb_level = valuation.valuation_level(current_pb, pb_quantiles)
 
     # 综合估值判断[5](@ref)
-    if pe_level in ['极低估', '低估'] and pb_level in ['极低估', '低估']:
-        overall_level = '低估区域'
-    elif pe_level in ['高估', '极高估'] and pb_level in ['高估', '极高估']:
-        overall_level = '高估区域'
-    else:
-        overall_level = '合理区域'
+    overall_level = valuation.overall_valuation(pe_level, pb_level)
+
+    pe_history = valuation_data['pe'].dropna()
+    pb_history = valuation_data['pb'].dropna()
 
     return {
         'PE分位': pe_level,
@@ -121,19 +209,27 @@ def calculate_valuation_quantiles(valuation_data, current_pe, current_pb):
         '综合估值': overall_level,
         'PE详细分位': pe_quantiles,
         'PB详细分位': pb_quantiles,
+        'PE历史分位': float((pe_history <= current_pe).mean() * 100) if len(pe_history) else None,
+        'PB历史分位': float((pb_history <= current_pb).mean() * 100) if len(pb_history) else None,
         '当前PE': current_pe,
         '当前PB': current_pb
     }
 
 
-def getLevel(stock_data, valuation_data=None, current_pe=None, current_pb=None):
+def getLevel(stock_data, valuation_data=None, current_pe=None, current_pb=None, gap_index=None, ma_windows=None,
+             profile_windows=None, volume_profile=None, indicator_params=None):
     """
     综合判断股票当前位置（优化版）
     参数:
         stock_data: DataFrame，包含日期、开盘、收盘、最高、最低等列
-        valuation_data: DataFrame，包含历史PE/PB数据
+        valuation_data: DataFrame，包含历史PE/PB数据（见dataTools.getValuationData），未指定当前PE/PB时取最新值
         current_pe: 当前市盈率
         current_pb: 当前市净率
+        gap_index: GapIndex，预先计算好的缺口索引（可选）
+        ma_windows: 额外计算的均线配置，如["EMA12", "WMA20"]（可选）
+        profile_windows: 成交分布分析的回看窗口列表，如[60, 250]（可选）
+        volume_profile: VolumeProfile，预先计算好的成交量分布（可选）
+        indicator_params: 技术指标参数，如{"RSI": 6, "BOLL": [20, 2]}（可选，见indicators.DEFAULT_INDICATOR_PARAMS）
     返回:
         dict: 包含趋势、压力位、历史位置、估值区域的综合信息
     """
@@ -142,13 +238,15 @@ def getLevel(stock_data, valuation_data=None, current_pe=None, current_pb=None):
         stock_data = stock_data.sort_values('日期').copy()
 
     # 第一步：计算均线
-    stock_data = avg.calculate_moving_averages(stock_data)
+    stock_data = avg.calculate_moving_averages(stock_data, ma_windows)
 
     # 第二步：判断趋势
     trend_result = avg.judge_trend(stock_data)
 
     # 第三步：判断压力位
-    resistance_result = judge_resistance_levels(stock_data)
+    if volume_profile is None and '成交量' in stock_data.columns:
+        volume_profile = vp.VolumeProfile(stock_data)
+    resistance_result = judge_resistance_levels(stock_data, gap_index=gap_index, volume_profile=volume_profile)
 
     # 第四步：判断与均线关系
     ma_result = avg.judge_ma_relationship(stock_data)
@@ -158,6 +256,15 @@ def getLevel(stock_data, valuation_data=None, current_pe=None, current_pb=None):
 
     # 第六步：估值分析（如果有估值数据）[6,7](@ref)
     valuation_result = None
+    if valuation_data is not None and not valuation_data.empty:
+        # 未指定当前PE/PB时取估值数据的最新值
+        latest_valuation = valuation_data.dropna(subset=['pe', 'pb']).tail(1)
+        if current_pe is None and not latest_valuation.empty:
+            current_pe = float(latest_valuation['pe'].iloc[0])
+        if current_pb is None and not latest_valuation.empty:
+            current_pb = float(latest_valuation['pb'].iloc[0])
+    else:
+        valuation_data = None
     if valuation_data is not None and current_pe is not None and current_pb is not None:
         valuation_result = calculate_valuation_quantiles(valuation_data, current_pe, current_pb)
     elif current_pe is not None and current_pb is not None:
@@ -169,6 +276,15 @@ def getLevel(stock_data, valuation_data=None, current_pe=None, current_pb=None):
             '当前PB': current_pb
         }
 
+    # 第七步：成交分布分析（按配置的回看窗口）
+    profile_result = {}
+    if volume_profile is not None:
+        for window in profile_windows or []:
+            profile_result[f'{window}日'] = volume_profile.profile(window)
+
+    # 第八步：技术指标分析
+    indicator_result = indicators.judge_indicators(stock_data, indicator_params)
+
     # 综合结果
     comprehensive_result = {
         '趋势分析': trend_result,
@@ -176,6 +292,10 @@ def getLevel(stock_data, valuation_data=None, current_pe=None, current_pb=None):
         '均线关系分析': ma_result,
         '历史位置分析': historical_result,
         '估值分析': valuation_result,
+        '成交分布分析': profile_result,
+        '技术指标分析': indicator_result,
+        '均线数值': {column: stock_data.iloc[-1][column]
+                 for _, _, column in (maEngine.parse_ma_spec(spec) for spec in (ma_windows or []))},
         '分析时间': stock_data.iloc[-1]['日期'] if '日期' in stock_data.columns else '未知'
     }
 
@@ -0,0 +1,166 @@
+import re
+from collections import deque
+import pandas as pd
+import numpy as np
+
+# 默认均线配置
+DEFAULT_MA_WINDOWS = ['SMA10', 'SMA20', 'SMA30']
+
+
+def parse_ma_spec(spec):
+    """
+    解析均线配置字符串
+
+    参数:
+    spec: 形如"SMA10"、"EMA12"、"WMA20"的字符串，纯数字"10"视为SMA
+
+    返回:
+    tuple: (均线类型, 窗口, 输出列名)，SMA的列名沿用MA10的写法
+    """
+    match = re.fullmatch(r'(SMA|EMA|WMA|MA)?(\d+)', str(spec).strip().upper())
+    if match is None:
+        raise ValueError(f"无法识别的均线配置 '{spec}'，示例: SMA10、EMA12、WMA20")
+
+    kind = match.group(1) or 'SMA'
+    if kind == 'MA':
+        kind = 'SMA'
+    window = int(match.group(2))
+    if window <= 0:
+        raise ValueError(f"均线窗口必须为正整数: '{spec}'")
+
+    column = f'MA{window}' if kind == 'SMA' else f'{kind}{window}'
+    return kind, window, column
+
+
+class MovingAverageEngine:
+    """
+    可配置均线引擎
+
+    - SMA/WMA 共用同一组前缀和一次性算出全部窗口
+    - EMA 使用递推（adjust=False）
+    - append 追加一根新K线时每条均线只需O(1)计算
+    窗口不足时与 rolling(min_periods=1) 一致，使用已有数据计算
+    """
+
+    def __init__(self, ma_windows=None):
+        if ma_windows is None:
+            ma_windows = DEFAULT_MA_WINDOWS
+        specs = []
+        for spec in ma_windows:
+            parsed = parse_ma_spec(spec)
+            if parsed not in specs:
+                specs.append(parsed)
+        self.specs = specs
+        self.columns = [column for _, _, column in specs]
+        self.max_window = max((window for _, window, _ in specs), default=1)
+        self._reset_state()
+
+    def _reset_state(self):
+        self.count = 0
+        self._buffer = deque(maxlen=self.max_window)
+        self._sum = {}
+        self._weighted_sum = {}
+        self._last = {}
+
+    def compute(self, prices):
+        """
+        对价格数组一次性计算所有均线，并保存增量更新所需的状态
+
+        参数:
+        prices: 一维价格数组（空值按前值填充）
+
+        返回:
+        dict: {列名: 均线数组}
+        """
+        prices = pd.Series(np.asarray(prices, dtype=float)).ffill().bfill().to_numpy()
+        n = len(prices)
+        self._reset_state()
+
+        # 共享前缀和: P0为价格累加，P1为位置加权累加
+        index = np.arange(n, dtype=float)
+        prefix_sum = np.r_[0.0, np.cumsum(prices)]
+        prefix_weighted = np.r_[0.0, np.cumsum(index * prices)]
+        end = np.arange(1, n + 1)
+
+        results = {}
+        for kind, window, column in self.specs:
+            start = np.maximum(end - window, 0)
+            count = (end - start).astype(float)
+            window_sum = prefix_sum[end] - prefix_sum[start]
+
+            if kind == 'SMA':
+                values = window_sum / count
+            elif kind == 'WMA':
+                # 窗口内权重为1..count，等价于位置j的权重为 j - start + 1
+                weighted = prefix_weighted[end] - prefix_weighted[start] - (start - 1) * window_sum
+                values = weighted / (count * (count + 1) / 2)
+            else:
+                values = pd.Series(prices).ewm(span=window, adjust=False).mean().to_numpy()
+
+            results[column] = values
+
+            # 保存末尾状态
+            if n > 0:
+                self._sum[column] = window_sum[-1]
+                if kind == 'WMA':
+                    self._weighted_sum[column] = weighted[-1]
+                self._last[column] = values[-1]
+
+        self.count = n
+        self._buffer.extend(prices[-self.max_window:])
+        return results
+
+    def fit(self, stock_data, price_column='收盘'):
+        """
+        计算全历史均线
+
+        返回:
+        DataFrame: 与stock_data索引一致的均线列
+        """
+        results = self.compute(stock_data[price_column].to_numpy())
+        return pd.DataFrame(results, index=stock_data.index, columns=self.columns)
+
+    def append(self, price):
+        """
+        追加一个新价格，O(1)更新每条均线
+
+        返回:
+        dict: {列名: 最新均线值}
+        """
+        price = float(price)
+        if np.isnan(price):
+            price = self._buffer[-1] if self._buffer else 0.0
+
+        latest = {}
+        for kind, window, column in self.specs:
+            current_count = min(self.count, window)
+            window_sum = self._sum.get(column, 0.0)
+            # 窗口已满时移出最旧的价格
+            dropped = self._buffer[-window] if current_count == window else None
+
+            if kind == 'SMA':
+                window_sum = window_sum + price - (dropped if dropped is not None else 0.0)
+                value = window_sum / min(self.count + 1, window)
+            elif kind == 'WMA':
+                weighted_sum = self._weighted_sum.get(column, 0.0)
+                if dropped is None:
+                    weighted_sum += (current_count + 1) * price
+                    window_sum += price
+                else:
+                    # 旧窗口每个价格权重减1，最旧价格权重归零
+                    weighted_sum = weighted_sum - window_sum + window * price
+                    window_sum = window_sum - dropped + price
+                new_count = min(self.count + 1, window)
+                value = weighted_sum / (new_count * (new_count + 1) / 2)
+                self._weighted_sum[column] = weighted_sum
+            else:
+                alpha = 2 / (window + 1)
+                value = price if self.count == 0 else alpha * price + (1 - alpha) * self._last[column]
+
+            self._sum[column] = window_sum
+            self._last[column] = value
+            latest[column] = value
+
+        self._buffer.append(price)
+        self.count += 1
+        return latest
@@ -0,0 +1,105 @@
+import pandas as pd
+import numpy as np
+
+# 五线谱估值法的分位点
+VALUATION_QUANTILES = {
+    '极低估': 0.05,
+    '低估': 0.25,
+    '合理': 0.50,
+    '高估': 0.75,
+    '极高估': 0.95
+}
+
+
+def valuation_quantiles(valuation_data, columns=('pe', 'pb')):
+    """
+    一次计算多个估值指标的全部分位点
+
+    所有分位点和所有列在同一次nanquantile调用中完成（内部只做一次partition），
+    空值不参与计算
+
+    参数:
+    valuation_data: 包含估值列的DataFrame
+    columns: 估值列名
+
+    返回:
+    dict: {列名: {估值级别: 分位值}}
+    """
+    values = valuation_data[list(columns)].to_numpy(dtype=float)
+    quantile_values = np.nanquantile(values, list(VALUATION_QUANTILES.values()), axis=0)
+
+    return {
+        column: {name: float(quantile_values[i, j]) for i, name in enumerate(VALUATION_QUANTILES)}
+        for j, column in enumerate(columns)
+    }
+
+
+def valuation_level(current_value, quantiles):
+    """判断当前值所在的估值级别"""
+    for name in ['极低估', '低估', '合理', '高估']:
+        if current_value <= quantiles[name]:
+            return name
+    return '极高估'
+
+
+def classify_valuation_percentile(percentile):
+    """
+    根据历史分位（0-100）逐元素判断估值级别，返回级别数组
+    空值返回"数据不足"
+    """
+    percentile = np.asarray(percentile, dtype=float)
+    thresholds = [VALUATION_QUANTILES[name] * 100 for name in ['极低估', '低估', '合理', '高估']]
+    return np.select(
+        [np.isnan(percentile)] + [percentile <= threshold for threshold in thresholds],
+        ['数据不足', '极低估', '低估', '合理', '高估'],
+        default='极高估'
+    )
+
+
+def overall_valuation(pe_level, pb_level):
+    """
+    综合PE/PB估值级别，支持标量和数组
+    """
+    pe_level = np.asarray(pe_level)
+    pb_level = np.asarray(pb_level)
+    low = ['极低估', '低估']
+    high = ['高估', '极高估']
+    result = np.select(
+        [np.isin(pe_level, low) & np.isin(pb_level, low), np.isin(pe_level, high) & np.isin(pb_level, high)],
+        ['低估区域', '高估区域'],
+        default='合理区域'
+    )
+    return result.item() if result.ndim == 0 else result
+
+
+def valuation_percentile_series(valuation_data, window=None, columns=('pe', 'pb')):
+    """
+    计算每个交易日估值在历史中的分位及估值级别
+
+    参数:
+    valuation_data: 按日期排序、包含估值列的DataFrame
+    window: 滚动窗口（交易日数），为None时使用截至当日的全部历史
+    columns: 估值列名
+
+    返回:
+    DataFrame: 每列的"X历史分位"(0-100)、"X分位"(估值级别)，以及"综合估值"
+    """
+    result = pd.DataFrame(index=valuation_data.index)
+    if '日期' in valuation_data.columns:
+        result['日期'] = valuation_data['日期']
+
+    levels = {}
+    for column in columns:
+        values = valuation_data[column].astype(float)
+        roller = values.expanding() if window is None else values.rolling(window, min_periods=1)
+        # method='max'：与"历史中小于等于当前值的比例"口径一致
+        percentile = roller.rank(method='max', pct=True) * 100
+        name = column.upper()
+        result[f'{name}历史分位'] = percentile
+        levels[column] = classify_valuation_percentile(percentile)
+        result[f'{name}分位'] = levels[column]
+
+    if 'pe' in levels and 'pb' in levels:
+        result['综合估值'] = overall_valuation(levels['pe'], levels['pb'])
+
+    return result
@@ -0,0 +1,167 @@
+import pandas as pd
+import numpy as np
+
+
+class VolumeProfile:
+    """
+    成交量分布（Volume Profile）
+
+    每根K线的成交量/成交额按[最低, 最高]区间平均分摊到固定宽度的价格区间上，
+    并保存逐K线累加的直方图，任意回看窗口的分布只需两行相减，无需重新扫描历史。
+    """
+
+    def __init__(self, stock_data=None, n_bins=50, weight_column='成交量', bin_size=None):
+        """
+        参数:
+        stock_data: 股票DataFrame，包含最高、最低及weight_column列
+        n_bins: 初始价格区间数量，bin_size为None时用于确定区间宽度
+        weight_column: 分摊的权重列，'成交量'或'成交额'
+        bin_size: 价格区间宽度，为None时按初始数据的价格范围/n_bins确定
+        """
+        self.n_bins = n_bins
+        self.weight_column = weight_column
+        self.bin_size = bin_size
+        self.origin = None
+        self.length = 0
+        # 第t行为前t根K线的累加直方图，行数可能多于length+1（预留空间）
+        self._cumulative = np.zeros((1, 0))
+        if stock_data is not None:
+            self.build(stock_data)
+
+    def build(self, stock_data):
+        """一次性构建全历史累加直方图"""
+        if '日期' in stock_data.columns:
+            stock_data = stock_data.sort_values('日期')
+
+        high = stock_data['最高'].to_numpy(dtype=float)
+        low = stock_data['最低'].to_numpy(dtype=float)
+        weight = np.nan_to_num(stock_data[self.weight_column].to_numpy(dtype=float))
+
+        if self.bin_size is None:
+            price_range = np.nanmax(high) - np.nanmin(low) if len(high) else 0
+            self.bin_size = price_range / self.n_bins if price_range > 0 else 0.01
+        if self.origin is None:
+            self.origin = np.floor(np.nanmin(low) / self.bin_size) * self.bin_size if len(low) else 0.0
+
+        lo_bin, hi_bin = self._bin_range(low, high)
+        n_cols = int(hi_bin.max()) + 1 if len(hi_bin) else 0
+
+        # 差分数组：在起始区间加、结束区间后减，按行累加即为每根K线的分摊结果
+        per_bin = weight / (hi_bin - lo_bin + 1)
+        rows = np.arange(len(weight))
+        diff = np.zeros((len(weight), n_cols + 1))
+        np.add.at(diff, (rows, lo_bin), per_bin)
+        np.add.at(diff, (rows, hi_bin + 1), -per_bin)
+        bar_hist = np.cumsum(diff, axis=1)[:, :n_cols]
+
+        self._cumulative = np.vstack([np.zeros((1, n_cols)), np.cumsum(bar_hist, axis=0)])
+        self.length = len(weight)
+        return self
+
+    def _bin_range(self, low, high):
+        """计算价格对应的区间编号"""
+        low = np.nan_to_num(np.asarray(low, dtype=float), nan=self.origin)
+        high = np.nan_to_num(np.asarray(high, dtype=float), nan=self.origin)
+        lo_bin = np.floor((low - self.origin) / self.bin_size).astype(int)
+        hi_bin = np.floor((high - self.origin) / self.bin_size).astype(int)
+        return np.maximum(lo_bin, 0), np.maximum(hi_bin, np.maximum(lo_bin, 0))
+
+    def append(self, bar):
+        """
+        追加一根新K线，增量更新累加直方图
+
+        参数:
+        bar: 包含最高、最低及权重列的dict或Series
+        """
+        if self.bin_size is None:
+            self.build(pd.DataFrame([bar]))
+            return self
+
+        low, high = float(bar['最低']), float(bar['最高'])
+        weight = float(np.nan_to_num(bar[self.weight_column]))
+
+        # 价格低于原点时整体向下扩展区间
+        if low < self.origin:
+            shift = int(np.ceil((self.origin - low) / self.bin_size))
+            self.origin -= shift * self.bin_size
+            self._cumulative = np.pad(self._cumulative, ((0, 0), (shift, 0)))
+
+        lo_bin, hi_bin = (int(x[0]) for x in self._bin_range([low], [high]))
+        if hi_bin >= self._cumulative.shape[1]:
+            self._cumulative = np.pad(self._cumulative, ((0, 0), (0, hi_bin + 1 - self._cumulative.shape[1])))
+
+        # 按倍数预留行，避免每次追加都复制整个累加矩阵
+        if self.length + 2 > self._cumulative.shape[0]:
+            extra = np.zeros((max(self._cumulative.shape[0], 16), self._cumulative.shape[1]))
+            self._cumulative = np.vstack([self._cumulative, extra])
+
+        new_row = self._cumulative[self.length].copy()
+        new_row[lo_bin:hi_bin + 1] += weight / (hi_bin - lo_bin + 1)
+        self._cumulative[self.length + 1] = new_row
+        self.length += 1
+        return self
+
+    def histogram(self, lookback=None, end=None):
+        """
+        获取窗口内的价格分布
+
+        参数:
+        lookback: 回看K线数量，为None时使用全部历史
+        end: 窗口结束位置（不含），为None时到最新K线
+
+        返回:
+        tuple: (区间中心价格数组, 区间成交量数组)
+        """
+        end = self.length if end is None else min(end, self.length)
+        start = 0 if lookback is None else max(end - lookback, 0)
+        volumes = self._cumulative[end] - self._cumulative[start]
+        centers = self.origin + (np.arange(len(volumes)) + 0.5) * self.bin_size
+        return centers, volumes
+
+    def profile(self, lookback=None, end=None, value_area=0.7, hvn_ratio=1.5, max_nodes=5):
+        """
+        计算窗口内的成交分布关键价位
+
+        参数:
+        lookback: 回看K线数量，为None时使用全部历史
+        end: 窗口结束位置（不含）
+        value_area: 价值区包含的成交比例，默认70%
+        hvn_ratio: 高成交量节点阈值（相对于非零区间平均成交量的倍数）
+        max_nodes: 最多返回的高成交量节点数量
+
+        返回:
+        dict: 控制点、价值区上沿/下沿、高成交量节点
+        """
+        centers, volumes = self.histogram(lookback, end)
+        total = volumes.sum()
+        if len(volumes) == 0 or total <= 0:
+            return {'控制点': None, '价值区上沿': None, '价值区下沿': None, '高成交量节点': []}
+
+        poc = int(np.argmax(volumes))
+
+        # 从控制点向两侧扩展，每次纳入成交量较大的一侧，直到达到价值区比例
+        low_idx = high_idx = poc
+        covered = volumes[poc]
+        while covered < total * value_area and (low_idx > 0 or high_idx < len(volumes) - 1):
+            below = volumes[low_idx - 1] if low_idx > 0 else -1
+            above = volumes[high_idx + 1] if high_idx < len(volumes) - 1 else -1
+            if above >= below:
+                high_idx += 1
+                covered += above
+            else:
+                low_idx -= 1
+                covered += below
+
+        # 高成交量节点: 局部峰值且明显高于平均
+        padded = np.r_[-np.inf, volumes, -np.inf]
+        is_peak = (volumes >= padded[:-2]) & (volumes >= padded[2:])
+        threshold = volumes[volumes > 0].mean() * hvn_ratio
+        nodes = np.flatnonzero(is_peak & (volumes >= threshold))
+        nodes = nodes[np.argsort(volumes[nodes])[::-1]][:max_nodes]
+
+        return {
+            '控制点': float(centers[poc]),
+            '价值区上沿': float(centers[high_idx] + self.bin_size / 2),
+            '价值区下沿': float(centers[low_idx] - self.bin_size / 2),
+            '高成交量节点': [round(float(centers[i]), 2) for i in nodes]
+        }
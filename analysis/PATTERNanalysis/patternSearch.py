@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+# 默认参与匹配的列：收盘价走势和成交量（均做z标准化，只比较形态）
+DEFAULT_PATTERN_COLUMNS = ['收盘', '成交量']
+
+
+def sliding_dot_product(query, series):
+    """
+    用FFT计算query与series每个长度为len(query)的子序列的点积
+
+    返回:
+    ndarray: 长度为 len(series) - len(query) + 1
+    """
+    m, n = len(query), len(series)
+    size = 1 << int(np.ceil(np.log2(n + m)))
+    product = np.fft.irfft(np.fft.rfft(series, size) * np.fft.rfft(query[::-1], size), size)
+    return product[m - 1:n]
+
+
+def _rolling_mean_std(series, m):
+    """长度为m的滑动窗口均值和标准差（前缀和，O(n)）"""
+    cumsum = np.concatenate([[0.0], np.cumsum(series)])
+    cumsum_sq = np.concatenate([[0.0], np.cumsum(series ** 2)])
+    mean = (cumsum[m:] - cumsum[:-m]) / m
+    var = (cumsum_sq[m:] - cumsum_sq[:-m]) / m - mean ** 2
+    return mean, np.sqrt(np.maximum(var, 0))
+
+
+def mass_distance_profile(query, series):
+    """
+    MASS：query与series所有子序列的z标准化欧氏距离
+
+    d = sqrt(2m * (1 - (QT - m*μq*μt) / (m*σq*σt)))，点积QT由FFT一次算出，总复杂度O(n log n)。
+    含空值的子序列距离为inf；子序列或query为常数时，两者都为常数记为0，否则记为sqrt(m)
+
+    参数:
+    query: 一维数组（长度m，不能含空值）
+    series: 一维数组
+
+    返回:
+    ndarray: 长度为 len(series) - m + 1 的距离
+    """
+    query = np.asarray(query, dtype=float)
+    series = np.asarray(series, dtype=float)
+    m, n = len(query), len(series)
+    if n < m:
+        return np.empty(0)
+
+    missing = np.isnan(series)
+    clean = np.where(missing, 0.0, series)
+    missing_count = np.convolve(missing.astype(float), np.ones(m), mode='valid')
+
+    mean_t, std_t = _rolling_mean_std(clean, m)
+    mean_q, std_q = query.mean(), query.std()
+    flat_t = std_t < 1e-12 * np.maximum(np.abs(mean_t), 1)
+    flat_q = std_q < 1e-12 * max(abs(mean_q), 1)
+
+    if flat_q:
+        distance = np.where(flat_t, 0.0, np.sqrt(m))
+    else:
+        dot = sliding_dot_product(query, clean)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            correlation = (dot - m * mean_q * mean_t) / (m * std_q * std_t)
+        distance = np.sqrt(2 * m * np.maximum(1 - np.clip(correlation, -1, 1), 0))
+        distance[flat_t] = np.sqrt(m)
+
+    distance[missing_count > 0] = np.inf
+    return distance
+
+
+def multi_column_profile(query_frame, data, columns):
+    """
+    多列距离：各列z标准化距离的平方和开方（每列同等权重）
+
+    参数:
+    query_frame: 查询窗口DataFrame
+    data: 被搜索的股票DataFrame
+    columns: 参与匹配的列
+
+    返回:
+    ndarray: 每个子序列起点的综合距离
+    """
+    total = None
+    for column in columns:
+        profile = mass_distance_profile(query_frame[column].to_numpy(dtype=float),
+                                        data[column].to_numpy(dtype=float))
+        total = profile ** 2 if total is None else total + profile ** 2
+    return np.sqrt(total)
+
+
+def top_k_matches(distance, k, exclusion_zone):
+    """
+    取距离最小的k个子序列，已选中位置前后exclusion_zone内的起点不再入选（避免重叠的平凡匹配）
+
+    返回:
+    list: 起点下标，按距离从小到大
+    """
+    distance = np.array(distance, dtype=float)
+    matches = []
+    for _ in range(k):
+        if len(distance) == 0:
+            break
+        index = int(np.argmin(distance))
+        if not np.isfinite(distance[index]):
+            break
+        matches.append(index)
+        distance[max(0, index - exclusion_zone):index + exclusion_zone + 1] = np.inf
+    return matches
+
+
+def forward_returns(stock_data, end_index, forward_days):
+    """
+    匹配窗口结束后forward_days个交易日的累计涨跌幅（%，按涨跌幅列复利计算），数据不足时为NaN
+    """
+    if '涨跌幅' not in stock_data.columns:
+        return {days: np.nan for days in forward_days}
+    changes = stock_data['涨跌幅'].to_numpy(dtype=float)
+    result = {}
+    for days in forward_days:
+        following = changes[end_index + 1:end_index + 1 + days]
+        if len(following) < days:
+            result[days] = np.nan
+        else:
+            result[days] = (np.prod(1 + following / 100) - 1) * 100
+    return result
+
+
+def search_similar(stock_data, columns=None, window=20, top_k=5, forward_days=(5, 10, 20), universe=None,
+                   stock_code=None, exclusion_zone=None):
+    """
+    查找与最近window个交易日走势最相似的历史区间
+
+    参数:
+    stock_data: 按日期排序的股票DataFrame，最后window行为查询窗口
+    columns: 参与匹配的列，默认收盘和成交量
+    window: 窗口长度（交易日）
+    top_k: 返回的相似区间数量
+    forward_days: 统计匹配区间之后的涨跌幅的天数
+    universe: {股票代码: 股票DataFrame}，提供时同时在这些股票的历史中搜索
+    stock_code: 当前股票代码，用于结果展示及在universe中识别自身
+    exclusion_zone: 同一股票两个匹配起点的最小间隔，默认为window/2
+
+    返回:
+    DataFrame: 股票代码、开始日期、结束日期、距离、后N日涨跌幅，按距离升序
+    """
+    columns = list(columns or DEFAULT_PATTERN_COLUMNS)
+    missing = [column for column in columns if column not in stock_data.columns]
+    if missing:
+        raise KeyError(f"列名 {missing} 不存在。可用列名: {list(stock_data.columns)}")
+    if len(stock_data) < window * 2:
+        raise ValueError(f"数据量不足，至少需要{window * 2}条记录")
+
+    if exclusion_zone is None:
+        exclusion_zone = max(1, window // 2)
+    query = stock_data.iloc[-window:]
+    if query[columns].isna().any().any():
+        raise ValueError("查询窗口包含空值")
+
+    candidates = {stock_code: stock_data}
+    if universe:
+        candidates.update({code: data for code, data in universe.items() if code != stock_code})
+
+    rows = []
+    for code, data in candidates.items():
+        if data is None or len(data) < window or any(column not in data.columns for column in columns):
+            continue
+        distance = multi_column_profile(query, data, columns)
+        if code == stock_code:
+            # 排除与查询窗口重叠的子序列
+            distance[max(0, len(data) - 2 * window + 1):] = np.inf
+        for start in top_k_matches(distance, top_k, exclusion_zone):
+            end = start + window - 1
+            row = {
+                '股票代码': code,
+                '开始日期': data['日期'].iloc[start] if '日期' in data.columns else start,
+                '结束日期': data['日期'].iloc[end] if '日期' in data.columns else end,
+                '距离': float(distance[start])
+            }
+            for days, value in forward_returns(data, end, forward_days).items():
+                row[f'后{days}日涨跌幅'] = value
+            rows.append(row)
+
+    result = pd.DataFrame(rows)
+    if result.empty:
+        return result
+    return result.sort_values('距离', kind='mergesort').head(top_k).reset_index(drop=True)
+
+
+def summarize_matches(matches, forward_days=(5, 10, 20)):
+    """
+    统计相似区间之后的表现
+
+    返回:
+    dict: {天数: {'平均涨跌幅', '中位数涨跌幅', '上涨比例', '样本数'}}
+    """
+    summary = {}
+    for days in forward_days:
+        column = f'后{days}日涨跌幅'
+        if column not in matches.columns:
+            continue
+        values = matches[column].dropna()
+        summary[days] = {
+            '平均涨跌幅': float(values.mean()) if len(values) else np.nan,
+            '中位数涨跌幅': float(values.median()) if len(values) else np.nan,
+            '上涨比例': float((values > 0).mean() * 100) if len(values) else np.nan,
+            '样本数': len(values)
+        }
+    return summary
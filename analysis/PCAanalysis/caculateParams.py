@@ -1,5 +1,6 @@
 import numpy as np
 import re
+import tools.traceTools as TT
 
 # 根据列名提取增强版
 def get_column_by_name(df, column_name):
@@ -37,6 +38,7 @@ def is_calculation_expression(column_name):
     return any(op in column_name for op in operators)
 
 # 支持根据传入的字符进行四则运算
+@TT.traced()
 def add_calculated_column(df, expression, new_column_name=None):
     """
     为DataFrame添加通过四则运算计算的新列
@@ -78,7 +80,7 @@ def add_calculated_column(df, expression, new_column_name=None):
         # 添加到DataFrame
         df_result[new_column_name] = new_column
 
-        print(f"成功添加列: {new_column_name} = {expression}")
+        TT.log(f"成功添加列: {new_column_name} = {expression}")
 
     except Exception as e:
         print(f"计算失败: {e}")
@@ -0,0 +1,266 @@
+import atexit
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+import analysis.LEVELanalysis.level as level
+import analysis.HISAnalysis.getHis as getHis
+import analysis.HISAnalysis.sortedCache as sortedCache
+import tools.dataTools as DT
+import tools.cacheTools as CaT
+import tools.panelTools as PT
+
+# 子进程中连接的共享面板（见screen_universe的shared_memory参数），未使用共享内存时为None
+_panel = None
+# 常驻的单进程进程池，第i个进程固定处理分片i的股票，
+# 使子进程内的sortedCache.DEFAULT_CACHE在多次screen_universe调用之间保持有效
+_pools = []
+
+
+def screen_symbol(stock_code, stock_data, history_data, quantity_data, analysis_target, valuation_data=None):
+    """
+    对单只股票运行位置判断和历史分位分析，整理成一行筛选结果
+    valuation_data: 历史估值数据，提供时增加估值分位相关列
+
+    返回:
+    dict: 趋势、位置、各分析目标的历史分位和超量等级；分析失败时包含错误信息
+    """
+    row = {'股票代码': stock_code}
+
+    if isinstance(analysis_target, str):
+        analysis_target = [analysis_target]
+
+    try:
+        level_result = level.getLevel(stock_data, valuation_data)
+        historical = level_result['历史位置分析']
+        row.update({
+            '分析时间': level_result['分析时间'],
+            '收盘价': level_result['趋势分析']['收盘价'],
+            '趋势': level_result['趋势分析']['趋势'],
+            '位置百分比': historical.get('位置百分比'),
+            '位置级别': historical.get('位置级别', historical.get('历史位置分析')),
+            '综合建议': level_result['综合建议']
+        })
+        valuation_result = level_result['估值分析']
+        if valuation_result is not None and '综合估值' in valuation_result:
+            row.update({
+                '综合估值': valuation_result['综合估值'],
+                'PE历史分位': valuation_result['PE历史分位'],
+                'PB历史分位': valuation_result['PB历史分位']
+            })
+    except Exception as e:
+        row['错误信息'] = f"位置判断失败: {e}"
+        return row
+
+    try:
+        # 使用进程内的有序索引缓存，同一会话中重复筛选时只需增量更新
+        his_result = getHis.getHisAnalysis(history_data, quantity_data, analysis_target,
+                                           symbol=stock_code, cache=sortedCache.DEFAULT_CACHE)
+    except Exception as e:
+        row['错误信息'] = f"历史分位分析失败: {e}"
+        return row
+
+    for target in analysis_target:
+        target_result = his_result.get(target, {})
+        if '错误信息' in target_result:
+            row[f'{target}历史分位'] = None
+            continue
+        row[f'{target}历史分位'] = target_result.get('历史分位')
+        row[f'{target}历史水平'] = target_result.get('历史水平')
+        row[f'{target}排名百分比'] = target_result.get('排名百分比')
+        row[f'{target}超量提示'] = target_result.get('超量提示')
+        row[f'{target}超量等级'] = target_result.get('超量等级')
+
+    return row
+
+
+def _use_panel(name):
+    """子进程中切换到本次筛选发布的共享面板，断开上一次的面板"""
+    global _panel
+    if _panel is not None and _panel.name != name:
+        _panel.close()
+        _panel = None
+    if name is not None and _panel is None:
+        _panel = PT.SharedPanel.attach(name)
+
+
+def _worker_pools(workers):
+    """返回workers个常驻单进程进程池，不足时补建"""
+    if not _pools:
+        atexit.register(shutdown_pools)
+    while len(_pools) < workers:
+        _pools.append(ProcessPoolExecutor(max_workers=1))
+    return _pools[:workers]
+
+
+def shutdown_pools():
+    """关闭常驻进程池（子进程中的有序索引缓存随之释放）"""
+    while _pools:
+        _pools.pop().shutdown(wait=True)
+
+
+def _shard(stock_code, workers):
+    """股票固定分配到的分片编号，不随进程或调用变化"""
+    return zlib.crc32(str(stock_code).encode('utf-8')) % workers
+
+
+def _screen_shard(stock_codes, panel_name, *params):
+    """进程池任务：在同一子进程中依次筛选一个分片的股票"""
+    _use_panel(panel_name)
+    return [_screen_worker(stock_code, *params) for stock_code in stock_codes]
+
+
+def _screen_worker(stock_code, days, history_days, quantity_days, analysis_target, valuation_days=0,
+                   use_cache=False):
+    """
+    进程池任务：读取（缓存的）数据并分析单只股票，use_cache时数据未变化的股票直接使用上次的结果
+
+    已连接共享面板时从共享内存读取数据，返回的只有一行筛选结果
+    """
+    try:
+        if _panel is not None:
+            full_data = _panel.frame(stock_code)
+        else:
+            full_data = DT.getDataCached(stock_code, max(days, history_days, quantity_days))
+        if full_data.empty:
+            return {'股票代码': stock_code, '错误信息': '未获取到数据'}
+
+        stock_data = DT.sliceRecentDays(full_data, days)
+        history_data = DT.sliceRecentDays(full_data, history_days)
+        quantity_data = DT.sliceRecentDays(full_data, quantity_days)
+        valuation_data = DT.getValuationDataCached(stock_code, valuation_days) if valuation_days else None
+        config = {'days': days, 'history_days': history_days, 'quantity_days': quantity_days,
+                  'analysis_target': analysis_target}
+        return CaT.cached_call(CaT.DEFAULT_RESULT_CACHE if use_cache else None, 'screen', stock_code,
+                               [full_data, valuation_data], config,
+                               lambda: screen_symbol(stock_code, stock_data, history_data, quantity_data,
+                                                     analysis_target, valuation_data))
+    except Exception as e:
+        return {'股票代码': stock_code, '错误信息': f"分析失败: {e}"}
+
+
+def screen_universe(symbols, days=1000, history_days=2000, quantity_days=20, analysis_target='成交量',
+                    workers=None, use_processes=True, sort_by='位置百分比', ascending=True, valuation_days=0,
+                    use_cache=False, shared_memory=True):
+    """
+    对股票列表批量运行getLevel和getHisAnalysis
+
+    每只股票只读取一次数据（按最大天数获取并缓存到本地），再按各分析所需天数截取
+
+    参数:
+    symbols: 股票代码列表
+    days: 位置判断使用的天数
+    history_days: 历史分位使用的天数
+    quantity_days: 量比分析使用的天数
+    analysis_target: 历史分位分析目标（列名或表达式，字符串或列表）
+    workers: 并行数量，默认为CPU核数
+    use_processes: True使用常驻进程池（CPU密集的分析），每只股票固定由同一子进程处理，
+                   重复筛选时命中子进程内的有序索引缓存；False使用线程池
+    sort_by: 结果排序列
+    ascending: 是否升序
+    valuation_days: 估值分析使用的历史天数，0表示不做估值分析
+    use_cache: 是否使用结果缓存（cacheTools.DEFAULT_RESULT_CACHE），数据和参数未变化的股票不再重新分析
+    shared_memory: 使用进程池时，主进程先（用线程池）读取全部数据放入共享内存，子进程直接读取，
+                   不再各自读取本地缓存文件
+
+    返回:
+    DataFrame: 每只股票一行的筛选结果
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    symbols = list(symbols)
+    params = (days, history_days, quantity_days, analysis_target, valuation_days, use_cache)
+
+    if not (use_processes and workers > 1):
+        # 线程池在主进程内运行，直接共用主进程的有序索引缓存
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(lambda code: _screen_worker(code, *params), symbols))
+    else:
+        shards = [[] for _ in range(workers)]
+        for index, stock_code in enumerate(symbols):
+            shards[_shard(stock_code, workers)].append(index)
+
+        panel = None
+        if shared_memory:
+            max_days = max(days, history_days, quantity_days)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                frames = dict(zip(symbols, executor.map(lambda code: DT.getDataCached(code, max_days), symbols)))
+            panel = PT.SharedPanel.publish(frames)
+            del frames
+
+        rows = [None] * len(symbols)
+        pools = _worker_pools(workers)
+        try:
+            futures = [(indexes, pool.submit(_screen_shard, [symbols[i] for i in indexes],
+                                             panel.name if panel is not None else None, *params))
+                       for pool, indexes in zip(pools, shards) if indexes]
+            for indexes, future in futures:
+                for i, row in zip(indexes, future.result()):
+                    rows[i] = row
+        except BrokenProcessPool:
+            # 子进程异常退出后进程池不可再用，下次调用时重建
+            shutdown_pools()
+            raise
+        finally:
+            if panel is not None:
+                if _pools:
+                    # 子进程先断开面板，主进程释放后共享内存即可回收
+                    for future in [pool.submit(_use_panel, None) for pool in pools]:
+                        future.result()
+                panel.close()
+
+    result = pd.DataFrame(rows)
+    if sort_by in result.columns:
+        result = result.sort_values(sort_by, ascending=ascending, na_position='last').reset_index(drop=True)
+    return result
+
+
+def filter_screen(result, position_levels=None, trends=None, volume_alert=None, alert_target=None,
+                  min_percentile=None, max_percentile=None, percentile_target=None, valuation_levels=None):
+    """
+    按条件过滤筛选结果
+
+    参数:
+    result: screen_universe的返回值
+    position_levels: 保留的位置级别列表，如['历史低位']
+    trends: 保留的趋势列表，如['强势上行', '上行趋势']
+    volume_alert: True只保留超量的股票，False只保留正常范围的股票
+    alert_target: 判断超量使用的分析目标，默认使用第一个带超量提示的目标
+    min_percentile/max_percentile: 历史分位范围（0-100）
+    percentile_target: 历史分位使用的分析目标，默认同alert_target
+    valuation_levels: 保留的综合估值列表，如['低估区域']
+
+    返回:
+    DataFrame: 满足所有条件的行
+    """
+    mask = pd.Series(True, index=result.index)
+
+    if position_levels is not None and '位置级别' in result.columns:
+        mask &= result['位置级别'].isin(position_levels)
+
+    if trends is not None and '趋势' in result.columns:
+        mask &= result['趋势'].isin(trends)
+
+    if valuation_levels is not None and '综合估值' in result.columns:
+        mask &= result['综合估值'].isin(valuation_levels)
+
+    if alert_target is None:
+        alert_columns = [col for col in result.columns if col.endswith('超量提示')]
+        alert_target = alert_columns[0][:-len('超量提示')] if alert_columns else None
+    if percentile_target is None:
+        percentile_target = alert_target
+
+    if volume_alert is not None and alert_target is not None:
+        is_alert = result[f'{alert_target}超量提示'].fillna('').str.contains('超量')
+        mask &= is_alert if volume_alert else ~is_alert
+
+    percentile_column = f'{percentile_target}历史分位'
+    if percentile_column in result.columns:
+        if min_percentile is not None:
+            mask &= result[percentile_column] >= min_percentile
+        if max_percentile is not None:
+            mask &= result[percentile_column] <= max_percentile
+
+    return result[mask].reset_index(drop=True)
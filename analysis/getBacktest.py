@@ -0,0 +1,221 @@
+import numpy as np
+import pandas as pd
+import tools.dfTools as DfT
+import analysis.BACKTESTanalysis.backtest as backtest
+import analysis.BACKTESTanalysis.sweep as sweep
+
+# 支持的策略
+STRATEGIES = {
+    'trend': '均线趋势',
+    'position': '历史位置',
+    'suggestion': '位置+趋势综合建议',
+    'percentile': '历史分位',
+    'feature': 'PCA特征排名'
+}
+
+
+def rank_pca_features(stock_data, features, top_n=2):
+    """
+    用PCA相似度对特征排序，返回与明日涨跌幅关联度最高的top_n个特征及其方向
+
+    参数:
+    stock_data: 股票DataFrame，或{股票代码: 股票DataFrame}（各股票分别计算明日涨跌幅后合并拟合）
+
+    返回:
+    tuple: (特征列表, 方向列表)，方向为1（正相关）或-1（负相关）
+    """
+    # sklearn只在使用PCA特征策略时导入
+    import analysis.PCA as PCA
+    frames = stock_data.values() if isinstance(stock_data, dict) else [stock_data]
+    reshaped = pd.concat([DfT.reshape_stock_data(frame)[features + ["明日涨跌幅"]] for frame in frames
+                          if frame is not None and not frame.empty], ignore_index=True).dropna()
+    analyzer = PCA.PCASimilarity(n_components=min(3, len(features)), feature_names=features)
+    analyzer.fit(DfT.extract_columns_to_ndarray(reshaped, features),
+                 DfT.extract_columns_to_ndarray(reshaped, "明日涨跌幅"))
+    rankings = analyzer.rank_features_with_direction()[:top_n]
+    return [item[0] for item in rankings], [-1 if item[2] == '-' else 1 for item in rankings]
+
+
+def train_split(market, train_ratio=0.5):
+    """
+    样本划分：回测日期的前train_ratio部分为训练期，之后为回测期
+
+    返回:
+    int: 回测期第一天在market['日期']中的位置
+    """
+    if not 0 < train_ratio < 1:
+        raise ValueError(f"train_ratio应在0和1之间: {train_ratio}")
+    start = int(len(market['日期']) * train_ratio)
+    if start == 0 or start >= len(market['日期']):
+        raise ValueError("数据太少，无法划分训练期和回测期")
+    return start
+
+
+def training_data(stock_data_dict, market, start):
+    """各股票在训练期（回测期第一天之前）的数据"""
+    split_date = market['日期'][start]
+    return {code: stock_data[pd.to_datetime(stock_data['日期']) < split_date]
+            for code, stock_data in stock_data_dict.items()}
+
+
+def backtest_period(market, entries, exits, start):
+    """把market和买卖条件截取为从start开始的回测期"""
+    market = dict(market, 日期=market['日期'][start:], 开盘=market['开盘'][start:], 收盘=market['收盘'][start:])
+    return market, entries[..., start:, :], exits[..., start:, :]
+
+
+def build_signals(stock_data_dict, market, strategy, params):
+    """
+    按策略生成买卖条件
+
+    参数:
+    stock_data_dict: {股票代码: 股票DataFrame}
+    market: backtest.prepare_market的返回值
+    strategy: STRATEGIES中的策略名
+    params: 策略参数（见backtest_config.json）；entry_below/exit_above为列表时每个值对应一个参数组
+
+    返回:
+    tuple: (entries, exits, 参数说明列表, 回测期第一天的位置)；
+           用PCA选特征时前train_ratio部分日期为训练期（只用于选特征），回测期从训练期之后开始，其他策略为0
+    """
+    start = 0
+    if strategy == 'trend':
+        entries, exits = backtest.trend_signals(stock_data_dict, market)
+        return entries, exits, ["均线趋势"], start
+    if strategy == 'suggestion':
+        entries, exits = backtest.suggestion_signals(stock_data_dict, market, params.get('period_years', 3))
+        return entries, exits, ["低位且趋势向上买入"], start
+
+    if strategy == 'position':
+        values = backtest.position_values(stock_data_dict, market, params.get('period_years', 3))
+    elif strategy == 'percentile':
+        values = backtest.percentile_values(stock_data_dict, market, params.get('analysis_target', '成交量'),
+                                            params.get('window'))
+    elif strategy == 'feature':
+        features, directions = params.get('features'), params.get('directions')
+        if params.get('rank_by_pca', True):
+            # 只用训练期的数据（所有股票合并）选特征，避免用回测期的涨跌幅选出特征后再回测同一段时间
+            start = train_split(market, params.get('train_ratio', 0.5))
+            features, directions = rank_pca_features(training_data(stock_data_dict, market, start), features,
+                                                     params.get('top_n', 2))
+            print(f"   • PCA选出的特征: {', '.join(f'{f}({d:+d})' for f, d in zip(features, directions))}")
+        values = backtest.feature_values(stock_data_dict, market, features, directions,
+                                         params.get('window', 250))
+    else:
+        raise ValueError(f"不支持的策略: {strategy}，可选: {list(STRATEGIES)}")
+
+    entry_below = np.atleast_1d(params.get('entry_below', 20))
+    exit_above = np.atleast_1d(params.get('exit_above', 80))
+    entry_below, exit_above = np.broadcast_arrays(entry_below, exit_above)
+    entries, exits = backtest.threshold_signals(values, entry_below=entry_below, exit_above=exit_above)
+    labels = [f"低于{low:g}买入/高于{high:g}卖出" for low, high in zip(entry_below, exit_above)]
+    return entries, exits, labels, start
+
+
+def outputBacktest(stock_data_dict, strategy='trend', params=None, execution='open', costs=None,
+                   stop_loss=None, max_hold_days=None):
+    """
+    策略回测结果输出函数
+
+    参数:
+    stock_data_dict: {股票代码: 股票DataFrame}
+    strategy: 策略名，见STRATEGIES
+    params: 策略参数
+    execution: 'open'为次日开盘成交，'close'为当日收盘成交
+    costs: 交易成本
+    stop_loss: 止损比例
+    max_hold_days: 最长持仓交易日数
+    """
+    params = params or {}
+    try:
+        market = backtest.prepare_market(stock_data_dict)
+        entries, exits, labels, start = build_signals(stock_data_dict, market, strategy, params)
+        training_dates = market['日期'][:start]
+        market, entries, exits = backtest_period(market, entries, exits, start)
+        result = backtest.run_backtest(market, entries, exits, execution, costs, stop_loss, max_hold_days)
+    except Exception as e:
+        print(f"策略回测失败: {e}")
+        return None
+
+    print("🧪" + "=" * 70 + "🧪")
+    print(" " * 27 + "策略回测报告")
+    print("🧪" + "=" * 70 + "🧪")
+    dates = market['日期']
+    print(f"\n📊 回测设置:")
+    print(f"   • 策略: {STRATEGIES.get(strategy, strategy)}")
+    print(f"   • 股票数量: {len(market['股票代码'])}")
+    if len(training_dates):
+        print(f"   • 样本划分: 训练期 {training_dates[0].date()} ~ {training_dates[-1].date()}"
+              f"（{len(training_dates)}个交易日，只用于PCA选特征），之后为回测期")
+    print(f"   • 回测区间: {dates[0].date()} ~ {dates[-1].date()}（{len(dates)}个交易日）")
+    print(f"   • 成交方式: {'信号次日开盘价' if execution == 'open' else '信号当日收盘价'}，T+1，涨停不买、跌停不卖")
+    if stop_loss is not None:
+        print(f"   • 止损: {stop_loss}")
+    if max_hold_days is not None:
+        print(f"   • 最长持仓: {max_hold_days}个交易日")
+
+    stats = result['统计']
+    stats.insert(0, '参数', labels if len(labels) == len(stats) else labels * len(stats))
+    print(f"\n📋 各参数组表现:")
+    print(stats.to_string(float_format=lambda x: f"{x:.2f}"))
+
+    best = stats['总收益(%)'].idxmax()
+    icon = "📈" if stats.at[best, '总收益(%)'] > 0 else "📉"
+    print(f"\n{icon} 最佳参数组: {best}（{stats.at[best, '参数']}）")
+    print(f"   总收益 {stats.at[best, '总收益(%)']:+.2f}%，年化 {stats.at[best, '年化收益(%)']:+.2f}%，"
+          f"最大回撤 {stats.at[best, '最大回撤(%)']:.2f}%，胜率 {stats.at[best, '胜率(%)']:.1f}%")
+
+    per_symbol = result['个股统计']
+    per_symbol = per_symbol[per_symbol['参数组'] == best].sort_values('总收益(%)', ascending=False)
+    print(f"\n🏆 最佳参数组下的个股表现（前10）:")
+    print(per_symbol.head(10).to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+
+    print("🔚" + "=" * 70 + "🔚")
+    return result
+
+
+# 各规则当前写死的参数，扫描结果中标注以便对比
+CURRENT_DEFAULTS = {
+    '压力位': (60, 0.8),
+    '历史位置': (3, 80.0),
+    '均线偏离': (20, 5.0),
+    '超量提示': (20, 70.0)
+}
+
+
+def outputSweep(stock_data_dict, grid=None, forward_days=sweep.DEFAULT_FORWARD_DAYS, output_file=None):
+    """
+    参数扫描结果输出函数
+
+    参数:
+    stock_data_dict: {股票代码: 股票DataFrame}
+    grid: 参数网格，覆盖sweep.DEFAULT_SWEEP_GRID中的对应项
+    forward_days: 统计信号之后收益的天数
+    output_file: 结果立方体保存路径（csv），为None时不保存
+    """
+    try:
+        cubes = sweep.run_sweep(stock_data_dict, grid, forward_days)
+    except Exception as e:
+        print(f"参数扫描失败: {e}")
+        return None
+
+    print("🧮" + "=" * 70 + "🧮")
+    print(" " * 25 + "参数敏感性分析报告")
+    print("🧮" + "=" * 70 + "🧮")
+    print(f"\n📊 股票数量: {len(stock_data_dict)}，统计信号之后 {', '.join(map(str, forward_days))} 日的收益")
+
+    days = list(forward_days)[-1]
+    for family, cube in cubes.items():
+        table = sweep.sensitivity(cube)
+        columns = [f'后{days}日信号次数', f'后{days}日平均收益(%)', f'后{days}日上涨比例(%)']
+        print(f"\n📋 {family}（参数: {', '.join(sweep.FAMILY_DIMENSIONS[family])}，★为当前默认值）:")
+        marks = ['★' if key[:2] == CURRENT_DEFAULTS.get(family) else '' for key in table.index]
+        print(table[columns].assign(默认=marks).to_string(float_format=lambda x: f"{x:.2f}"))
+
+    if output_file:
+        frames = [cube.reset_index().assign(规则=family) for family, cube in cubes.items()]
+        pd.concat(frames, ignore_index=True).to_csv(output_file, index=False, encoding='utf-8-sig')
+        print(f"\n💾 结果立方体已保存到 {output_file}")
+
+    print("🔚" + "=" * 70 + "🔚")
+    return cubes
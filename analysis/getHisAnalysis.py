@@ -1,13 +1,38 @@
 import analysis.HISAnalysis.getHis as getHis
+import tools.cacheTools as CaT
 
 
-def outputHisAnalysis(history_data, quantity_data, analysis_target):
+def hisResult(history_data, quantity_data, analysis_target, sketches=None, symbol=None, cross_section=None,
+              result_cache=None):
+    """
+    历史分位分析结果（不打印），参数同outputHisAnalysis
+    """
+    if sketches is not None or cross_section is not None:
+        result_cache = None
+    return CaT.cached_call(result_cache, 'his', symbol, [history_data, quantity_data],
+                           {'analysis_target': analysis_target},
+                           lambda: getHis.getHisAnalysis(history_data, quantity_data, analysis_target,
+                                                         symbol=symbol, sketches=sketches,
+                                                         cross_section=cross_section))
+
+
+def outputHisAnalysis(history_data, quantity_data, analysis_target, sketches=None, symbol=None, cross_section=None,
+                      result_cache=None):
     """
     优化版的历史分位分析结果输出函数
     提供清晰、结构化的分析报告
+    sketches: {分析目标: KLLSketch}，提供时历史分位为草图近似值
+    symbol/cross_section: 同时提供时在历史分位旁显示全市场分位
+    result_cache: cacheTools.ResultCache，提供时数据和参数未变化则直接使用上次的分析结果
+                  （使用草图或全市场分位时结果依赖其他数据，不缓存）
     """
-    output = getHis.getHisAnalysis(history_data, quantity_data, analysis_target)
+    output = hisResult(history_data, quantity_data, analysis_target, sketches, symbol, cross_section, result_cache)
+    renderHisText(output)
+    return output
+
 
+def renderHisText(output):
+    """把历史分位分析结果打印为文本报告（其他输出格式见reportTools）"""
     # 打印报告头部
     print("🔍" + "=" * 70 + "🔍")
     print(" " * 25 + "历史分位分析报告")
@@ -41,25 +66,27 @@ def outputHisAnalysis(history_data, quantity_data, analysis_target):
 
         # 历史位置分析（重点突出）
         print(f"\n📅 历史位置分析（基于{result.get('数据信息', {}).get('历史数据量', 0)}条历史数据）:")
-        percentile = result.get('历史分位', 'N/A')
+        percentile = result.get('历史分位')
         level = result.get('历史水平', 'N/A')
 
         # 使用颜色标识历史水平
         level_icon = "🚨" if "极高" in level else "⚠️" if "高" in level else "✅" if "低" in level else "📊"
-        print(f"   {level_icon} 历史分位: {percentile} - {level}")
-        print(f"   • 高于历史比例: {result.get('高于历史比例', 'N/A')}")
-        print(f"   • 低于历史比例: {result.get('低于历史比例', 'N/A')}")
+        print(f"   {level_icon} 历史分位: {_percent(percentile)} - {level}")
+        print(f"   • 高于历史比例: {_percent(result.get('高于历史比例'))}")
+        print(f"   • 低于历史比例: {_percent(result.get('低于历史比例'))}")
+        if '全市场分位' in result:
+            print(f"   🌐 全市场分位: {_percent(result['全市场分位'])}"
+                  f"（当日排名 {result.get('全市场排名', 'N/A')}/{result.get('全市场有效数量', 'N/A')}）")
 
         # 近期表现分析（明确说明时间范围）
         recent_days = result.get('数据信息', {}).get('近期数据量', 15)
         print(f"\n🔄 近期表现分析（最近{recent_days}个交易日）:")
-        rank_info = result.get('近期排名', 'N/A')
-        rank_percent = result.get('排名百分比', 'N/A')
+        rank = result.get('近期排名', 'N/A')
         alert = result.get('超量提示', 'N/A')
         alert_level = result.get('超量等级', 'N/A')
 
-        print(f"   📊 近期排名: {rank_info}（当前值在最近{recent_days}天中排名第{rank_info.split('/')[0]}位）")
-        print(f"   📈 排名百分比: {rank_percent}")
+        print(f"   📊 近期排名: {rank}/{recent_days}（当前值在最近{recent_days}天中排名第{rank}位）")
+        print(f"   📈 排名百分比: {_percent(result.get('排名百分比'))}")
 
         # 风险提示（明确说明含义）
         alert_icon = "🚨" if "高风险" in alert_level else "⚠️" if "中等风险" in alert_level else "✅"
@@ -102,6 +129,8 @@ def outputHisAnalysis(history_data, quantity_data, analysis_target):
             print(f"   • 近期数据量: {data_info.get('近期数据量', 'N/A')}天")
             if '使用列名' in data_info:
                 print(f"   • 计算使用列: {', '.join(data_info['使用列名'])}")
+            if '分位误差' in data_info:
+                print(f"   • 近似分位误差: ±{data_info['分位误差']:.2f}%")
 
     # 综合评估和建议
     print("\n💡" + "=" * 60 + "💡")
@@ -114,8 +143,8 @@ def outputHisAnalysis(history_data, quantity_data, analysis_target):
     if successful_targets:
         print("✅ 成功分析指标:")
         for target_name, result in successful_targets:
-            percentile = float(result.get('历史分位', '0%').rstrip('%'))
-            rank_percent = float(result.get('排名百分比', '0%').rstrip('%'))
+            percentile = result.get('历史分位', 0.0)
+            rank_percent = result.get('排名百分比', 0.0)
 
             # 生成针对性的评估
             level_icon = "🚨" if percentile >= 80 else "💡" if percentile <= 20 else "📊"
@@ -144,4 +173,36 @@ def outputHisAnalysis(history_data, quantity_data, analysis_target):
     print(" " * 28 + "分析结束")
     print("🔚" + "=" * 70 + "🔚")
 
-    return output
\ No newline at end of file
+
+def _percent(value):
+    """0-100的数值显示为百分比，缺失时显示N/A"""
+    return f"{value:.2f}%" if isinstance(value, (int, float)) else 'N/A'
+
+def outputIntradayAnalysis(stock_code, metrics):
+    """
+    日内量比分析结果输出函数
+    metrics: intraday.IntradayVolumeRatio.metrics()的返回值
+    """
+    print("⏱️" + "=" * 70 + "⏱️")
+    print(" " * 25 + f"{stock_code} 日内量比分析")
+    print("⏱️" + "=" * 70 + "⏱️")
+
+    if '错误信息' in metrics:
+        print(f"❌ 分析失败: {metrics['错误信息']}")
+        return metrics
+
+    data_info = metrics.get('数据信息', {})
+    print(f"📅 日期: {metrics.get('日期')}（已交易{metrics.get('交易分钟')}/240分钟）")
+    print(f"💰 累计成交量: {metrics.get('累计成交量', 0):,.0f}")
+    print(f"📊 过去{data_info.get('基准天数', 0)}日同时段均量: {metrics.get('同时段均量', float('nan')):,.0f}")
+    print(f"📈 量比: {metrics.get('量比', float('nan')):.2f}")
+
+    alert_level = metrics.get('超量等级', 'N/A')
+    alert_icon = "🚨" if "高风险" in alert_level else "⚠️" if "中等风险" in alert_level else "✅"
+    print(f"\n🔄 同时段排名: {metrics.get('近期排名')}/{data_info.get('近期数据量', 'N/A')}"
+          f"（排名百分比 {_percent(metrics.get('排名百分比'))}）")
+    print(f"   {alert_icon} 风险提示: {metrics.get('超量提示')}")
+    print(f"   • 风险等级: {alert_level}")
+
+    print("🔚" + "=" * 70 + "🔚")
+    return metrics
@@ -1,12 +1,34 @@
 import analysis.LEVELanalysis.level as level
+import tools.cacheTools as CaT
 
-def outputLevelInfo(stock_data, valuation_data=None, current_pe=None, current_pb=None):
+def levelResult(stock_data, valuation_data=None, current_pe=None, current_pb=None, ma_windows=None,
+                profile_windows=None, indicator_params=None, result_cache=None, symbol=None):
+    """
+    股票位置分析结果（不打印），参数同outputLevelInfo
+    """
+    config = {'current_pe': current_pe, 'current_pb': current_pb, 'ma_windows': ma_windows,
+              'profile_windows': profile_windows, 'indicator_params': indicator_params}
+    return CaT.cached_call(result_cache, 'level', symbol, [stock_data, valuation_data], config,
+                           lambda: level.getLevel(stock_data, valuation_data, current_pe, current_pb,
+                                                  ma_windows=ma_windows, profile_windows=profile_windows,
+                                                  indicator_params=indicator_params))
+
+
+def outputLevelInfo(stock_data, valuation_data=None, current_pe=None, current_pb=None, ma_windows=None,
+                    profile_windows=None, indicator_params=None, result_cache=None, symbol=None):
     """
     输出完整的股票分析信息（优化版）
+    result_cache: cacheTools.ResultCache，提供时数据和参数未变化则直接使用上次的分析结果
+    symbol: 股票代码，作为缓存键的一部分
     """
-    # 调用分析函数
-    result = level.getLevel(stock_data, valuation_data, current_pe, current_pb)
+    result = levelResult(stock_data, valuation_data, current_pe, current_pb, ma_windows, profile_windows,
+                         indicator_params, result_cache, symbol)
+    renderLevelText(result)
+    return result
+
 
+def renderLevelText(result):
+    """把位置分析结果打印为文本报告（其他输出格式见reportTools）"""
     # 打印结果
     print("=" * 60)
     print(f"分析日期: {result['分析时间']}")
@@ -19,6 +41,8 @@ def outputLevelInfo(stock_data, valuation_data=None, current_pe=None, current_pb
     print(f"  MA10: {trend['MA10']:.2f}")
     print(f"  MA20: {trend['MA20']:.2f}")
     print(f"  MA30: {trend['MA30']:.2f}")
+    for column, value in result.get('均线数值', {}).items():
+        print(f"  {column}: {value:.2f}")
     print(f"  趋势状态: {trend['趋势']}")
 
     # 2. 压力位分析
@@ -58,6 +82,10 @@ def outputLevelInfo(stock_data, valuation_data=None, current_pe=None, current_pb
             print(f"  PE分位: {valuation.get('PE分位', 'N/A')}")
             print(f"  PB分位: {valuation.get('PB分位', 'N/A')}")
             print(f"  综合估值: {valuation.get('综合估值', 'N/A')}")
+            if valuation.get('PE历史分位') is not None:
+                print(f"  PE历史分位: {valuation['PE历史分位']:.2f}%")
+            if valuation.get('PB历史分位') is not None:
+                print(f"  PB历史分位: {valuation['PB历史分位']:.2f}%")
             print(f"  当前PE: {valuation.get('当前PE', 'N/A'):.2f}")
             print(f"  当前PB: {valuation.get('当前PB', 'N/A'):.2f}")
         else:
@@ -69,10 +97,35 @@ def outputLevelInfo(stock_data, valuation_data=None, current_pe=None, current_pb
     else:
         print("  无估值数据")
 
-    # 6. 综合建议（新增）
+    # 6. 成交分布分析
+    profiles = result.get('成交分布分析', {})
+    if profiles:
+        print("\n📦 成交分布分析:")
+        for window, profile in profiles.items():
+            if profile['控制点'] is None:
+                print(f"  {window}: 无成交数据")
+                continue
+            nodes = ', '.join(f"{node:.2f}" for node in profile['高成交量节点']) or '无'
+            print(f"  {window}: 控制点 {profile['控制点']:.2f}，"
+                  f"价值区 {profile['价值区下沿']:.2f} ~ {profile['价值区上沿']:.2f}，高成交量节点: {nodes}")
+
+    # 7. 技术指标分析
+    tech = result.get('技术指标分析', {})
+    if tech:
+        print("\n📐 技术指标分析:")
+        print(f"  RSI: {tech['RSI']:.2f}（{tech['RSI状态']}）")
+        macd = tech['MACD']
+        print(f"  MACD: DIF {macd['DIF']:.3f}，DEA {macd['DEA']:.3f}，MACD柱 {macd['MACD柱']:.3f}（{tech['MACD信号']}）")
+        boll = tech['BOLL']
+        print(f"  BOLL: 上轨 {boll['上轨']:.2f}，中轨 {boll['中轨']:.2f}，下轨 {boll['下轨']:.2f}（{tech['BOLL位置']}）")
+        print(f"  ATR: {tech['ATR']:.3f}（占收盘价 {tech['ATR占收盘价(%)']:.2f}%）")
+        kdj = tech['KDJ']
+        print(f"  KDJ: K {kdj['K']:.2f}，D {kdj['D']:.2f}，J {kdj['J']:.2f}（{tech['KDJ状态']}）")
+        if 'OBV' in tech:
+            print(f"  OBV: {tech['OBV']:,.0f}（{tech['OBV趋势']}）")
+
+    # 8. 综合建议（新增）
     print("\n💡 综合建议:")
     print(f"  {result.get('综合建议', '暂无建议')}")
 
-    print("=" * 60)
-
-    return result
\ No newline at end of file
+    print("=" * 60)
\ No newline at end of file
@@ -1,13 +1,14 @@
 import analysis.PCAanalysis.directParams as DP
 import tools.dfTools as DT
 import analysis.PCA as PCA
+import tools.cacheTools as CaT
 
 # 根据名称一个个获取对应参数
 def getFeatures(features,stockdata):
     return DP.get_multiple_columns(stockdata,features)
 
-# 根据传入的数据获取PCA分析结果
-def PCAResult(featuresName,stockdata):
+# 拟合PCA模型并对特征排序
+def fitPCA(featuresName,stockdata):
     # 将涨跌幅添加到最后一列
     reDF = DT.reshape_stock_data(stockdata)
     # 添加最后一列
@@ -23,7 +24,22 @@ def PCAResult(featuresName,stockdata):
 
     # 拟合模型
     similarity_analyzer.fit(features, target)
+    return similarity_analyzer, similarity_analyzer.rank_features()
+
+# 拟合（或从缓存读取）PCA模型，不打印，返回(模型, 特征排名)
+def pcaResult(featuresName,stockdata,result_cache=None,symbol=None):
+    return CaT.cached_call(result_cache, 'pca', symbol, stockdata, {'features': featuresName},
+                           lambda: fitPCA(featuresName, stockdata))
 
+# 根据传入的数据获取PCA分析结果
+# result_cache: cacheTools.ResultCache，提供时数据和特征未变化则直接使用上次拟合的模型
+def PCAResult(featuresName,stockdata,result_cache=None,symbol=None):
+    similarity_analyzer, rankings = pcaResult(featuresName, stockdata, result_cache, symbol)
+    renderPCAText(similarity_analyzer, rankings, featuresName)
+    return similarity_analyzer
+
+# 把PCA分析结果打印为文本报告（其他输出格式见reportTools）
+def renderPCAText(similarity_analyzer,rankings,featuresName):
     # 获取PCA摘要
     summary = similarity_analyzer.get_pca_summary()
 
@@ -32,8 +48,7 @@ def PCAResult(featuresName,stockdata):
     print(f"方差解释比例: {summary['explained_variance_ratio']}")
     print(f"累计方差解释: {summary['cumulative_variance_ratio']}")
 
-    # 对所有特征进行排序
-    rankings = similarity_analyzer.rank_features()
+    # 特征排名
     print(f"\n特征相似度排名:")
     for i, (feature_name, score) in enumerate(rankings):
         print(f"{i + 1}. {feature_name}: {score:.4f}")
@@ -98,6 +113,4 @@ def PCAResult(featuresName,stockdata):
         print(f"   最相关特征: '{top_feature}' 与明日涨跌幅关联度最高")
         print("   建议重点关注该指标的走势变化")
 
-    print("=" * 50)
-
-    return similarity_analyzer
\ No newline at end of file
+    print("=" * 50)
\ No newline at end of file
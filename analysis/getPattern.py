@@ -0,0 +1,52 @@
+import numpy as np
+import analysis.PATTERNanalysis.patternSearch as patternSearch
+
+
+def outputPatternSearch(stock_data, columns=None, window=20, top_k=5, forward_days=(5, 10, 20), universe=None,
+                        stock_code=None):
+    """
+    相似走势搜索结果输出函数
+
+    参数:
+    stock_data: 待分析股票的历史数据，最后window个交易日为查询窗口
+    columns: 参与匹配的列，默认收盘和成交量
+    window: 窗口长度（交易日）
+    top_k: 输出的相似区间数量
+    forward_days: 统计匹配区间之后涨跌幅的天数
+    universe: {股票代码: 股票DataFrame}，提供时在这些股票的历史中一起搜索
+    stock_code: 当前股票代码
+    """
+    columns = list(columns or patternSearch.DEFAULT_PATTERN_COLUMNS)
+    try:
+        matches = patternSearch.search_similar(stock_data, columns, window, top_k, forward_days, universe,
+                                               stock_code)
+    except Exception as e:
+        print(f"相似走势搜索失败: {e}")
+        return None
+
+    print("🔎" + "=" * 70 + "🔎")
+    print(" " * 25 + "相似走势搜索报告")
+    print("🔎" + "=" * 70 + "🔎")
+    scope = f"{len(universe)}只股票" if universe else "自身历史"
+    print(f"\n📊 查询窗口: 最近{window}个交易日（{stock_data['日期'].iloc[-window]} ~ {stock_data['日期'].iloc[-1]}）")
+    print(f"   • 匹配指标: {', '.join(columns)}（z标准化后比较形态）")
+    print(f"   • 搜索范围: {scope}")
+
+    if matches.empty:
+        print("\n❌ 没有找到相似区间")
+        return matches
+
+    print(f"\n📋 最相似的{len(matches)}个历史区间:")
+    print(matches.to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+
+    print(f"\n📈 相似区间之后的表现:")
+    for days, stats in patternSearch.summarize_matches(matches, forward_days).items():
+        if stats['样本数'] == 0 or np.isnan(stats['平均涨跌幅']):
+            print(f"   • 后{days}日: 数据不足")
+            continue
+        icon = "📈" if stats['平均涨跌幅'] > 0 else "📉"
+        print(f"   {icon} 后{days}日: 平均{stats['平均涨跌幅']:+.2f}%，中位数{stats['中位数涨跌幅']:+.2f}%，"
+              f"上涨比例{stats['上涨比例']:.0f}%（{stats['样本数']}个样本）")
+
+    print("🔚" + "=" * 70 + "🔚")
+    return matches
@@ -0,0 +1,41 @@
+import analysis.SCREENanalysis.screener as screener
+
+
+def outputScreenResult(symbols, days=1000, history_days=2000, quantity_days=20, analysis_target='成交量',
+                       workers=None, filters=None, top_n=50, valuation_days=0, use_cache=False,
+                       shared_memory=True):
+    """
+    批量筛选并输出结果表
+
+    参数:
+    symbols: 股票代码列表
+    filters: filter_screen的参数字典，如{'position_levels': ['历史低位'], 'volume_alert': True}
+    top_n: 最多打印的行数
+    valuation_days: 估值分析使用的历史天数，0表示不做估值分析
+    use_cache: 是否使用结果缓存，数据和参数未变化的股票直接使用上次的结果
+    shared_memory: 多进程时是否把数据放入共享内存供各进程共用
+    """
+    result = screener.screen_universe(symbols, days, history_days, quantity_days, analysis_target, workers,
+                                      valuation_days=valuation_days, use_cache=use_cache,
+                                      shared_memory=shared_memory)
+    failed = result['错误信息'].notna().sum() if '错误信息' in result.columns else 0
+
+    filtered = screener.filter_screen(result, **(filters or {}))
+
+    print("=" * 80)
+    print(f"批量筛选结果: 共{len(result)}只股票，分析失败{failed}只，满足条件{len(filtered)}只")
+    if filters:
+        print(f"筛选条件: {filters}")
+    print("-" * 80)
+
+    if filtered.empty:
+        print("  没有满足条件的股票")
+    else:
+        display_columns = [col for col in filtered.columns if col not in ('错误信息', '综合建议')]
+        print(filtered[display_columns].head(top_n).to_string(index=False))
+        if len(filtered) > top_n:
+            print(f"  ...（仅显示前{top_n}只）")
+
+    print("=" * 80)
+
+    return filtered
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+# 项目根目录（main.py所在目录）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 不存在的股票代码，数据源返回空数据
+BOGUS_SYMBOL = '999999'
+
+
+def run_main(*args):
+    """运行main.py，返回(退出码, 输出)"""
+    completed = subprocess.run([sys.executable, os.path.join(ROOT, 'main.py'), *args, '-q'], cwd=ROOT,
+                               capture_output=True, text=True)
+    return completed.returncode, completed.stdout + completed.stderr
+
+
+if __name__ == "__main__":
+    print(f"=== 不存在的股票代码{BOGUS_SYMBOL}：任何分析失败时退出码应为1 ===")
+    for analyses in (['pattern'], ['his'], ['pattern', 'his'], ['level'], ['backtest'], ['sweep']):
+        code, output = run_main('-a', *analyses, '-s', BOGUS_SYMBOL)
+        summary = [line.strip() for line in output.splitlines() if line.startswith(f'  {BOGUS_SYMBOL} ')
+                   or line.startswith('  全部 ')]
+        print(f"  {' '.join(analyses)}: 退出码={code} {summary}")
+        assert code == 1, output
@@ -0,0 +1,142 @@
+import analysis.LEVELanalysis.indicators as indicators
+import numpy as np
+import pandas as pd
+
+
+# 示例数据生成
+def generate_sample_data(n_days=500, seed=42):
+    """生成示例K线数据"""
+    rng = np.random.default_rng(seed)
+    close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, n_days)))
+    open_price = close * (1 + rng.normal(0, 0.005, n_days))
+    high = np.maximum(open_price, close) * (1 + np.abs(rng.normal(0, 0.01, n_days)))
+    low = np.minimum(open_price, close) * (1 - np.abs(rng.normal(0, 0.01, n_days)))
+    return pd.DataFrame({
+        '日期': pd.bdate_range('2020-01-01', periods=n_days),
+        '开盘': open_price,
+        '收盘': close,
+        '最高': high,
+        '最低': low,
+        '成交量': rng.integers(100000, 1000000, n_days).astype(float)
+    })
+
+
+# 逐日循环的参考实现（按公式直接计算，用于校验向量化结果）
+def reference_indicators(stock_data, params=None):
+    params = dict(indicators.DEFAULT_INDICATOR_PARAMS, **(params or {}))
+    close = stock_data['收盘'].tolist()
+    high = stock_data['最高'].tolist()
+    low = stock_data['最低'].tolist()
+    volume = stock_data['成交量'].tolist()
+    n = len(close)
+    rows = []
+
+    avg_up = avg_down = ema_fast = ema_slow = dea = atr = None
+    k = d = 50.0
+    obv = 0.0
+    rsi_period = params['RSI']
+    fast, slow, signal = params['MACD']
+    boll_window, boll_width = params['BOLL']
+    kdj_n, m1, m2 = params['KDJ']
+
+    for i in range(n):
+        row = {}
+        # RSI
+        if i == 0:
+            row['RSI'] = np.nan
+        else:
+            up = max(close[i] - close[i - 1], 0)
+            down = max(close[i - 1] - close[i], 0)
+            if avg_up is None:
+                avg_up, avg_down = up, down
+            else:
+                avg_up = (avg_up * (rsi_period - 1) + up) / rsi_period
+                avg_down = (avg_down * (rsi_period - 1) + down) / rsi_period
+            row['RSI'] = avg_up / (avg_up + avg_down) * 100 if avg_up + avg_down > 0 else 50.0
+
+        # MACD
+        ema_fast = close[i] if ema_fast is None else ema_fast + 2 / (fast + 1) * (close[i] - ema_fast)
+        ema_slow = close[i] if ema_slow is None else ema_slow + 2 / (slow + 1) * (close[i] - ema_slow)
+        dif = ema_fast - ema_slow
+        dea = dif if dea is None else dea + 2 / (signal + 1) * (dif - dea)
+        row.update({'MACD_DIF': dif, 'MACD_DEA': dea, 'MACD': 2 * (dif - dea)})
+
+        # BOLL
+        if i + 1 >= boll_window:
+            window = close[i + 1 - boll_window:i + 1]
+            mid = sum(window) / boll_window
+            std = (sum((x - mid) ** 2 for x in window) / (boll_window - 1)) ** 0.5
+            row.update({'BOLL_MID': mid, 'BOLL_UPPER': mid + boll_width * std, 'BOLL_LOWER': mid - boll_width * std})
+        else:
+            row.update({'BOLL_MID': np.nan, 'BOLL_UPPER': np.nan, 'BOLL_LOWER': np.nan})
+
+        # ATR
+        if i == 0:
+            true_range = high[i] - low[i]
+        else:
+            true_range = max(high[i] - low[i], abs(high[i] - close[i - 1]), abs(low[i] - close[i - 1]))
+        atr = true_range if atr is None else (atr * (params['ATR'] - 1) + true_range) / params['ATR']
+        row['ATR'] = atr
+
+        # KDJ
+        lowest = min(low[max(0, i + 1 - kdj_n):i + 1])
+        highest = max(high[max(0, i + 1 - kdj_n):i + 1])
+        rsv = (close[i] - lowest) / (highest - lowest) * 100 if highest > lowest else 50.0
+        k = (k * (m1 - 1) + rsv) / m1
+        d = (d * (m2 - 1) + k) / m2
+        row.update({'KDJ_K': k, 'KDJ_D': d, 'KDJ_J': 3 * k - 2 * d})
+
+        # OBV
+        if i > 0:
+            obv += volume[i] if close[i] > close[i - 1] else -volume[i] if close[i] < close[i - 1] else 0
+        row['OBV'] = obv
+        rows.append(row)
+
+    result = pd.DataFrame(rows, index=stock_data.index)
+    return result.rename(columns={'RSI': f'RSI{rsi_period}', 'ATR': f"ATR{params['ATR']}"})
+
+
+def max_difference(left, right):
+    """两组指标按列的最大绝对误差（空值位置需一致）"""
+    differences = {}
+    for column in right.columns:
+        a = left[column].to_numpy(dtype=float)
+        b = right[column].to_numpy(dtype=float)
+        same_missing = np.array_equal(np.isnan(a), np.isnan(b))
+        differences[column] = np.nanmax(np.abs(a - b)) if same_missing else np.inf
+    return differences
+
+
+# 使用示例
+if __name__ == "__main__":
+    stock_data = generate_sample_data()
+    reference = reference_indicators(stock_data)
+
+    # 1. 向量化批量计算
+    print("=== 向量化计算与参考实现的最大误差 ===")
+    batch = indicators.compute_indicators(stock_data)
+    for column, diff in max_difference(batch, reference).items():
+        print(f"  {column}: {diff:.2e}")
+
+    # 2. 增量计算：前400天批量，之后逐根追加
+    print("\n=== 增量计算与参考实现的最大误差 ===")
+    engine = indicators.IndicatorEngine()
+    engine.fit(stock_data.iloc[:400])
+    appended = pd.DataFrame([engine.append(bar) for _, bar in stock_data.iloc[400:].iterrows()],
+                            index=stock_data.index[400:])
+    for column, diff in max_difference(appended, reference.iloc[400:]).items():
+        print(f"  {column}: {diff:.2e}")
+
+    # 3. 面板批量计算：多只股票一次完成
+    print("\n=== 面板计算与逐只计算的最大误差 ===")
+    panel = pd.concat([generate_sample_data(300 + 50 * i, seed=i).assign(股票代码=f'00000{i}') for i in range(5)],
+                      ignore_index=True)
+    panel_result = indicators.panel_indicators(panel)
+    single = pd.concat([indicators.compute_indicators(group) for _, group in panel.groupby('股票代码', sort=False)])
+    for column, diff in max_difference(panel_result, single.loc[panel_result.index]).items():
+        print(f"  {column}: {diff:.2e}")
+
+    # 4. 最新技术状态
+    print("\n=== 最新技术状态 ===")
+    for key, value in indicators.judge_indicators(stock_data, indicator_data=batch).items():
+        print(f"  {key}: {value}")
@@ -0,0 +1,52 @@
+import os
+import numpy as np
+import pandas as pd
+import analysis.HISAnalysis.intraday as intraday
+
+# 回放样例：000001在2024-01-02至01-04三个完整交易日（基准），以及01-05当日的分钟线
+REPLAY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testIntradayReplay.csv')
+
+# 手工计算的当日各时刻结果（quantity_days=3）
+# 同一时刻的累计成交量（无成交的分钟沿用之前的累计量）:
+#   09:35  01-02: 100+200=300   01-03: 50   01-04: 400+100=500   01-05: 120+180=300
+#   10:00  01-02: 300+300=600   01-03: 50+150=200   01-04: 500   01-05: 300+100=400
+# 量比 = 当日累计量 / 过去三日同时刻累计量均值
+# 近期排名 = 过去三日和当日的同时刻累计量中小于等于当日累计量的个数
+EXPECTED = {
+    pd.Timestamp('2024-01-05 09:35'): {'累计成交量': 300, '同时段均量': 850 / 3, '量比': 300 / (850 / 3),
+                                       '近期排名': 3, '排名百分比': 75.0},
+    pd.Timestamp('2024-01-05 10:00'): {'累计成交量': 400, '同时段均量': 1300 / 3, '量比': 400 / (1300 / 3),
+                                       '近期排名': 2, '排名百分比': 50.0},
+}
+
+
+def check_metrics(metrics, expected):
+    """逐项比较metrics与手工计算结果，返回不一致的项"""
+    return {key: (metrics.get(key), value) for key, value in expected.items()
+            if not np.isclose(metrics.get(key), value)}
+
+
+if __name__ == "__main__":
+    bars = intraday.read_replay(REPLAY_FILE)
+    monitor = intraday.IntradayMonitor(quantity_days=3, state_dir=None)
+
+    print("=== 回放分钟线，与手工计算的量比和近期排名比较 ===")
+    for code, time, ratio in intraday.replay(monitor, bars):
+        if time in EXPECTED:
+            metrics = monitor.metrics(code)
+            mismatch = check_metrics(metrics, EXPECTED[time])
+            print(f"  {time:%H:%M} 累计量={metrics['累计成交量']:.0f} 量比={ratio:.4f} "
+                  f"近期排名={metrics['近期排名']}/{metrics['数据信息']['近期数据量']} 不一致={mismatch}")
+            assert not mismatch
+
+    final = monitor.metrics('000001')
+    print(f"  基准天数: {final['数据信息']['基准天数']}")
+    assert final['数据信息']['基准天数'] == 3
+
+    print("\n=== 回放已收盘交易日的数据应被忽略 ===")
+    monitor.update('000001', '2024-01-03 09:36', 100000)
+    list(intraday.replay(monitor, bars[bars['时间'] < '2024-01-05']))
+    replayed = monitor.metrics('000001')
+    unchanged = {key: replayed[key] == final[key] for key in ('累计成交量', '量比', '近期排名')}
+    print(f"  结果不变: {unchanged}")
+    assert all(unchanged.values())
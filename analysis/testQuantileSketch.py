@@ -0,0 +1,72 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import analysis.HISAnalysis.quantileSketch as quantileSketch
+
+
+def exact_rank(sorted_values, points):
+    """精确排名：小于等于x的数据占比，与KLLSketch.rank口径一致"""
+    return np.searchsorted(sorted_values, points, side='right') / len(sorted_values)
+
+
+def max_rank_error(sketch, values, n_points=400):
+    """在数据的n_points个分位点上比较草图排名与精确排名，返回最大绝对误差"""
+    sorted_values = np.sort(values)
+    points = sorted_values[np.linspace(0, len(values) - 1, n_points).astype(int)]
+    approx = np.array([sketch.rank(point) for point in points])
+    return float(np.abs(approx - exact_rank(sorted_values, points)).max())
+
+
+def streamed_sketch(values, k, seed):
+    """一次性update构建草图"""
+    return quantileSketch.KLLSketch(k, seed=seed).update(values)
+
+
+def merged_sketch(values, k, seed, chunk=240):
+    """按每天chunk个值分别建草图后逐日merge，对应SketchStore的实际用法"""
+    sketch = quantileSketch.KLLSketch(k, seed=seed)
+    for day_values in np.array_split(values, max(1, len(values) // chunk)):
+        sketch.merge(quantileSketch.KLLSketch(k, seed=seed).update(day_values))
+    return sketch
+
+
+if __name__ == "__main__":
+    k = 200
+    bound = quantileSketch.KLLSketch(k).rank_error
+
+    print(f"=== 草图排名与精确排名的最大误差（k={k}，误差上界±{bound * 100:.2f}%）===")
+    worst = 0.0
+    for name, build in (('update', streamed_sketch), ('逐日merge', merged_sketch)):
+        errors = []
+        for n in (5000, 50000):
+            for seed in range(10):
+                values = np.random.default_rng(seed).lognormal(size=n)
+                errors.append(max_rank_error(build(values, k, seed), values))
+        worst = max(worst, max(errors))
+        print(f"  {name}: 最大 {max(errors) * 100:.2f}%，平均 {np.mean(errors) * 100:.2f}%")
+    assert worst <= bound, f"实测误差{worst:.4f}超出上界{bound:.4f}"
+
+    print("\n=== 小数据量（n<k）应为精确结果 ===")
+    values = np.random.default_rng(0).normal(size=k - 1)
+    small_error = max_rank_error(streamed_sketch(values, k, 0), values)
+    print(f"  最大误差: {small_error:.2e}")
+    assert small_error == 0
+
+    # 天数小于k时合并结果不经压缩（不受随机数影响），两种合并方式应完全一致
+    print("\n=== SketchStore多目标合并与逐目标合并一致 ===")
+    rng = np.random.default_rng(1)
+    data = pd.DataFrame({
+        '日期': pd.bdate_range('2020-01-01', periods=k - 1),
+        '成交量': rng.integers(100000, 1000000, k - 1).astype(float),
+        '涨跌幅': rng.normal(0, 2, k - 1)
+    })
+    with tempfile.TemporaryDirectory() as root:
+        store = quantileSketch.SketchStore(os.path.join(root, 'sketch'), k=k)
+        store.add_data('000001', data, ['成交量', '涨跌幅'])
+        together = store.merged('000001', ['成交量', '涨跌幅'])
+        for target in ('成交量', '涨跌幅'):
+            single = store.merged('000001', target)
+            same = single.n == together[target].n and single.rank(data[target].median()) == together[target].rank(data[target].median())
+            print(f"  {target}: n={single.n}，一致={same}")
+            assert same
@@ -0,0 +1,50 @@
+import datetime
+import numpy as np
+import pandas as pd
+import tools.cacheTools as CaT
+import tools.panelTools as PT
+
+
+def sample_frames(seed=7):
+    """
+    两只股票的样例数据，同名列在两只股票中的类型不同：
+    a的成交量为int64、b为float64；a的备注含None、b不含；日期为datetime.date对象（b含空值）
+    """
+    rng = np.random.default_rng(seed)
+    dates = [day.date() for day in pd.bdate_range('2024-01-01', periods=30)]
+    a = pd.DataFrame({
+        '日期': dates,
+        '收盘': rng.normal(10, 1, 30),
+        '成交量': rng.integers(1000, 100000, 30),
+        '涨停': rng.random(30) > 0.9,
+        '备注': pd.Series(['停牌' if i % 9 == 0 else None for i in range(30)], dtype=object),
+        '名称': pd.Series(['平安银行'] * 30, dtype='str')
+    })
+    b = pd.DataFrame({
+        '日期': dates[:20] + [None] * 5,
+        '收盘': rng.normal(20, 2, 25),
+        '成交量': rng.integers(1000, 100000, 25).astype(float),
+        '涨停': rng.random(25) > 0.9,
+        '备注': pd.Series(['x'] * 25, dtype=object),
+        '名称': pd.Series(['万科A', np.nan] * 12 + ['万科A'], dtype='str')
+    })
+    return {'a': a, 'b': b}
+
+
+if __name__ == "__main__":
+    frames = sample_frames()
+    print("=== 共享面板还原后的类型和数据指纹应与原数据一致 ===")
+    with PT.SharedPanel.publish(frames) as panel:
+        for symbol, original in frames.items():
+            restored = panel.frame(symbol)
+            same_dtypes = list(restored.dtypes.astype(str)) == list(original.dtypes.astype(str))
+            same_fingerprint = CaT.data_fingerprint(restored) == CaT.data_fingerprint(original)
+            print(f"  {symbol}: 成交量类型={restored['成交量'].dtype} 类型一致={same_dtypes} 指纹一致={same_fingerprint}")
+            assert same_dtypes and same_fingerprint
+
+        print("\n=== 还原的DataFrame为副本，修改不影响共享内存 ===")
+        restored = panel.frame('a')
+        restored.loc[0, '收盘'] = -1.0
+        unchanged = panel.frame('a').at[0, '收盘'] == frames['a'].at[0, '收盘']
+        print(f"  共享内存未被修改: {unchanged}")
+        assert unchanged
@@ -0,0 +1,278 @@
+"""
+分阶段性能基准测试
+
+在合成的股票数据上分别测量各处理阶段的耗时和峰值内存，结果保存为JSON，并与基线比较标记性能退化
+
+用法（在项目根目录下运行）:
+    python -m benchmark.runBenchmark --symbols 50 --days 2500
+    python -m benchmark.runBenchmark --save-baseline          # 把本次结果保存为基线
+    python -m benchmark.runBenchmark --stages getLevel getHisAnalysis
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import benchmark.synthetic as synthetic
+import tools.panelTools as PT
+import tools.dfTools as DfT
+import tools.traceTools as TT
+import analysis.PCA as PCA
+import analysis.LEVELanalysis.level as level
+import analysis.HISAnalysis.getHis as getHis
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULT_DIR = os.path.join(BENCHMARK_DIR, 'results')
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+# 表达式求值阶段使用的分析目标
+EXPRESSIONS = ['成交量', '涨跌幅/换手率', '(收盘-开盘)/开盘*100', '成交额/成交量', '振幅*换手率']
+# PCA使用的特征
+PCA_FEATURES = ['涨跌幅', '成交量', '换手率', '振幅']
+# 历史分位分析的目标和近期天数
+HIS_TARGETS = ['成交量', '涨跌幅/换手率']
+QUANTITY_DAYS = 20
+
+# 低于此耗时差（秒）或内存差（MB）的变化视为噪声，不标记退化
+NOISE_FLOOR = 0.005
+MEMORY_NOISE_FLOOR = 0.5
+
+
+# ---------- 各阶段 ----------
+# 每个阶段接收共享的context，可读取前面阶段的结果，并把自己的结果写回context
+
+def stage_ingest(context):
+    """读取每只股票的本地数据文件并合并为面板"""
+    frames = {code: pd.read_pickle(path).sort_values('日期') for code, path in context['files'].items()}
+    context['frames'] = frames
+    context['panel'] = PT.build_panel(frames)
+
+
+def stage_shared_panel(context):
+    """SharedPanel：把面板数据放入共享内存，再逐只股票还原（多进程时子进程读取数据的方式）"""
+    with PT.SharedPanel.publish(context['frames']) as panel:
+        attached = PT.SharedPanel.attach(panel.name)
+        for code in context['frames']:
+            attached.frame(code)
+        attached.close()
+
+
+def stage_expression(context):
+    """在面板上计算列名和四则运算表达式"""
+    panel = context['panel']
+    context['expressions'] = {target: getHis.evaluate_target(panel, target) for target in EXPRESSIONS}
+
+
+def stage_reshape(context):
+    """reshape_stock_data：生成明日涨跌幅（安静模式，不计入逐步打印）"""
+    with TT.quiet():
+        context['reshaped'] = {code: DfT.reshape_stock_data(frame) for code, frame in context['frames'].items()}
+
+
+def stage_pca_fit(context):
+    """PCASimilarity.fit"""
+    analyzers = {}
+    for code, frame in context['reshaped'].items():
+        data = frame[PCA_FEATURES + ['明日涨跌幅']].dropna()
+        analyzer = PCA.PCASimilarity(n_components=3, feature_names=PCA_FEATURES)
+        analyzer.fit(data[PCA_FEATURES].to_numpy(), data['明日涨跌幅'].to_numpy())
+        analyzers[code] = analyzer
+    context['analyzers'] = analyzers
+
+
+def stage_rank_features(context):
+    """PCASimilarity.rank_features"""
+    context['rankings'] = {code: analyzer.rank_features() for code, analyzer in context['analyzers'].items()}
+
+
+def stage_get_level(context):
+    """level.getLevel"""
+    context['levels'] = {code: level.getLevel(frame) for code, frame in context['frames'].items()}
+
+
+def stage_get_his(context):
+    """getHis.getHisAnalysis"""
+    context['his'] = {code: getHis.getHisAnalysis(frame, frame.tail(QUANTITY_DAYS), HIS_TARGETS)
+                      for code, frame in context['frames'].items()}
+
+
+STAGES = {
+    'ingest': stage_ingest,
+    'SharedPanel': stage_shared_panel,
+    'expression': stage_expression,
+    'reshape_stock_data': stage_reshape,
+    'PCASimilarity.fit': stage_pca_fit,
+    'rank_features': stage_rank_features,
+    'getLevel': stage_get_level,
+    'getHisAnalysis': stage_get_his
+}
+
+# 每个阶段之后的阶段（用于判断被跳过的阶段是否需要为后续阶段准备数据）
+STAGES_AFTER = {name: set(list(STAGES)[i + 1:]) for i, name in enumerate(STAGES)}
+
+
+def run_benchmark(n_symbols=50, days=2500, repeat=3, seed=0, stages=None):
+    """
+    运行基准测试
+
+    每个阶段先计时运行repeat次（取中位数和最小值），再在tracemalloc下运行一次测量峰值内存，
+    两者分开以免内存跟踪的开销影响计时。被跳过阶段的依赖阶段仍会运行（不计入结果）
+
+    返回:
+    dict: 环境信息、参数和各阶段结果
+    """
+    selected = list(STAGES) if not stages else [name for name in STAGES if name in stages]
+    universe = synthetic.generate_universe(n_symbols, days, seed)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # 准备阶段：把合成数据写成本地文件，模拟数据缓存
+        files = {}
+        for code, frame in universe.items():
+            files[code] = os.path.join(temp_dir, f"{code}.pkl")
+            frame.to_pickle(files[code])
+        context = {'files': files}
+
+        for name, stage in STAGES.items():
+            if name not in selected:
+                # 只为后续阶段准备数据
+                if any(STAGES_AFTER[name] & set(selected)):
+                    stage(context)
+                continue
+
+            timings = []
+            for _ in range(max(1, repeat)):
+                start = time.perf_counter()
+                stage(context)
+                timings.append(time.perf_counter() - start)
+
+            tracemalloc.start()
+            stage(context)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            results[name] = {
+                '耗时中位数(s)': statistics.median(timings),
+                '耗时最小值(s)': min(timings),
+                '峰值内存(MB)': peak / 1024 / 1024
+            }
+            print(f"  {name:<20} {results[name]['耗时中位数(s)']:>9.4f}s  {results[name]['峰值内存(MB)']:>9.2f}MB")
+
+    return {
+        '环境': environment(),
+        '参数': {'股票数量': n_symbols, '交易日数': days, '重复次数': repeat, '随机种子': seed},
+        '阶段': results
+    }
+
+
+def environment():
+    """运行环境信息，随结果一起保存"""
+    return {
+        '时间': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        '平台': platform.platform(),
+        '处理器': platform.processor() or platform.machine()
+    }
+
+
+def compare_with_baseline(current, baseline, threshold=0.2, metric='耗时中位数(s)'):
+    """
+    与基线比较，耗时（metric指定的统计量）或峰值内存超过基线(1+threshold)倍时标记为退化
+
+    参数不同（股票数量、交易日数）的基线没有可比性，只提示不比较
+
+    返回:
+    tuple: (比较结果DataFrame, 是否存在退化)
+    """
+    if current['参数'].get('股票数量') != baseline['参数'].get('股票数量') or \
+            current['参数'].get('交易日数') != baseline['参数'].get('交易日数'):
+        print(f"⚠️ 基线参数{baseline['参数']}与本次不同，不做比较")
+        return pd.DataFrame(), False
+
+    rows = []
+    for name, result in current['阶段'].items():
+        base = baseline['阶段'].get(name)
+        if base is None:
+            continue
+        time_ratio = result[metric] / base[metric] if base[metric] > 0 else np.nan
+        memory_ratio = result['峰值内存(MB)'] / base['峰值内存(MB)'] if base['峰值内存(MB)'] > 0 else np.nan
+        slower = time_ratio > 1 + threshold and result[metric] - base[metric] > NOISE_FLOOR
+        larger = memory_ratio > 1 + threshold and result['峰值内存(MB)'] - base['峰值内存(MB)'] > MEMORY_NOISE_FLOOR
+        rows.append({
+            '阶段': name,
+            '基线耗时(s)': base[metric],
+            '本次耗时(s)': result[metric],
+            '耗时比': time_ratio,
+            '基线内存(MB)': base['峰值内存(MB)'],
+            '本次内存(MB)': result['峰值内存(MB)'],
+            '内存比': memory_ratio,
+            '状态': '❌ 退化' if slower or larger else ('✅ 改善' if time_ratio < 1 - threshold else '正常')
+        })
+    table = pd.DataFrame(rows)
+    return table, bool(len(table)) and (table['状态'] == '❌ 退化').any()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分阶段性能基准测试")
+    parser.add_argument('--symbols', type=int, default=50, help="合成股票数量")
+    parser.add_argument('--days', type=int, default=2500, help="每只股票的交易日数")
+    parser.add_argument('--repeat', type=int, default=3, help="每个阶段计时运行的次数")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), help="只运行指定阶段")
+    parser.add_argument('--output', help="结果文件路径，默认保存到benchmark/results/")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="基线文件路径")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基线")
+    parser.add_argument('--threshold', type=float, default=0.2, help="判定退化的相对变化幅度")
+    args = parser.parse_args(argv)
+
+    print(f"📏 基准测试: {args.symbols}只股票 × {args.days}个交易日，每阶段运行{args.repeat}次")
+    current = run_benchmark(args.symbols, args.days, args.repeat, args.seed, args.stages)
+
+    output = args.output or os.path.join(RESULT_DIR, f"benchmark_{datetime.datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    print(f"💾 结果已保存到 {output}")
+
+    return check_baseline(current, args.baseline, args.threshold, args.save_baseline)
+
+
+def check_baseline(current, baseline_file, threshold=0.2, save=False, metric='耗时中位数(s)'):
+    """
+    save为True时把本次结果保存为基线，否则与基线比较并打印结果
+
+    返回:
+    int: 退出码，有退化时为1，便于在持续集成中检查
+    """
+    if save:
+        with open(baseline_file, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"💾 已保存为基线 {baseline_file}")
+        return 0
+
+    if not os.path.exists(baseline_file):
+        print(f"ℹ️ 没有基线文件 {baseline_file}，可使用 --save-baseline 保存")
+        return 0
+
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    table, regressed = compare_with_baseline(current, baseline, threshold, metric)
+    if not table.empty:
+        print(f"\n📋 与基线比较（阈值±{threshold:.0%}）:")
+        print(table.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+    if regressed:
+        print("\n❌ 存在性能退化")
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+命令行冷启动耗时基准测试
+
+对每个菜单选项启动一个新的Python进程，导入main和该分析执行函数内导入的模块，测量总耗时
+（含解释器启动）和进程峰值内存，并检查是否加载了该分析用不到的重量级依赖
+
+用法（在项目根目录下运行）:
+    python -m benchmark.startupBenchmark
+    python -m benchmark.startupBenchmark --save-baseline
+"""
+import argparse
+import ast
+import datetime
+import inspect
+import json
+import os
+import statistics
+import subprocess
+import sys
+import textwrap
+import time
+import benchmark.runBenchmark as RB
+import tools.batchTools as BT
+
+PROJECT_DIR = os.path.dirname(RB.BENCHMARK_DIR)
+BASELINE_FILE = os.path.join(RB.BENCHMARK_DIR, 'startup_baseline.json')
+
+# 导入较慢的依赖，只允许在需要它们的分析中加载
+HEAVY_MODULES = ['akshare', 'sklearn', 'scipy']
+ALLOWED_HEAVY = {'pca': {'sklearn', 'scipy'}}
+
+# 子进程中运行的代码：导入main和指定模块，输出已加载的重量级依赖和峰值内存
+CHILD_CODE = """
+import json, sys
+import main
+for module in sys.argv[1:]:
+    __import__(module)
+# Linux的ru_maxrss在exec后保留父进程的值，优先读取本进程的VmHWM
+peak = 0.0
+try:
+    with open('/proc/self/status') as f:
+        peak = next(int(line.split()[1]) for line in f if line.startswith('VmHWM')) / 1024
+except (OSError, StopIteration):
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        pass
+print(json.dumps({'heavy': [name for name in %r if name in sys.modules], 'peak': peak}))
+"""
+
+
+def runner_imports(run):
+    """分析执行函数体中（不含条件分支内）直接导入的模块，即默认配置下运行该分析会加载的模块"""
+    tree = ast.parse(textwrap.dedent(inspect.getsource(run)))
+    function = tree.body[0]
+    return [alias.name for node in function.body if isinstance(node, ast.Import) for alias in node.names]
+
+
+def measure(modules, repeat=5):
+    """
+    在新进程中导入main和modules，重复repeat次
+
+    返回:
+    dict: 耗时中位数、最小值、峰值内存和加载的重量级依赖
+    """
+    timings, result = [], {}
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [PROJECT_DIR, os.environ.get('PYTHONPATH')])))
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', CHILD_CODE % HEAVY_MODULES] + modules, cwd=PROJECT_DIR,
+                                env=env, capture_output=True, text=True, check=True).stdout
+        timings.append(time.perf_counter() - start)
+        result = json.loads(output.strip().splitlines()[-1])
+    return {
+        '耗时中位数(s)': statistics.median(timings),
+        '耗时最小值(s)': min(timings),
+        '峰值内存(MB)': result['peak'],
+        '重量级依赖': result['heavy']
+    }
+
+
+def run_startup_benchmark(repeat=5):
+    """
+    测量命令行本身以及每个菜单选项的冷启动
+
+    返回:
+    tuple: (结果dict，格式同runBenchmark.run_benchmark; 违规加载重量级依赖的列表)
+    """
+    targets = {'cli': []}
+    targets.update({f"{value[0]}.{name}": runner_imports(value[2]) for name, value in BT.ANALYSES.items()})
+
+    results, violations = {}, []
+    for target, modules in targets.items():
+        results[target] = measure(modules, repeat)
+        allowed = ALLOWED_HEAVY.get(target.partition('.')[2], set())
+        unexpected = [name for name in results[target]['重量级依赖'] if name not in allowed]
+        if unexpected:
+            violations.append((target, unexpected))
+        print(f"  {target:<12} {results[target]['耗时中位数(s)']:>7.3f}s  {results[target]['峰值内存(MB)']:>7.1f}MB  "
+              f"{', '.join(results[target]['重量级依赖']) or '-'}")
+
+    return {'环境': RB.environment(), '参数': {'重复次数': repeat}, '阶段': results}, violations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="命令行冷启动耗时基准测试")
+    parser.add_argument('--repeat', type=int, default=5, help="每个选项启动的次数")
+    parser.add_argument('--output', help="结果文件路径，默认保存到benchmark/results/")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="基线文件路径")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为基线")
+    parser.add_argument('--threshold', type=float, default=0.2, help="判定退化的相对变化幅度")
+    args = parser.parse_args(argv)
+
+    print(f"🚀 冷启动基准测试: 每个选项启动{args.repeat}次")
+    current, violations = run_startup_benchmark(args.repeat)
+
+    output = args.output or os.path.join(RB.RESULT_DIR, f"startup_{datetime.datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    print(f"💾 结果已保存到 {output}")
+
+    for target, modules in violations:
+        print(f"❌ {target} 加载了不需要的依赖: {', '.join(modules)}")
+    # 启动耗时的噪声只会使其变长，用最小值比较
+    code = RB.check_baseline(current, args.baseline, args.threshold, args.save_baseline, metric='耗时最小值(s)')
+    return 1 if violations else code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
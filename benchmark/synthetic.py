@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# 与ak.stock_zh_a_hist返回值一致的列
+COLUMNS = ['日期', '股票代码', '开盘', '收盘', '最高', '最低', '成交量', '成交额', '振幅', '涨跌幅', '涨跌额', '换手率']
+
+# 股票代码前缀：主板、创业板、科创板
+CODE_PREFIXES = ['600', '000', '300', '688']
+
+
+def symbol_codes(n_symbols):
+    """生成n_symbols个不重复的6位股票代码，各板块轮流分配"""
+    return [f"{CODE_PREFIXES[i % len(CODE_PREFIXES)]}{i // len(CODE_PREFIXES):03d}" for i in range(n_symbols)]
+
+
+def generate_universe(n_symbols=100, days=2500, seed=0, end_date='2024-12-31'):
+    """
+    生成合成的A股日线数据
+
+    所有股票一次性向量化生成：对数收益为带波动聚集的随机游走，涨跌幅按板块截断在涨跌停以内，
+    价格保留两位小数，成交量与涨跌幅绝对值正相关
+
+    参数:
+    n_symbols: 股票数量
+    days: 每只股票的交易日数
+    seed: 随机种子
+    end_date: 最后一个交易日
+
+    返回:
+    dict: {股票代码: DataFrame}，列与ak.stock_zh_a_hist一致
+    """
+    rng = np.random.default_rng(seed)
+    codes = symbol_codes(n_symbols)
+    dates = pd.bdate_range(end=end_date, periods=days)
+    date_values = dates.strftime('%Y-%m-%d').to_numpy()
+    limits = np.array([0.2 if code.startswith(('300', '688')) else 0.1 for code in codes])
+
+    # 波动率随时间缓慢变化，模拟波动聚集
+    volatility = 0.02 * np.exp(np.cumsum(rng.normal(0, 0.05, (days, n_symbols)), axis=0) * 0.1)
+    returns = np.clip(rng.normal(0.0003, 1, (days, n_symbols)) * volatility, -limits, limits)
+    start_price = rng.uniform(3, 100, n_symbols)
+    close = np.round(start_price * np.cumprod(1 + returns, axis=0), 2)
+    close = np.maximum(close, 0.01)
+    previous_close = np.vstack([start_price[None, :], close[:-1]])
+
+    open_price = np.round(previous_close * (1 + rng.normal(0, 0.3, (days, n_symbols)) * volatility), 2)
+    high = np.round(np.maximum(open_price, close) * (1 + np.abs(rng.normal(0, 0.5, (days, n_symbols))) * volatility), 2)
+    low = np.round(np.minimum(open_price, close) * (1 - np.abs(rng.normal(0, 0.5, (days, n_symbols))) * volatility), 2)
+
+    float_shares = rng.uniform(1e8, 5e9, n_symbols)
+    turnover = np.clip(rng.lognormal(0, 0.5, (days, n_symbols)) * (1 + np.abs(returns) * 30), 0.05, 50)
+    volume = np.round(float_shares * turnover / 100 / 100).astype(np.int64)  # 单位: 手
+    amount = np.round(volume * 100 * (open_price + close) / 2, 2)
+
+    change = close - previous_close
+    columns = {
+        '开盘': open_price,
+        '收盘': close,
+        '最高': high,
+        '最低': low,
+        '成交量': volume,
+        '成交额': amount,
+        '振幅': np.round((high - low) / previous_close * 100, 2),
+        '涨跌幅': np.round(change / previous_close * 100, 2),
+        '涨跌额': np.round(change, 2),
+        '换手率': np.round(turnover, 2)
+    }
+
+    universe = {}
+    for j, code in enumerate(codes):
+        frame = {'日期': date_values, '股票代码': code}
+        frame.update({name: values[:, j] for name, values in columns.items()})
+        universe[code] = pd.DataFrame(frame, columns=COLUMNS)
+    return universe
@@ -1,10 +1,104 @@
+import argparse
+import sys
 import menu
 import tools.choiceTools as CT
+import tools.batchTools as BT
+import tools.traceTools as TT
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="金融分析批量运行，不带参数时进入交互菜单",
+        epilog="示例: python main.py -a level his -s 600519 000001 -w 4 -o reports/")
+    parser.add_argument('-a', '--analysis', nargs='+',
+                        help=f"要运行的分析（名称或菜单编号）: {', '.join(f'{k}({v[0]})' for k, v in BT.ANALYSES.items())}")
+    parser.add_argument('-s', '--symbols', nargs='+', default=[], help="股票代码列表")
+    parser.add_argument('-l', '--watchlist', nargs='+', default=[], help="自选股文件（txt每行一个代码，或csv）")
+    parser.add_argument('-c', '--config', nargs='+', default=[], metavar='分析=路径',
+                        help="指定分析使用的配置文件，如 level=/etc/fa/level.json")
+    parser.add_argument('--cfg-dir', default=BT.CFG_DIR, help="默认配置目录")
+    parser.add_argument('-w', '--workers', type=int, help="并行数量（常驻服务为计算进程数）")
+    parser.add_argument('-o', '--output-dir', help="每只股票的报告保存目录")
+    parser.add_argument('-f', '--format', default='text', choices=['text', 'jsonl', 'csv', 'parquet'],
+                        help="报告格式：text为文本报告；其他格式把位置、历史分位、PCA分析结果写入"
+                             "输出目录下的 分析名称.扩展名 文件（parquet需要安装pyarrow）")
+    parser.add_argument('-q', '--quiet', action='store_true', help="不打印数据获取、重组等过程信息")
+    parser.add_argument('--trace', metavar='文件', help="记录各阶段耗时，保存为JSON lines")
+    parser.add_argument('--flamegraph', metavar='文件', help="记录各阶段耗时，保存为火焰图折叠栈格式")
+    parser.add_argument('--profile', action='store_true', help="运行结束后打印各阶段耗时统计")
+    parser.add_argument('--trace-memory', action='store_true', help="跟踪时同时统计内存分配（较慢）")
+    parser.add_argument('--serve', action='store_true', help="以常驻服务方式运行，通过本地HTTP提供分析（见serverTools）")
+    parser.add_argument('--host', help="服务监听地址，默认读取cfg/server_config.json")
+    parser.add_argument('--port', type=int, help="服务监听端口")
+    parser.add_argument('--socket', help="服务监听的Unix socket路径")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    TT.set_quiet(args.quiet)
+    tracing = bool(args.trace or args.flamegraph or args.profile or args.trace_memory)
+    if tracing:
+        TT.enable(memory=args.trace_memory)
+    try:
+        return run(args)
+    finally:
+        if tracing:
+            export_trace(args)
+
+
+def export_trace(args):
+    """保存跟踪结果并按需打印统计"""
+    TT.disable()
+    if args.trace:
+        count = TT.export_jsonl(args.trace)
+        print(f"💾 {count}条跟踪记录已保存到 {args.trace}")
+    if args.flamegraph:
+        TT.export_folded(args.flamegraph)
+        print(f"💾 火焰图数据已保存到 {args.flamegraph}（可用flamegraph.pl或speedscope查看）")
+    if args.profile:
+        TT.print_summary()
 
-if __name__ == '__main__':
-    # 获取选项
-    menu.OperationMenu()
-    operate_choice = input("请输出你的选择:")
-    # 根据选项进行操作
-    CT.choice_analysis(operate_choice)
 
+def run(args):
+    # 常驻服务，服务模块只在此时导入
+    if args.serve:
+        import tools.serverTools as ST
+        ST.run_server(args.cfg_dir, host=args.host, port=args.port, unix_socket=args.socket,
+                      workers=args.workers, quiet=args.quiet)
+        return 0
+
+    # 不带参数：交互菜单
+    if not args.analysis:
+        menu.OperationMenu()
+        operate_choice = input("请输出你的选择:")
+        CT.choice_analysis(operate_choice, args.cfg_dir)
+        return 0
+
+    symbols = list(args.symbols)
+    for path in args.watchlist:
+        symbols.extend(BT.read_watchlist(path))
+
+    try:
+        analyses = [BT.analysis_name(name) for name in args.analysis]
+        configs = {}
+        for item in args.config:
+            name, _, path = item.partition('=')
+            configs[BT.analysis_name(name)] = path
+    except ValueError as e:
+        print(e)
+        return 2
+
+    status = BT.run_batch(analyses, symbols, configs, args.workers or 1, args.output_dir, args.cfg_dir,
+                          args.format)
+    failed = [(code, name, error) for code, errors in status.items() for name, error in errors.items() if error]
+    if failed:
+        print(f"\n{len(failed)}项分析失败:")
+        for code, name, error in failed:
+            print(f"  {code} {name}: {error}")
+    # 有失败时返回非零退出码，便于定时任务检测
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
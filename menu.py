@@ -3,4 +3,8 @@ def OperationMenu():
     print("1. PCA分析")
     print("2. 相对位置判断")
     print("3. 当日数据分析判断")
+    print("4. 批量筛选")
+    print("5. 相似走势搜索")
+    print("6. 策略回测")
+    print("7. 参数敏感性分析")
     print("---------------------------")
@@ -0,0 +1,564 @@
+import contextlib
+import datetime
+import io
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pandas as pd
+import tools.dataTools as DT
+import tools.panelTools as PT
+import tools.cacheTools as CaT
+import tools.reportTools as RT
+import tools.traceTools as TT
+
+# 项目配置目录
+CFG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cfg')
+
+# 子进程中由进程池初始化函数设置的截面排名器（见DataStore.cross_section），每个子进程只接收一次
+_worker_rankers = {}
+
+
+def load_config(path, cfg_dir=CFG_DIR):
+    """
+    读取配置文件
+
+    参数:
+    path: 配置文件路径，相对路径或纯文件名时在cfg_dir下查找
+    cfg_dir: 配置目录
+
+    返回:
+    dict: 配置内容
+    """
+    if not os.path.isabs(path) and not os.path.exists(path):
+        path = os.path.join(cfg_dir, path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def config_value(cfg, key, default=None):
+    """读取{"key": {"value": ...}}格式的配置项"""
+    return cfg.get(key, {}).get("value", default)
+
+
+def result_cache(cfg):
+    """配置中result_cache为true时返回默认结果缓存，否则为None"""
+    return CaT.DEFAULT_RESULT_CACHE if config_value(cfg, "result_cache", False) else None
+
+
+def read_watchlist(path):
+    """
+    读取自选股文件
+
+    支持每行一个（或用逗号、空格分隔的多个）股票代码的文本文件，#后为注释；
+    CSV文件读取"股票代码"、"代码"或"code"列
+
+    返回:
+    list: 去重后的股票代码列表（保持原顺序）
+    """
+    if path.lower().endswith('.csv'):
+        df = pd.read_csv(path, dtype=str)
+        column = next((col for col in ['股票代码', '代码', 'code'] if col in df.columns), df.columns[0])
+        codes = df[column].dropna().str.strip().tolist()
+    else:
+        codes = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.split('#', 1)[0]
+                codes.extend(code for code in line.replace(',', ' ').split() if code)
+    return list(dict.fromkeys(codes))
+
+
+class DataStore:
+    """
+    一次运行内共享的行情数据
+
+    每只股票按目前需要的最大天数读取一次，之后不同分析、不同天数的请求都从同一份数据中截取，
+    天数更大时才重新读取。读取过程加锁，可在线程池中并发预加载。
+
+    多进程运行时先用shared()把已读取的数据放入共享内存，此时序列化只传共享内存名称，
+    子进程按需从共享内存还原用到的股票，不再为每个任务复制DataFrame
+    """
+
+    def __init__(self, loader=DT.getDataCached, valuation_loader=DT.getValuationDataCached):
+        self.loader = loader
+        self.valuation_loader = valuation_loader
+        self._frames = {}
+        self._valuations = {}
+        self._rankers = {}
+        self._shared = None
+        self._lock = threading.Lock()
+
+    def get(self, stock_code, days):
+        """获取stock_code最近days天的数据"""
+        with self._lock:
+            cached = self._frames.get(stock_code)
+        if cached is None and self._shared is not None and stock_code in self._shared:
+            cached = (self._shared.info(stock_code), self._shared.frame(stock_code))
+            with self._lock:
+                self._frames[stock_code] = cached
+        if cached is not None and cached[0] >= days:
+            return DT.sliceRecentDays(cached[1], days)
+
+        df = self.loader(stock_code, days)
+        if df is not None and not df.empty:
+            with self._lock:
+                self._frames[stock_code] = (days, df)
+        return df
+
+    def get_valuation(self, stock_code, days):
+        """获取估值数据，缓存规则同get"""
+        cached = self._valuations.get(stock_code)
+        if cached is not None and cached[0] >= days:
+            return DT.sliceRecentDays(cached[1], days)
+        df = self.valuation_loader(stock_code, days)
+        if df is not None and not df.empty:
+            self._valuations[stock_code] = (days, df)
+        return df
+
+    def preload(self, symbols, days, workers=1):
+        """用线程池并发读取多只股票（读取以网络等待为主）"""
+        symbols = [symbol for symbol in symbols if symbol not in self._frames or self._frames[symbol][0] < days]
+        with TT.span('preload', symbols=len(symbols), days=days), \
+                ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            list(executor.map(lambda symbol: self.get(symbol, days), symbols))
+
+    def frames(self, symbols, days):
+        """{股票代码: 数据}，跳过未获取到数据的股票"""
+        result = {}
+        for symbol in symbols:
+            df = self.get(symbol, days)
+            if df is not None and not df.empty:
+                result[symbol] = df
+        return result
+
+    def cross_section(self, symbols, days):
+        """
+        股票集合最近days天的截面排名器（crossSection.CrossSectionRanker）
+
+        按(股票列表, 天数, 数据日期)缓存，一次运行中逐只股票计算全市场分位时只构建一次面板和宽表
+        （本地行情缓存按日期命名，跨日后数据更新，需重新构建）
+        """
+        import analysis.HISAnalysis.crossSection as CS
+        key = (tuple(symbols), days, datetime.date.today())
+        with self._lock:
+            ranker = self._rankers.get(key)
+        if ranker is None:
+            with TT.span('cross_section', symbols=len(symbols), days=days):
+                ranker = CS.CrossSectionRanker(PT.build_panel(self.frames(symbols, days)))
+            with self._lock:
+                self._rankers[key] = ranker
+        return ranker
+
+    @contextlib.contextmanager
+    def shared(self):
+        """
+        在with块内把已读取的行情数据放入共享内存（panelTools.SharedPanel），退出时释放
+
+        with块内序列化本对象（如提交给进程池）时只传共享内存名称，估值数据不随之传递（子进程从本地缓存读取）
+        """
+        with TT.span('share_panel', symbols=len(self._frames)) as sp:
+            panel = PT.SharedPanel.publish({symbol: df for symbol, (_, df) in self._frames.items()},
+                                           info={symbol: days for symbol, (days, _) in self._frames.items()})
+            sp.set(bytes=panel.nbytes)
+        self._shared = panel
+        try:
+            yield panel
+        finally:
+            self._shared = None
+            panel.close()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        if self._shared is not None:
+            state['_frames'] = {}
+            state['_valuations'] = {}
+            # 截面排名器由进程池初始化函数（_init_worker）传给子进程，不随每个任务传递
+            state['_rankers'] = {}
+            state['_shared'] = self._shared.name
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        shared = state.get('_shared')
+        self._shared = PT.SharedPanel.attach(shared) if shared else None
+        if shared:
+            self._rankers = _worker_rankers
+
+
+def _init_worker(rankers):
+    """进程池初始化：接收主进程构建好的截面排名器"""
+    _worker_rankers.update(rankers)
+
+
+# ---------- 单只股票的分析 ----------
+# 各分析模块在执行函数内导入，命令行启动和运行某一个分析时不加载其他分析的依赖（如sklearn、scipy）
+# 部分输出函数在内部捕获异常、打印后返回None（或把错误写入结果），执行函数检查后抛出异常，
+# 使run_batch记录为失败（命令行据此返回非零退出码）
+
+def _require(result, name):
+    """输出函数返回None时视为分析失败"""
+    if result is None:
+        raise RuntimeError(f"{name}失败")
+    return result
+
+
+def _require_his(result):
+    """历史分位的所有分析目标都失败时视为分析失败"""
+    overall = result.get('总体信息', {})
+    if overall.get('分析目标数量') and not overall.get('成功分析数量'):
+        errors = [item['错误信息'] for target, item in result.items()
+                  if target != '总体信息' and isinstance(item, dict) and '错误信息' in item]
+        raise RuntimeError(f"全部分析目标失败: {errors[0] if errors else '未知错误'}")
+    return result
+
+def run_pca(stock_code, cfg, store, render=True):
+    """PCA分析（render为False时不打印，返回(模型, 特征排名)）"""
+    import analysis.getPCA as getPCA
+    stock_data = store.get(stock_code, config_value(cfg, "days"))
+    if not render:
+        return getPCA.pcaResult(config_value(cfg, "features"), stock_data, result_cache(cfg), stock_code)
+    return getPCA.PCAResult(config_value(cfg, "features"), stock_data, result_cache(cfg), stock_code)
+
+
+def run_level(stock_code, cfg, store, render=True):
+    """相对位置判断（render为False时不打印，只返回结果）"""
+    import analysis.getLevel as GT
+    stock_data = store.get(stock_code, config_value(cfg, "days"))
+    valuation_days = config_value(cfg, "valuation_days", 0)
+    valuation_data = store.get_valuation(stock_code, valuation_days) if valuation_days else None
+    output = GT.outputLevelInfo if render else GT.levelResult
+    return output(stock_data, valuation_data,
+                  ma_windows=config_value(cfg, "ma_windows"),
+                  profile_windows=config_value(cfg, "profile_windows"),
+                  indicator_params=config_value(cfg, "indicator_params"),
+                  result_cache=result_cache(cfg), symbol=stock_code)
+
+
+def run_his(stock_code, cfg, store, render=True):
+    """当日数据分析判断（历史分位、量比），render为False时不打印，只返回结果"""
+    import analysis.getHisAnalysis as GH
+    history_days = config_value(cfg, "history_days")
+    quantity_days = config_value(cfg, "quantity_days")
+    analysis_target = config_value(cfg, "analysis_target")
+    # 日内量比模式：按分钟线累计成交量与过去quantity_days天同一时刻比较
+    if config_value(cfg, "intraday", False):
+        import analysis.HISAnalysis.intraday as ID
+        replay_file = config_value(cfg, "replay_file")
+        minute_data = ID.read_replay(replay_file) if replay_file else DT.getMinuteData(stock_code, quantity_days)
+        # 回放文件自带基准交易日：不读取也不写入实盘保存的累计量状态，避免回放的日期被当作已收盘而跳过
+        monitor = ID.IntradayMonitor(quantity_days, state_dir=None if replay_file else ID.INTRADAY_DIR)
+        for _ in ID.replay(monitor, minute_data, stock_code):
+            pass
+        if not replay_file:
+            monitor.save()
+        metrics = monitor.metrics(stock_code)
+        if render:
+            GH.outputIntradayAnalysis(stock_code, metrics)
+        if '错误信息' in metrics:
+            raise RuntimeError(metrics['错误信息'])
+        return {'日内量比': metrics} if not render else metrics
+
+    # 按较大的天数读取一次，两种分析分别截取
+    store.get(stock_code, max(history_days, quantity_days))
+    history_data = store.get(stock_code, history_days)
+    quantity_data = store.get(stock_code, quantity_days)
+    # 使用可合并的近似分位草图
+    sketches = None
+    if config_value(cfg, "use_sketch", False):
+        import analysis.HISAnalysis.quantileSketch as QS
+        sketch_store = QS.SketchStore(config_value(cfg, "sketch_dir") or QS.SKETCH_DIR)
+        sketches = QS.sketches_for_targets(sketch_store, stock_code, history_data, analysis_target)
+    # 全市场截面分位：对比股票集合在同一交易日的数据
+    cross_section = None
+    market_symbols = config_value(cfg, "market_symbols", [])
+    if market_symbols:
+        if market_symbols == "all":
+            market_symbols = DT.getStockList()
+        if stock_code in market_symbols:
+            cross_section = store.cross_section(market_symbols, quantity_days)
+        else:
+            # 对比集合不含本股票时把本股票加入，排名器只用于这一只股票
+            import analysis.HISAnalysis.crossSection as CS
+            market_data = store.frames(list(market_symbols) + [stock_code], quantity_days)
+            cross_section = CS.CrossSectionRanker(PT.build_panel(market_data))
+    output = GH.outputHisAnalysis if render else GH.hisResult
+    return _require_his(output(history_data, quantity_data, analysis_target, sketches, stock_code, cross_section,
+                               result_cache(cfg)))
+
+
+def run_pattern(stock_code, cfg, store):
+    """相似走势搜索"""
+    import analysis.getPattern as GP
+    days = config_value(cfg, "days")
+    stock_data = store.get(stock_code, days)
+    universe_symbols = config_value(cfg, "universe_symbols", [])
+    if universe_symbols == "all":
+        universe_symbols = DT.getStockList()
+    universe = store.frames(universe_symbols, days) if universe_symbols else None
+    return _require(GP.outputPatternSearch(stock_data,
+                                           config_value(cfg, "columns"),
+                                           config_value(cfg, "quantity_days"),
+                                           config_value(cfg, "top_k"),
+                                           config_value(cfg, "forward_days"),
+                                           universe,
+                                           stock_code), "相似走势搜索")
+
+
+# ---------- 股票集合的分析 ----------
+
+def run_screen(symbols, cfg, store, workers=None):
+    """批量筛选（筛选器自带进程池，数据通过本地缓存共享）"""
+    import analysis.getScreener as GS
+    return GS.outputScreenResult(symbols,
+                                 config_value(cfg, "days"),
+                                 config_value(cfg, "history_days"),
+                                 config_value(cfg, "quantity_days"),
+                                 config_value(cfg, "analysis_target"),
+                                 workers or config_value(cfg, "workers"),
+                                 config_value(cfg, "filters"),
+                                 valuation_days=config_value(cfg, "valuation_days", 0),
+                                 use_cache=config_value(cfg, "result_cache", False),
+                                 shared_memory=config_value(cfg, "shared_memory", True))
+
+
+def run_backtest(symbols, cfg, store, workers=None):
+    """策略回测"""
+    import analysis.getBacktest as GB
+    stock_data_dict = store.frames(symbols, config_value(cfg, "days"))
+    if not stock_data_dict:
+        raise ValueError("未获取到任何股票的数据")
+    return _require(GB.outputBacktest(stock_data_dict,
+                                      config_value(cfg, "strategy"),
+                                      config_value(cfg, "params"),
+                                      config_value(cfg, "execution", 'open'),
+                                      stop_loss=config_value(cfg, "stop_loss"),
+                                      max_hold_days=config_value(cfg, "max_hold_days")), "策略回测")
+
+
+def run_sweep(symbols, cfg, store, workers=None):
+    """参数敏感性分析"""
+    import analysis.getBacktest as GB
+    stock_data_dict = store.frames(symbols, config_value(cfg, "days"))
+    if not stock_data_dict:
+        raise ValueError("未获取到任何股票的数据")
+    return _require(GB.outputSweep(stock_data_dict,
+                                   config_value(cfg, "grid"),
+                                   config_value(cfg, "forward_days"),
+                                   config_value(cfg, "output_file") or None), "参数扫描")
+
+
+# 分析名称: (菜单编号, 默认配置文件, 执行函数, 是否针对单只股票, 需要读取的天数配置项)
+ANALYSES = {
+    'pca': ('1', 'PCA_config.json', run_pca, True, ['days']),
+    'level': ('2', 'PressLevel_config.json', run_level, True, ['days']),
+    'his': ('3', 'nowday_config.json', run_his, True, ['history_days', 'quantity_days']),
+    'screen': ('4', 'screener_config.json', run_screen, False, []),
+    'pattern': ('5', 'pattern_config.json', run_pattern, True, ['days']),
+    'backtest': ('6', 'backtest_config.json', run_backtest, False, ['days']),
+    'sweep': ('7', 'sweep_config.json', run_sweep, False, ['days'])
+}
+
+
+def analysis_name(name):
+    """把菜单编号或分析名称统一为分析名称"""
+    for key, (choice, *_) in ANALYSES.items():
+        if name in (key, choice):
+            return key
+    raise ValueError(f"未知的分析: {name}，可选: {', '.join(f'{key}({value[0]})' for key, value in ANALYSES.items())}")
+
+
+def _run_symbol(stock_code, analyses, configs, store, capture, trace_state=None, report_format='text'):
+    """
+    对一只股票依次运行多个分析，数据只读取一次
+
+    trace_state: 在子进程中运行时传入主进程的traceTools.state()，子进程的跟踪记录随结果返回
+    report_format: 'text'时打印文本报告；其他格式时支持结构化记录的分析（见reportTools.RECORD_BUILDERS）
+                   不打印，只返回记录，其余分析仍输出文本
+
+    返回:
+    tuple: (股票代码, 输出文本, {分析名称: 错误信息或None}, 子进程的跟踪记录, {分析名称: 记录列表})
+    """
+    if trace_state is not None:
+        TT.configure(**trace_state)
+    buffer = io.StringIO()
+    errors, records = {}, {}
+    with contextlib.redirect_stdout(buffer) if capture else contextlib.nullcontext():
+        for name in analyses:
+            with TT.span(name, symbol=stock_code) as sp:
+                try:
+                    if report_format != 'text' and name in RT.RECORD_BUILDERS:
+                        result = ANALYSES[name][2](stock_code, configs[name], store, render=False)
+                        records[name] = RT.RECORD_BUILDERS[name][1](stock_code, result)
+                    else:
+                        ANALYSES[name][2](stock_code, configs[name], store)
+                    errors[name] = None
+                except Exception as e:
+                    print(f"{stock_code} {name}分析失败: {e}")
+                    errors[name] = str(e)
+                    sp.set(error=str(e))
+    return stock_code, buffer.getvalue(), errors, TT.drain() if trace_state is not None else [], records
+
+
+def run_batch(analyses, symbols=None, configs=None, workers=1, output_dir=None, cfg_dir=CFG_DIR,
+              report_format='text'):
+    """
+    非交互批量运行：多只股票 × 多个分析
+
+    - 所有分析共用一个DataStore，每只股票按各分析所需的最大天数只读取一次
+    - 单只股票的分析按股票并行（workers>1时使用进程池，行情数据放入共享内存各进程共用），每只股票的输出整体打印，不会交错
+    - 股票集合的分析（筛选、回测、参数扫描）在单只股票的分析之后对整个股票列表运行一次
+    - report_format为jsonl/csv/parquet时，位置、历史分位和PCA分析的结果以结构化记录逐只股票写入
+      "输出目录/分析名称.扩展名"，不再打印文本报告
+
+    参数:
+    analyses: 分析名称或菜单编号列表，如['level', 'his']或['2', '3']
+    symbols: 股票代码列表，为空时使用各配置文件中的股票
+    configs: {分析名称: 配置文件路径}，未指定的使用cfg_dir下的默认配置
+    workers: 并行数量
+    output_dir: 每只股票的报告保存目录，为None时只打印（结构化输出时默认为当前目录）
+    cfg_dir: 默认配置目录
+    report_format: 'text'或reportTools.FORMATS中的格式
+
+    返回:
+    dict: {股票代码或"全部": {分析名称: 错误信息或None}}
+    """
+    analyses = list(dict.fromkeys(analysis_name(name) for name in analyses))
+    configs = configs or {}
+    loaded = {name: load_config(configs.get(name, ANALYSES[name][1]), cfg_dir) for name in analyses}
+    symbols = list(dict.fromkeys(symbols or []))
+    workers = max(1, workers or 1)
+    store = DataStore()
+    status = {}
+
+    # 预加载：每只股票按各分析需要的最大天数读取一次
+    per_symbol = [name for name in analyses if ANALYSES[name][3]]
+    max_days = max([config_value(loaded[name], key, 0) or 0 for name in analyses for key in ANALYSES[name][4]],
+                   default=0)
+    if symbols and max_days:
+        store.preload(symbols, max_days, workers)
+
+    # 单只股票的分析
+    if per_symbol:
+        _resolve_universes(loaded, per_symbol)
+        if symbols:
+            tasks = [(symbol, per_symbol) for symbol in symbols]
+        else:
+            # 未指定股票时使用各配置中的股票，同一股票的分析合并为一个任务
+            grouped = {}
+            for name in per_symbol:
+                grouped.setdefault(config_value(loaded[name], "stock_code"), []).append(name)
+            tasks = list(grouped.items())
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        capture = workers > 1 or output_dir is not None
+        # 结构化输出：每种分析一个文件，结果逐只股票写入
+        # （其余分析的文本输出直接打印，不再按股票保存）
+        writers = {}
+        if report_format != 'text':
+            extension = RT.FORMATS[report_format].extension
+            writers = {name: RT.open_writer(os.path.join(output_dir or '.', f"{name}.{extension}"),
+                                            RT.RECORD_BUILDERS[name][0], report_format)
+                       for name in per_symbol if name in RT.RECORD_BUILDERS}
+            output_dir = None
+        try:
+            if workers > 1 and len(tasks) > 1:
+                # 子进程用到的数据（包括全市场分位、相似走势的对比股票）先在主进程读取，放入共享内存后各进程共用
+                store.preload([code for code, _ in tasks], max_days, workers)
+                for universe, days in _comparison_universes(loaded, per_symbol):
+                    store.preload(universe, days, workers)
+                # 全市场分位的截面排名器在主进程构建一次，随进程池初始化传给各子进程
+                market_symbols = config_value(loaded['his'], "market_symbols", []) if 'his' in per_symbol else []
+                if market_symbols:
+                    store.cross_section(market_symbols, config_value(loaded['his'], "quantity_days"))
+                with store.shared(), ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                         initargs=(store._rankers,)) as executor:
+                    trace_state = TT.state()
+                    results = _ordered_results(executor, ((_run_symbol, code, names, loaded, store, capture,
+                                                           trace_state, report_format)
+                                                          for code, names in tasks), workers * 4)
+                    _collect(results, status, output_dir, writers)
+            else:
+                _collect((_run_symbol(code, names, loaded, store, capture, report_format=report_format)
+                          for code, names in tasks), status, output_dir, writers)
+        finally:
+            for name, writer in writers.items():
+                writer.close()
+                print(f"💾 {name}结果已保存到 {writer.path}（{writer.count}条记录）")
+
+    # 股票集合的分析
+    for name in analyses:
+        if ANALYSES[name][3]:
+            continue
+        universe = symbols or config_value(loaded[name], "symbols", [])
+        if universe == "all":
+            universe = DT.getStockList()
+        if ANALYSES[name][4] and workers > 1:
+            store.preload(universe, config_value(loaded[name], "days"), workers)
+        with TT.span(name, symbols=len(universe)) as sp:
+            try:
+                ANALYSES[name][2](universe, loaded[name], store, workers if workers > 1 else None)
+                status.setdefault("全部", {})[name] = None
+            except Exception as e:
+                print(f"{name}分析失败: {e}")
+                status.setdefault("全部", {})[name] = str(e)
+                sp.set(error=str(e))
+
+    return status
+
+
+def _resolve_universes(loaded, per_symbol):
+    """把对比股票集合配置中的"all"替换为全部A股代码（每次运行只获取一次股票列表，原地修改loaded）"""
+    for name, key in (('his', 'market_symbols'), ('pattern', 'universe_symbols')):
+        if name in per_symbol and config_value(loaded[name], key) == "all":
+            loaded[name] = dict(loaded[name], **{key: dict(loaded[name][key], value=DT.getStockList())})
+
+
+def _comparison_universes(loaded, per_symbol):
+    """单只股票的分析中用到的对比股票集合及天数：his的全市场分位（market_symbols）、pattern的对比股票（universe_symbols）"""
+    result = []
+    for name, key, days_key in (('his', 'market_symbols', 'quantity_days'), ('pattern', 'universe_symbols', 'days')):
+        universe = config_value(loaded[name], key, []) if name in per_symbol else []
+        if universe == "all":
+            universe = DT.getStockList()
+        if universe:
+            result.append((list(universe), config_value(loaded[name], days_key)))
+    return result
+
+
+def _ordered_results(executor, calls, window):
+    """
+    按提交顺序逐个返回进程池任务的结果
+
+    同时在途的任务不超过window个，结果取出后即释放对应的future，
+    股票很多时不会在主进程中堆积全部结果
+
+    参数:
+    executor: 进程池
+    calls: (函数, 参数...) 的可迭代对象
+    window: 最多同时提交的任务数
+    """
+    pending = deque()
+    for call in calls:
+        pending.append(executor.submit(*call))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _collect(results, status, output_dir, writers=None):
+    """按提交顺序输出每只股票的结果，结构化记录写入writers中对应分析的输出"""
+    for stock_code, text, errors, trace_records, records in results:
+        TT.merge(trace_records)
+        for name, rows in records.items():
+            writers[name].write(rows)
+        if text:
+            print(text, end='')
+        if output_dir:
+            with open(os.path.join(output_dir, f"{stock_code}.txt"), 'w', encoding='utf-8') as f:
+                f.write(text)
+        status.setdefault(stock_code, {}).update(errors)
@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+# 结果缓存目录
+RESULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'results')
+
+# 分析代码的输出格式变化时修改此版本号，使旧缓存全部失效
+CACHE_VERSION = 2
+
+
+def data_fingerprint(*frames):
+    """
+    数据指纹：每个DataFrame的行数、最后一根K线日期和全部内容的校验和
+
+    前复权数据在除权后历史价格整体变化，只比较最后日期不够，因此对全部内容做校验
+
+    返回:
+    str: 最后日期加16位十六进制摘要，如"2024-05-10_3f2a..."
+    """
+    digest = hashlib.sha1()
+    last_date = ''
+    for frame in frames:
+        if frame is None:
+            digest.update(b'None')
+            continue
+        if isinstance(frame, pd.Series):
+            frame = frame.to_frame()
+        digest.update(str(frame.shape).encode())
+        digest.update(','.join(map(str, frame.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+        if not last_date and '日期' in frame.columns and len(frame):
+            last_date = str(pd.Timestamp(frame['日期'].iloc[-1]).date())
+    return f"{last_date or 'nodate'}_{digest.hexdigest()[:16]}"
+
+
+def config_hash(config):
+    """配置（任意可JSON序列化的参数）的16位哈希，键顺序不影响结果"""
+    text = json.dumps([CACHE_VERSION, config], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    分析结果缓存：内存LRU + 磁盘
+
+    键为(分析名称, 股票代码, 数据指纹, 配置哈希)。数据有新K线、历史被复权修改或配置变化时
+    键随之变化，自动视为未命中；写入新结果时删除同一股票、同一分析、同一配置下旧数据的结果。
+    内存中最多保留memory_entries条，磁盘总大小超过max_disk_bytes时按最近使用时间淘汰
+
+    磁盘文件按"分析名称/股票代码/数据指纹__配置哈希.pkl"存放，删除旧结果只需查看该股票的目录；
+    磁盘总大小在第一次写入时统计一次，之后随写入累加，超出上限时才重新统计并淘汰（淘汰到上限的90%）
+    """
+
+    def __init__(self, cache_dir=RESULT_CACHE_DIR, memory_entries=256, max_disk_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        # 本进程估计的磁盘总大小，None表示尚未统计
+        self._disk_bytes = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _prefix(analysis, symbol):
+        return f"{analysis}__{symbol}__"
+
+    def key(self, analysis, symbol, fingerprint, config):
+        """缓存键（同时作为磁盘文件名）"""
+        return f"{self._prefix(analysis, symbol)}{fingerprint}__{config_hash(config)}"
+
+    def _directory(self, analysis, symbol):
+        """分析/股票对应的缓存子目录，拒绝生成cache_dir之外的路径（如股票代码中含有".."或路径分隔符）"""
+        parts = [str(analysis), str(symbol)]
+        for part in parts:
+            if part in ('', '.', '..') or os.sep in part or (os.altsep and os.altsep in part):
+                raise ValueError(f"无效的缓存路径: {part}")
+        root = os.path.abspath(self.cache_dir)
+        directory = os.path.abspath(os.path.join(root, *parts))
+        if os.path.commonpath([root, directory]) != root:
+            raise ValueError(f"缓存路径不在缓存目录中: {directory}")
+        return directory
+
+    def _path(self, key):
+        if not self.cache_dir:
+            return None
+        analysis, symbol, rest = key.split('__', 2)
+        return os.path.join(self._directory(analysis, symbol), f"{rest}.pkl")
+
+    def get(self, key):
+        """
+        读取缓存
+
+        返回:
+        tuple: (是否命中, 结果)
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return True, self._memory[key]
+
+        path = self._path(key)
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+                # 更新访问时间，磁盘淘汰按最近使用顺序
+                os.utime(path)
+                self._remember(key, value)
+                self.disk_hits += 1
+                return True, value
+            except Exception as e:
+                print(f"读取结果缓存失败: {e}")
+
+        self.misses += 1
+        return False, None
+
+    def put(self, key, value, analysis=None, symbol=None):
+        """
+        写入缓存；提供analysis和symbol时删除该股票该分析在相同配置下的旧结果
+        """
+        if analysis is not None and symbol is not None:
+            self.invalidate(analysis, symbol, keep=key)
+        self._remember(key, value)
+
+        path = self._path(key)
+        if path:
+            try:
+                if self._disk_bytes is None:
+                    self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                with open(temp_path, 'wb') as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = os.path.getsize(temp_path)
+                replaced = os.path.getsize(path) if os.path.exists(path) else 0
+                # 先写临时文件再替换，多进程同时写入时不会读到半个文件
+                os.replace(temp_path, path)
+                self._disk_bytes += size - replaced
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict_disk()
+            except Exception as e:
+                print(f"写入结果缓存失败: {e}")
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_entries(self):
+        """磁盘缓存文件列表（包括各级子目录）: [(最近使用时间, 大小, 路径)]"""
+        entries = []
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return entries
+        for directory, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.endswith('.pkl'):
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict_disk(self):
+        """重新统计磁盘总大小（其他进程也会写入），超出上限时删除最久未使用的文件，直到上限的90%"""
+        entries = self._disk_entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_disk_bytes:
+            target = self.max_disk_bytes * 0.9
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+        self._disk_bytes = total
+
+    def invalidate(self, analysis, symbol, keep=None):
+        """
+        删除某只股票某个分析的缓存
+
+        keep为None时删除全部；否则只删除与keep配置相同、数据不同的旧结果（保留其他配置的结果）
+        """
+        prefix = self._prefix(analysis, symbol)
+        suffix = keep[keep.rfind('__'):] if keep else ''
+
+        def stale(key):
+            return key.startswith(prefix) and key.endswith(suffix) and key != keep
+
+        with self._lock:
+            for key in [key for key in self._memory if stale(key)]:
+                del self._memory[key]
+        directory = self._directory(analysis, symbol) if self.cache_dir else None
+        if directory and os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                if entry.name.endswith('.pkl') and stale(f"{prefix}{entry.name[:-len('.pkl')]}"):
+                    try:
+                        size = entry.stat().st_size
+                        os.remove(entry.path)
+                        if self._disk_bytes is not None:
+                            self._disk_bytes -= size
+                    except OSError:
+                        pass
+
+    def clear(self):
+        """清除内存和磁盘中的全部缓存"""
+        with self._lock:
+            self._memory.clear()
+        for _, _, path in self._disk_entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._disk_bytes = 0
+
+    def cached(self, analysis, symbol, frames, config, compute):
+        """
+        带缓存地执行compute()
+
+        参数:
+        analysis: 分析名称，如'level'
+        symbol: 股票代码
+        frames: 分析使用的数据（DataFrame或其列表），用于计算数据指纹
+        config: 影响结果的参数
+        compute: 无参数函数，未命中时调用并缓存其结果
+
+        返回:
+        compute()的结果
+        """
+        if not isinstance(frames, (list, tuple)):
+            frames = [frames]
+        key = self.key(analysis, symbol, data_fingerprint(*frames), config)
+        hit, value = self.get(key)
+        if hit:
+            return value
+        value = compute()
+        self.put(key, value, analysis, symbol)
+        return value
+
+
+def cached_call(cache, analysis, symbol, frames, config, compute):
+    """cache为None时直接计算，否则通过ResultCache.cached执行"""
+    if cache is None:
+        return compute()
+    return cache.cached(analysis, symbol, frames, config, compute)
+
+
+# 进程内默认缓存（磁盘部分在进程间共享）
+DEFAULT_RESULT_CACHE = ResultCache()
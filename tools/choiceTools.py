@@ -1,48 +1,29 @@
-import json
-import analysis.getPCA as getPCA
 import tools.dataTools as DT
-import analysis.getLevel as GT
-import analysis.getHisAnalysis as GH
+import tools.batchTools as BT
 
-def choice_analysis(choice):
-    # 选择进行PCA分析
-    if choice == '1':
-        # 使用原始字符串避免转义问题
-        with open(r"D:\project\pycharm\FinancialAnalysisProject\cfg\PCA_config.json", 'r', encoding='utf-8') as f:
-            cfg = json.load(f)
-        # 获取关键参数
-        features = cfg["features"]["value"]
-        # 获取数据
-        stock_data = DT.getData(cfg["stock_code"]["value"],cfg["days"]["value"])
-        # 进行PCA分析
-        getPCA.PCAResult(features, stock_data)
-    # 选择判断当前位置
-    elif choice == '2':
-        # 使用原始字符串避免转义问题
-        with open(r"D:\project\pycharm\FinancialAnalysisProject\cfg\PressLevel_config.json", 'r', encoding='utf-8') as f:
-            cfg = json.load(f)
-        # 获取关键参数
-        code = cfg["stock_code"]["value"]
-        days = cfg["days"]["value"]
-        # 获取数据
-        stock_data  = DT.getData(code, days)
-        # 进行金融分析并判断位置
-        GT.outputLevelInfo(stock_data)
-    # 判断当前点位量比
-    elif choice == '3':
-        # 使用原始字符串避免转义问题
-        with open(r"D:\project\pycharm\FinancialAnalysisProject\cfg\nowday_config.json", 'r', encoding='utf-8') as f:
-            cfg = json.load(f)
-        # 获取关键参数
-        code = cfg["stock_code"]["value"]
-        history_days = cfg["history_days"]["value"]
-        quantity_days = cfg["quantity_days"]["value"]
-        analysis_target = cfg["analysis_target"]["value"]
-        # 获取数据
-        history_data  = DT.getData(code, history_days)
-        quantity_data = DT.getData(code, quantity_days)
-        # 进行历史分位分析
-        GH.outputHisAnalysis(history_data, quantity_data, analysis_target)
-    else:
+
+def choice_analysis(choice, cfg_dir=BT.CFG_DIR):
+    """
+    运行菜单中的一个分析，配置从cfg_dir（默认为项目下的cfg目录）读取
+
+    参数:
+    choice: 菜单编号或分析名称，见batchTools.ANALYSES
+    cfg_dir: 配置目录
+    """
+    try:
+        name = BT.analysis_name(choice)
+    except ValueError:
         print("choice error")
-        exit(0)
\ No newline at end of file
+        exit(0)
+
+    _, config_file, run, per_symbol, _ = BT.ANALYSES[name]
+    cfg = BT.load_config(config_file, cfg_dir)
+    store = BT.DataStore()
+    # 单只股票的分析（PCA分析、相对位置判断、当日数据分析判断、相似走势搜索）
+    if per_symbol:
+        return run(cfg["stock_code"]["value"], cfg, store)
+    # 股票集合的分析（批量筛选、策略回测、参数敏感性分析）
+    symbols = cfg["symbols"]["value"]
+    if symbols == "all":
+        symbols = DT.getStockList()
+    return run(symbols, cfg, store)
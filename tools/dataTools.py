@@ -1,8 +1,13 @@
-import akshare as ak
 import datetime
+import os
 import pandas as pd
+import tools.traceTools as TT
 
+# 本地数据缓存目录
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'data')
 
+
+@TT.traced()
 def getData(stock_code="000001", days=1000):
     """
     获取指定股票代码最近days天的历史数据
@@ -25,6 +30,8 @@ def getData(stock_code="000001", days=1000):
     start_date_str = start_date.strftime("%Y%m%d")
 
     try:
+        # akshare导入较慢，只在实际获取数据时导入
+        import akshare as ak
         # 获取股票历史数据
         df = ak.stock_zh_a_hist(
             symbol=stock_code,
@@ -37,7 +44,7 @@ def getData(stock_code="000001", days=1000):
         # 按日期排序（确保数据按时间顺序排列）
         if not df.empty and '日期' in df.columns:
             df = df.sort_values('日期')
-            print(f"成功获取股票 {stock_code} 从 {start_date_str} 到 {end_date_str} 的数据，共 {len(df)} 条记录")
+            TT.log(f"成功获取股票 {stock_code} 从 {start_date_str} 到 {end_date_str} 的数据，共 {len(df)} 条记录")
         else:
             print("未获取到数据，请检查股票代码和日期范围")
 
@@ -45,4 +52,157 @@ def getData(stock_code="000001", days=1000):
 
     except Exception as e:
         print(f"获取数据时出错: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
+
+
+def getDataCached(stock_code="000001", days=1000, cache_dir=CACHE_DIR):
+    """
+    带本地缓存的getData，同一交易日内重复获取同一股票时直接读取缓存
+
+    缓存文件按股票代码和当天日期命名，已缓存的数据覆盖所需天数时按日期截取返回，
+    否则重新获取并覆盖缓存
+
+    参数:
+    stock_code: 股票代码
+    days: 获取最近多少天的数据
+    cache_dir: 缓存目录
+
+    返回:
+    DataFrame: 包含股票历史数据的DataFrame
+    """
+    return _cachedFetch(getData, stock_code, days, cache_dir, '')
+
+
+def _cachedFetch(fetch_func, stock_code, days, cache_dir, prefix):
+    """按"前缀+股票代码+当天日期"缓存fetch_func(stock_code, days)的结果"""
+    end_date = datetime.date.today()
+    cache_file = os.path.join(cache_dir, f"{prefix}{stock_code}_{end_date.strftime('%Y%m%d')}.pkl")
+
+    with TT.span(f"{prefix}cachedFetch", symbol=stock_code, days=days) as sp:
+        if os.path.exists(cache_file):
+            try:
+                cached = pd.read_pickle(cache_file)
+                if cached.attrs.get('days', 0) >= days:
+                    df = sliceRecentDays(cached, days, end_date)
+                    sp.set(cache_hit=True)
+                    sp.set_shape(df)
+                    return df
+            except Exception as e:
+                print(f"读取缓存失败: {e}")
+
+        sp.set(cache_hit=False)
+        df = fetch_func(stock_code, days)
+        sp.set_shape(df)
+        if not df.empty:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                df.attrs['days'] = days
+                df.to_pickle(cache_file)
+            except Exception as e:
+                print(f"写入缓存失败: {e}")
+        return df
+
+
+def sliceRecentDays(df, days, end_date=None):
+    """
+    从按日期排序的数据中截取最近days个自然日的数据
+
+    参数:
+    df: 包含日期列的DataFrame
+    days: 自然日天数
+    end_date: 截止日期，默认为今天
+    """
+    if df.empty or '日期' not in df.columns:
+        return df
+    if end_date is None:
+        end_date = datetime.date.today()
+    start_date = pd.Timestamp(end_date - datetime.timedelta(days=days))
+    return df[pd.to_datetime(df['日期']) >= start_date].reset_index(drop=True)
+
+
+@TT.traced()
+def getMinuteData(stock_code="000001", days=5):
+    """
+    获取指定股票最近days天的1分钟K线数据（数据源通常只提供近期的分钟线，
+    长期分钟级历史可通过quantileSketch.SketchStore按天累积保存）
+
+    参数:
+    stock_code: 股票代码
+    days: 获取最近多少天的数据
+
+    返回:
+    DataFrame: 包含时间、开盘、收盘、最高、最低、成交量、成交额等列的DataFrame
+    """
+    end_date = datetime.datetime.now()
+    start_date = end_date - datetime.timedelta(days=days)
+
+    try:
+        import akshare as ak
+        df = ak.stock_zh_a_hist_min_em(
+            symbol=stock_code,
+            start_date=start_date.strftime("%Y-%m-%d 09:00:00"),
+            end_date=end_date.strftime("%Y-%m-%d %H:%M:%S"),
+            period="1",
+            adjust=""
+        )
+        if not df.empty and '时间' in df.columns:
+            df = df.sort_values('时间').reset_index(drop=True)
+            TT.log(f"成功获取股票 {stock_code} 最近 {days} 天的分钟数据，共 {len(df)} 条记录")
+        else:
+            print("未获取到分钟数据，请检查股票代码和日期范围")
+        return df
+
+    except Exception as e:
+        print(f"获取分钟数据时出错: {e}")
+        return pd.DataFrame()
+
+
+def getStockList():
+    """
+    获取全部A股代码列表
+
+    返回:
+    list: 股票代码字符串列表
+    """
+    try:
+        import akshare as ak
+        df = ak.stock_info_a_code_name()
+        return df['code'].astype(str).tolist()
+    except Exception as e:
+        print(f"获取股票列表时出错: {e}")
+        return []
+
+
+@TT.traced()
+def getValuationData(stock_code="000001", days=3000):
+    """
+    获取指定股票最近days天的历史估值数据
+
+    参数:
+    stock_code: 股票代码
+    days: 获取最近多少天的数据
+
+    返回:
+    DataFrame: 包含日期、pe（市盈率TTM）、pb（市净率）列的DataFrame
+    """
+    try:
+        import akshare as ak
+        df = ak.stock_value_em(symbol=stock_code)
+        if df.empty:
+            print("未获取到估值数据，请检查股票代码")
+            return pd.DataFrame()
+
+        df = df.rename(columns={'数据日期': '日期', 'PE(TTM)': 'pe', '市净率': 'pb'})
+        df = df[['日期', 'pe', 'pb']].sort_values('日期').reset_index(drop=True)
+        df = sliceRecentDays(df, days)
+        TT.log(f"成功获取股票 {stock_code} 的估值数据，共 {len(df)} 条记录")
+        return df
+
+    except Exception as e:
+        print(f"获取估值数据时出错: {e}")
+        return pd.DataFrame()
+
+
+def getValuationDataCached(stock_code="000001", days=3000, cache_dir=CACHE_DIR):
+    """带本地缓存的getValuationData，缓存规则同getDataCached"""
+    return _cachedFetch(getValuationData, stock_code, days, cache_dir, 'valuation_')
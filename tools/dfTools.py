@@ -2,8 +2,10 @@ import pandas as pd
 import numpy as np
 import re
 from typing import Union, List
+import tools.traceTools as TT
 
 # 只组成明日涨跌幅
+@TT.traced()
 def reshape_stock_data(df, target_col='涨跌幅'):
     """
     重组成包含明日涨跌幅的监督学习格式（修复版本）
@@ -37,7 +39,7 @@ def reshape_stock_data(df, target_col='涨跌幅'):
 
         # 4. 检查目标列数据类型并转换
         if not pd.api.types.is_numeric_dtype(df_work[target_col]):
-            print(f"警告: 列 '{target_col}' 不是数值类型，尝试转换...")
+            TT.log(f"警告: 列 '{target_col}' 不是数值类型，尝试转换...")
             try:
                 df_work[target_col] = pd.to_numeric(df_work[target_col], errors='coerce')
                 # 检查转换后是否还有有效数据
@@ -52,7 +54,7 @@ def reshape_stock_data(df, target_col='涨跌幅'):
         if '日期' in df_work.columns:
             try:
                 df_work = df_work.sort_values('日期').reset_index(drop=True)
-                print("数据已按日期排序")
+                TT.log("数据已按日期排序")
             except Exception as e:
                 print(f"日期排序失败: {e}")
 
@@ -60,12 +62,12 @@ def reshape_stock_data(df, target_col='涨跌幅'):
         try:
             # 方法1: 直接使用shift
             df_work['明日涨跌幅'] = df_work[target_col].shift(-1)
-            print(f"成功创建'明日涨跌幅'列，基于列: {target_col}")
+            TT.log(f"成功创建'明日涨跌幅'列，基于列: {target_col}")
 
         except Exception as shift_error:
             print(f"shift操作失败: {shift_error}")
             # 方法2: 使用手动循环（更安全但较慢）
-            print("尝试使用备用方法...")
+            TT.log("尝试使用备用方法...")
             tomorrow_values = []
             for i in range(len(df_work)):
                 if i < len(df_work) - 1:
@@ -74,7 +76,7 @@ def reshape_stock_data(df, target_col='涨跌幅'):
                     tomorrow_values.append(np.nan)
 
             df_work['明日涨跌幅'] = tomorrow_values
-            print("备用方法成功")
+            TT.log("备用方法成功")
 
         # 7. 删除包含NaN的行（最后一行）
         original_len = len(df_work)
@@ -87,20 +89,21 @@ def reshape_stock_data(df, target_col='涨跌幅'):
         df_work = df_work[rows_to_keep].reset_index(drop=True)
 
         removed_count = original_len - len(df_work)
-        print(f"删除了 {removed_count} 行包含NaN的数据")
-        print(f"重组后数据形状: {df_work.shape}")
+        TT.log(f"删除了 {removed_count} 行包含NaN的数据")
+        TT.log(f"重组后数据形状: {df_work.shape}")
 
         # 8. 使用正确的方法检查DataFrame是否为空
         if df_work.empty:  # 使用.empty属性而不是直接判断
             print("警告: 重组后数据为空")
             return df_work
 
-        # 9. 验证结果
-        print("\n重组后数据预览:")
-        preview_cols = [target_col, '明日涨跌幅']
-        if '日期' in df_work.columns:
-            preview_cols = ['日期'] + preview_cols
-        print(df_work[preview_cols].head())
+        # 9. 验证结果（安静模式下不生成预览）
+        if not TT.is_quiet():
+            print("\n重组后数据预览:")
+            preview_cols = [target_col, '明日涨跌幅']
+            if '日期' in df_work.columns:
+                preview_cols = ['日期'] + preview_cols
+            print(df_work[preview_cols].head())
 
         return df_work
 
@@ -123,6 +126,7 @@ def safe_dataframe_check(df):
         return len(df) > 0
 
 # 灵活组成多日涨跌幅
+@TT.traced()
 def advanced_reshape_stock_data(df, feature_columns=None, target_col='涨跌幅', lookahead=1):
     """
     高级版本：支持多特征列和可调节预测步长
@@ -163,13 +167,14 @@ def advanced_reshape_stock_data(df, feature_columns=None, target_col='涨跌幅'
 
     final_df = reshaped_df[final_columns]
 
-    print(f"特征列: {feature_columns}")
-    print(f"目标列: {new_target_name}")
-    print(f"最终数据形状: {final_df.shape}")
+    TT.log(f"特征列: {feature_columns}")
+    TT.log(f"目标列: {new_target_name}")
+    TT.log(f"最终数据形状: {final_df.shape}")
 
     return final_df
 
 
+@TT.traced()
 def extract_columns_to_ndarray(df: pd.DataFrame,
                                features: Union[str, List[str]]) -> np.ndarray:
     """
@@ -190,7 +195,7 @@ def extract_columns_to_ndarray(df: pd.DataFrame,
 
             # 提取单列并转换为ndarray (保持二维形状)
             result = df[[features]].values
-            print(f"成功提取单列 '{features}'，形状: {result.shape}")
+            TT.log(f"成功提取单列 '{features}'，形状: {result.shape}")
             return result
 
         # 处理多列情况
@@ -205,7 +210,7 @@ def extract_columns_to_ndarray(df: pd.DataFrame,
 
             # 提取多列并转换为ndarray
             result = df[features].values
-            print(f"成功提取 {len(features)} 列，形状: {result.shape}")
+            TT.log(f"成功提取 {len(features)} 列，形状: {result.shape}")
             return result
 
         else:
@@ -0,0 +1,263 @@
+import datetime
+import json
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+# 共享内存中各列的起始位置按64字节对齐
+_ALIGN = 64
+# 本进程已连接的共享面板 {共享内存名称: SharedPanel}
+_attached = {}
+
+
+def build_panel(stock_data_dict):
+    """
+    将多只股票的数据合并为面板（长表）格式
+
+    参数:
+    stock_data_dict: {股票代码: 股票DataFrame}
+
+    返回:
+    DataFrame: 按股票代码、日期排序的长表，包含股票代码列
+    """
+    frames = []
+    for code, stock_data in stock_data_dict.items():
+        if stock_data is None or stock_data.empty:
+            continue
+        frames.append(stock_data.assign(股票代码=code))
+
+    if not frames:
+        return pd.DataFrame()
+
+    panel = pd.concat(frames, ignore_index=True)
+    sort_columns = ['股票代码', '日期'] if '日期' in panel.columns else ['股票代码']
+    return panel.sort_values(sort_columns, kind='mergesort').reset_index(drop=True)
+
+
+def to_wide(panel, column):
+    """
+    将面板中的一列转为宽表（行为日期，列为股票代码）
+
+    参数:
+    panel: build_panel返回的长表
+    column: 列名
+
+    返回:
+    DataFrame: index为日期，columns为股票代码
+    """
+    return panel.pivot(index='日期', columns='股票代码', values=column).sort_index()
+
+
+
+def _align(size):
+    return (size + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _encode_column(series):
+    """
+    把一列转换为定长的ndarray以便放入共享内存
+
+    返回:
+    tuple: (ndarray, 类别, 缺失值掩码)，类别为raw（数值、布尔、datetime64，原样保存，缺失值本身可表示，掩码为None）、
+           date（datetime.date对象，按datetime64[D]保存）或str（其他，按定长unicode保存）；
+           date和str的缺失值单独记录在布尔掩码中，还原时恢复为缺失值而不是NaT或空字符串
+    """
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufcmM':
+        return series.to_numpy(), 'raw', None
+    missing = series.isna().to_numpy()
+    values = series.dropna()
+    first = values.iloc[0] if len(values) else None
+    if isinstance(first, datetime.date) and not isinstance(first, datetime.datetime):
+        return pd.to_datetime(series).to_numpy(dtype='datetime64[D]'), 'date', missing
+    return np.asarray(series.where(~missing, '').astype(str), dtype=str), 'str', missing
+
+
+class SharedPanel:
+    """
+    放在共享内存中的多只股票数据，多个进程共用一份
+
+    发布方调用publish把数据写入一块共享内存，各列按股票依次连续存放；其他进程用attach(名称)连接后，
+    各列是直接指向共享内存的只读NumPy视图（不复制），frame(symbol)按原列名和类型还原单只股票的
+    DataFrame（只复制这只股票的行，分析函数可以随意修改）。列布局也写在共享内存中，
+    传给子进程的只有共享内存名称。用法:
+
+        with SharedPanel.publish({code: df, ...}) as panel:
+            with ProcessPoolExecutor(initializer=..., initargs=(panel.name,)) as executor:
+                ...
+        # 子进程中
+        panel = SharedPanel.attach(name)
+        df = panel.frame('600519')
+    """
+
+    def __init__(self, shm, layout, owner):
+        self._shm = shm
+        self.layout = layout
+        self.owner = owner
+        self._columns = {}
+        self._masks = {}
+        for column, kind, dtype, offset, mask_offset in layout['columns']:
+            view = np.ndarray((layout['rows'],), dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            if not owner:
+                view.flags.writeable = False
+            self._columns[column] = (kind, view)
+            if mask_offset is not None:
+                mask = np.ndarray((layout['rows'],), dtype=bool, buffer=shm.buf, offset=mask_offset)
+                if not owner:
+                    mask.flags.writeable = False
+                self._masks[column] = mask
+
+    @property
+    def name(self):
+        """共享内存名称，子进程用它attach"""
+        return self._shm.name
+
+    @property
+    def nbytes(self):
+        return self._shm.size
+
+    @classmethod
+    def publish(cls, stock_data_dict, info=None):
+        """
+        把多只股票的数据写入新建的共享内存
+
+        参数:
+        stock_data_dict: {股票代码: 股票DataFrame}，空数据跳过
+        info: {股票代码: 可JSON序列化的附加信息}，如读取的天数，子进程用info(symbol)读取
+
+        返回:
+        SharedPanel: 发布方，close()时释放共享内存
+        """
+        info = info or {}
+        encoded, symbols, rows = {}, {}, 0
+        for code, stock_data in stock_data_dict.items():
+            if stock_data is None or stock_data.empty:
+                continue
+            for column in stock_data.columns:
+                values, kind, missing = _encode_column(stock_data[column])
+                item = encoded.setdefault(column, {'kind': kind, 'parts': [], 'missing': []})
+                item['parts'].append((rows, values))
+                if missing is not None and missing.any():
+                    item['missing'].append((rows, missing))
+            # 各股票分别记录列类型：同一列在不同股票中的类型可能不同（如int64和float64），
+            # 共享内存中按提升后的类型保存，还原时转换回各自的类型
+            symbols[str(code)] = [rows, rows + len(stock_data), [str(column) for column in stock_data.columns],
+                                  info.get(code), [str(dtype) for dtype in stock_data.dtypes]]
+            rows += len(stock_data)
+
+        # 开头16字节记录列布局的位置和长度，之后依次为各列数据（有缺失值的列后接缺失值掩码），列布局（JSON）放在最后
+        columns, offset = [], _ALIGN
+        for column, item in encoded.items():
+            parts = item['parts']
+            if item['kind'] == 'str':
+                dtype = np.dtype(f"<U{max(max(values.dtype.itemsize // 4, 1) for _, values in parts)}")
+            else:
+                dtype = np.result_type(*[values.dtype for _, values in parts])
+            column_offset = offset
+            offset += _align(dtype.itemsize * rows)
+            mask_offset = None
+            if item['missing']:
+                mask_offset = offset
+                offset += _align(rows)
+            columns.append([str(column), item['kind'], dtype.str, column_offset, mask_offset])
+        layout = {'rows': rows, 'columns': columns, 'symbols': symbols}
+        header = json.dumps(layout, ensure_ascii=False).encode('utf-8')
+
+        shm = shared_memory.SharedMemory(create=True, size=offset + len(header))
+        shm.buf[:8] = offset.to_bytes(8, 'little')
+        shm.buf[8:16] = len(header).to_bytes(8, 'little')
+        shm.buf[offset:offset + len(header)] = header
+        panel = cls(shm, layout, owner=True)
+        for column, item in encoded.items():
+            view = panel._columns[str(column)][1]
+            for start, values in item['parts']:
+                view[start:start + len(values)] = values
+            mask = panel._masks.get(str(column))
+            if mask is not None:
+                mask[:] = False
+                for start, missing in item['missing']:
+                    mask[start:start + len(missing)] = missing
+        return panel
+
+    @classmethod
+    def attach(cls, name):
+        """连接已发布的共享面板，同一进程内多次连接同一名称时复用"""
+        panel = _attached.get(name)
+        if panel is None:
+            shm = shared_memory.SharedMemory(name=name)
+            offset = int.from_bytes(bytes(shm.buf[:8]), 'little')
+            length = int.from_bytes(bytes(shm.buf[8:16]), 'little')
+            layout = json.loads(bytes(shm.buf[offset:offset + length]).decode('utf-8'))
+            panel = _attached[name] = cls(shm, layout, owner=False)
+        return panel
+
+    def symbols(self):
+        return list(self.layout['symbols'])
+
+    def __contains__(self, symbol):
+        return symbol in self.layout['symbols']
+
+    def info(self, symbol):
+        """publish时传入的附加信息"""
+        return self.layout['symbols'][symbol][3]
+
+    def column(self, column):
+        """整列（所有股票）的NumPy视图，不复制"""
+        return self._columns[column][1]
+
+    def rows(self, symbol):
+        """股票在各列中的行范围(start, stop)"""
+        start, stop = self.layout['symbols'][symbol][:2]
+        return start, stop
+
+    def frame(self, symbol):
+        """
+        还原单只股票的DataFrame（复制该股票的行，列名、列顺序和类型与发布时一致，索引为0..n-1）
+
+        返回:
+        DataFrame: 股票不在面板中时为空表
+        """
+        if symbol not in self.layout['symbols']:
+            return pd.DataFrame()
+        start, stop, columns, _, dtypes = self.layout['symbols'][symbol]
+        data = {}
+        for column, pandas_dtype in zip(columns, dtypes):
+            kind, view = self._columns[column]
+            values = view[start:stop]
+            if kind == 'raw':
+                # 与共享内存中的类型相同时astype也会复制，frame可以随意修改
+                data[column] = values.astype(pandas_dtype)
+                continue
+            if kind == 'date':
+                values = pd.Series(values).dt.date
+            else:
+                values = pd.Series(values, dtype=object)
+            mask = self._masks.get(column)
+            if mask is not None and mask[start:stop].any():
+                values = values.astype(object).where(~mask[start:stop], None)
+            data[column] = values.astype(pandas_dtype) if kind == 'str' else values
+        return pd.DataFrame(data)
+
+    def frames(self, symbols=None):
+        """{股票代码: DataFrame}"""
+        return {symbol: self.frame(symbol) for symbol in (self.symbols() if symbols is None else symbols)
+                if symbol in self}
+
+    def close(self):
+        """断开连接，发布方同时释放共享内存"""
+        self._columns = {}
+        self._masks = {}
+        _attached.pop(self.name, None)
+        try:
+            self._shm.close()
+        except BufferError:
+            # 仍有外部引用column()返回的视图，映射在进程退出时释放
+            pass
+        if self.owner:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,386 @@
+"""
+结构化的分析结果记录和流式输出
+
+- LevelRecord / HisRecord / PCARecord: 每只股票（每个分析目标、每个特征）一行的数值记录，
+  字段名为英文，metadata中的label为输出时使用的中文列名
+- level_records / his_records / pca_records: 把各分析的结果dict转换为记录
+- JSONLWriter / CSVWriter / ParquetWriter: 逐批写出记录，不在内存中拼接整个报告，
+  Parquet需要安装pyarrow
+
+用法:
+
+    import tools.reportTools as RT
+    with RT.open_writer('level.csv', RT.LevelRecord) as writer:
+        for symbol in symbols:
+            writer.write(RT.level_records(symbol, GL.levelResult(store.get(symbol, 1000))))
+"""
+import csv
+import dataclasses
+import datetime
+import json
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+def _column(label):
+    """记录字段：默认值为None，label为输出时的中文列名"""
+    return field(default=None, metadata={'label': label})
+
+
+@dataclass
+class LevelRecord:
+    """位置分析结果（每只股票一行）"""
+    symbol: Optional[str] = _column('股票代码')
+    date: Optional[str] = _column('分析时间')
+    close: Optional[float] = _column('收盘价')
+    ma10: Optional[float] = _column('MA10')
+    ma20: Optional[float] = _column('MA20')
+    ma30: Optional[float] = _column('MA30')
+    trend: Optional[str] = _column('趋势')
+    ma_alignment: Optional[str] = _column('均线排列')
+    position_percent: Optional[float] = _column('位置百分比')
+    position_level: Optional[str] = _column('位置级别')
+    history_high: Optional[float] = _column('历史高点')
+    history_low: Optional[float] = _column('历史低点')
+    recent_high: Optional[float] = _column('近期高点')
+    volume_area_top: Optional[float] = _column('成交密集区上沿')
+    unfilled_gap: Optional[float] = _column('上方未回补缺口')
+    rsi: Optional[float] = _column('RSI')
+    rsi_state: Optional[str] = _column('RSI状态')
+    macd_signal: Optional[str] = _column('MACD信号')
+    boll_position: Optional[str] = _column('BOLL位置')
+    kdj_state: Optional[str] = _column('KDJ状态')
+    atr_percent: Optional[float] = _column('ATR占收盘价(%)')
+    pe: Optional[float] = _column('当前PE')
+    pb: Optional[float] = _column('当前PB')
+    pe_percentile: Optional[float] = _column('PE历史分位')
+    pb_percentile: Optional[float] = _column('PB历史分位')
+    valuation: Optional[str] = _column('综合估值')
+    suggestion: Optional[str] = _column('综合建议')
+
+
+@dataclass
+class HisRecord:
+    """历史分位分析结果（每只股票每个分析目标一行）"""
+    symbol: Optional[str] = _column('股票代码')
+    target: Optional[str] = _column('分析目标')
+    current: Optional[float] = _column('当前值')
+    history_percentile: Optional[float] = _column('历史分位')
+    history_level: Optional[str] = _column('历史水平')
+    history_count: Optional[int] = _column('历史数据量')
+    recent_rank: Optional[int] = _column('近期排名')
+    recent_count: Optional[int] = _column('近期数据量')
+    rank_percent: Optional[float] = _column('排名百分比')
+    alert: Optional[str] = _column('超量提示')
+    alert_level: Optional[str] = _column('超量等级')
+    recent_mean: Optional[float] = _column('近期平均值')
+    recent_median: Optional[float] = _column('近期中位数')
+    recent_max: Optional[float] = _column('近期最大值')
+    recent_min: Optional[float] = _column('近期最小值')
+    recent_std: Optional[float] = _column('近期标准差')
+    market_percentile: Optional[float] = _column('全市场分位')
+    market_rank: Optional[int] = _column('全市场排名')
+    market_count: Optional[int] = _column('全市场有效数量')
+    percentile_error: Optional[float] = _column('分位误差')
+    error: Optional[str] = _column('错误信息')
+
+
+@dataclass
+class PCARecord:
+    """PCA特征排名（每只股票每个特征一行）"""
+    symbol: Optional[str] = _column('股票代码')
+    rank: Optional[int] = _column('排名')
+    feature: Optional[str] = _column('特征')
+    score: Optional[float] = _column('相似度得分')
+    direction: Optional[str] = _column('方向')
+    explained_variance: Optional[float] = _column('累计方差解释')
+
+
+def _float(value):
+    """转换为float，缺失、NaN或无法转换时为None"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _int(value):
+    value = _float(value)
+    return None if value is None else int(value)
+
+
+def _str(value):
+    if value is None:
+        return None
+    if isinstance(value, (datetime.date, datetime.datetime)) or hasattr(value, 'isoformat'):
+        return value.isoformat()[:10]
+    return str(value)
+
+
+# ---------- 分析结果 -> 记录 ----------
+
+def level_records(symbol, result):
+    """
+    位置分析结果（getLevel.levelResult的返回值）转换为记录
+
+    返回:
+    list: [LevelRecord]
+    """
+    trend = result.get('趋势分析') or {}
+    position = result.get('历史位置分析') or {}
+    pressure = result.get('压力位分析') or {}
+    indicators = result.get('技术指标分析') or {}
+    valuation = result.get('估值分析') or {}
+    return [LevelRecord(
+        symbol=symbol,
+        date=_str(result.get('分析时间')),
+        close=_float(trend.get('收盘价')),
+        ma10=_float(trend.get('MA10')),
+        ma20=_float(trend.get('MA20')),
+        ma30=_float(trend.get('MA30')),
+        trend=_str(trend.get('趋势')),
+        ma_alignment=_str((result.get('均线关系分析') or {}).get('均线排列')),
+        position_percent=_float(position.get('位置百分比')),
+        position_level=_str(position.get('位置级别')),
+        history_high=_float(position.get('历史高点')),
+        history_low=_float(position.get('历史低点')),
+        recent_high=_float(pressure.get('近期高点')),
+        volume_area_top=_float(pressure.get('成交密集区上沿')),
+        unfilled_gap=_float(pressure.get('上方未回补缺口')),
+        rsi=_float(indicators.get('RSI')),
+        rsi_state=_str(indicators.get('RSI状态')),
+        macd_signal=_str(indicators.get('MACD信号')),
+        boll_position=_str(indicators.get('BOLL位置')),
+        kdj_state=_str(indicators.get('KDJ状态')),
+        atr_percent=_float(indicators.get('ATR占收盘价(%)')),
+        pe=_float(valuation.get('当前PE')),
+        pb=_float(valuation.get('当前PB')),
+        pe_percentile=_float(valuation.get('PE历史分位')),
+        pb_percentile=_float(valuation.get('PB历史分位')),
+        valuation=_str(valuation.get('综合估值')),
+        suggestion=_str(result.get('综合建议'))
+    )]
+
+
+def his_records(symbol, output):
+    """
+    历史分位分析结果（getHisAnalysis.hisResult的返回值）转换为记录，每个分析目标一行；
+    日内量比结果（{'日内量比': IntradayMonitor.metrics()}）的当前值为当日累计成交量
+
+    返回:
+    list: [HisRecord]
+    """
+    records = []
+    for target, result in output.items():
+        if target == '总体信息' or not isinstance(result, dict):
+            continue
+        if '错误信息' in result:
+            records.append(HisRecord(symbol=symbol, target=target, error=_str(result['错误信息'])))
+            continue
+        stats = result.get('近期统计') or {}
+        info = result.get('数据信息') or {}
+        records.append(HisRecord(
+            symbol=symbol,
+            target=target,
+            current=_float(result.get('当前值', result.get('累计成交量'))),
+            history_percentile=_float(result.get('历史分位')),
+            history_level=_str(result.get('历史水平')),
+            history_count=_int(info.get('历史数据量')),
+            recent_rank=_int(result.get('近期排名')),
+            recent_count=_int(info.get('近期数据量')),
+            rank_percent=_float(result.get('排名百分比')),
+            alert=_str(result.get('超量提示')),
+            alert_level=_str(result.get('超量等级')),
+            recent_mean=_float(stats.get('平均值')),
+            recent_median=_float(stats.get('中位数')),
+            recent_max=_float(stats.get('最大值')),
+            recent_min=_float(stats.get('最小值')),
+            recent_std=_float(stats.get('标准差')),
+            market_percentile=_float(result.get('全市场分位')),
+            market_rank=_int(result.get('全市场排名')),
+            market_count=_int(result.get('全市场有效数量')),
+            percentile_error=_float(info.get('分位误差'))
+        ))
+    return records
+
+
+def pca_records(symbol, result):
+    """
+    PCA结果（getPCA.pcaResult返回的(模型, 特征排名)）转换为记录，每个特征一行
+
+    返回:
+    list: [PCARecord]
+    """
+    analyzer, rankings = result
+    summary = analyzer.get_pca_summary()
+    cumulative = summary.get('cumulative_variance_ratio')
+    explained = _float(cumulative[-1]) if cumulative is not None and len(cumulative) else None
+    directions = {}
+    for feature, _, direction, _ in analyzer.rank_features_with_direction():
+        directions[feature] = direction
+    return [PCARecord(symbol=symbol, rank=i + 1, feature=_str(feature), score=_float(score),
+                      direction=directions.get(feature), explained_variance=explained)
+            for i, (feature, score) in enumerate(rankings)]
+
+
+# 分析名称: (记录类型, 转换函数)
+RECORD_BUILDERS = {
+    'level': (LevelRecord, level_records),
+    'his': (HisRecord, his_records),
+    'pca': (PCARecord, pca_records)
+}
+
+
+def labels(record_type):
+    """记录类型的中文列名列表"""
+    return [item.metadata.get('label', item.name) for item in dataclasses.fields(record_type)]
+
+
+def to_row(record):
+    """记录转换为{中文列名: 值}"""
+    return {item.metadata.get('label', item.name): getattr(record, item.name)
+            for item in dataclasses.fields(record)}
+
+
+# ---------- 流式输出 ----------
+
+class _RecordWriter:
+    """逐批写出同一类型记录的基类，可用with语句自动关闭"""
+
+    extension = ''
+
+    def __init__(self, path, record_type):
+        self.path = path
+        self.record_type = record_type
+        self.count = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, records):
+        """写出一批记录，返回本批数量"""
+        written = 0
+        for record in records:
+            self._write(record)
+            written += 1
+        self.count += written
+        return written
+
+    def _write(self, record):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class JSONLWriter(_RecordWriter):
+    """每条记录一行JSON，键为中文列名"""
+
+    extension = 'jsonl'
+
+    def __init__(self, path, record_type):
+        super().__init__(path, record_type)
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def _write(self, record):
+        self._file.write(json.dumps(to_row(record), ensure_ascii=False) + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+class CSVWriter(_RecordWriter):
+    """带表头的CSV，使用utf-8-sig编码以便Excel直接打开"""
+
+    extension = 'csv'
+
+    def __init__(self, path, record_type):
+        super().__init__(path, record_type)
+        self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(labels(record_type))
+
+    def _write(self, record):
+        self._writer.writerow(['' if value is None else value for value in dataclasses.astuple(record)])
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter(_RecordWriter):
+    """
+    Parquet文件，按row_group_size条记录一组写出（需要安装pyarrow）
+
+    列类型由记录字段的类型注解决定，缺失值写为null
+    """
+
+    extension = 'parquet'
+
+    def __init__(self, path, record_type, row_group_size=10000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("输出Parquet需要安装pyarrow: pip install pyarrow")
+        super().__init__(path, record_type)
+        self._pa = pa
+        types = {Optional[float]: pa.float64(), Optional[int]: pa.int64(), Optional[str]: pa.string()}
+        self._fields = dataclasses.fields(record_type)
+        self._schema = pa.schema([(item.metadata.get('label', item.name), types.get(item.type, pa.string()))
+                                  for item in self._fields])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._row_group_size = row_group_size
+        self._buffer = []
+
+    def _write(self, record):
+        self._buffer.append(record)
+        if len(self._buffer) >= self._row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        columns = [[getattr(record, item.name) for record in self._buffer] for item in self._fields]
+        self._writer.write_table(self._pa.Table.from_arrays(
+            [self._pa.array(values, type=column.type) for values, column in zip(columns, self._schema)],
+            schema=self._schema))
+        self._buffer = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+# 输出格式: 写出类
+FORMATS = {
+    'jsonl': JSONLWriter,
+    'csv': CSVWriter,
+    'parquet': ParquetWriter
+}
+
+
+def open_writer(path, record_type, fmt=None):
+    """
+    按格式打开记录输出
+
+    参数:
+    path: 输出文件路径
+    record_type: 记录类型，如LevelRecord
+    fmt: 'jsonl'、'csv'或'parquet'，为None时按文件扩展名判断
+
+    返回:
+    _RecordWriter: 调用write(records)逐批写出，结束时close()
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的输出格式: {fmt}，可选: {', '.join(FORMATS)}")
+    return FORMATS[fmt](path, record_type)
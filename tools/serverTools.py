@@ -0,0 +1,517 @@
+"""
+常驻分析服务
+
+进程常驻内存，保留行情数据（DataStore）、分析结果和PCA模型（ResultCache）以及工作进程中的
+表达式编译缓存、有序索引缓存，通过本地HTTP（TCP或Unix socket）提供查询:
+
+    GET  /health                      服务状态
+    GET  /stats                       缓存命中统计
+    POST /refresh                     清空内存中的行情数据（下次请求重新读取）
+    GET  /level?symbol=600519         相对位置判断（level.getLevel）
+    GET  /his?symbol=600519&analysis_target=成交量&analysis_target=涨跌幅/成交量
+                                      历史分位分析（getHis.getHisAnalysis）
+    GET  /pca?symbol=600519           PCA特征排名
+
+参数也可以用POST的JSON请求体传入，未提供的参数使用对应分析配置文件中的值；symbol只能是1-10位字母或数字；analysis_target和features
+只能是列名、技术指标名或由它们组成的四则运算表达式（见getHis.validate_target），其他内容直接拒绝。
+前端为asyncio事件循环，行情读取在线程池中进行，分析计算在进程池中进行；结果缓存命中时不经过进程池。
+
+访问控制：监听本机地址时只接受Host为本机、且不是来自其他网站（Origin、Sec-Fetch-Site）的请求；
+配置了token时每个请求都需带上"Authorization: Bearer <token>"或"X-Auth-Token: <token>"头。
+监听非本机地址时必须配置token，否则不启动。
+
+    python main.py --serve                         # 使用cfg/server_config.json
+    python main.py --serve --port 8765 -w 4
+    python main.py --serve --socket /tmp/fa.sock
+    curl 'http://127.0.0.1:8765/level?symbol=600519'
+"""
+import asyncio
+import datetime
+import hmac
+import ipaddress
+import json
+import math
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+import numpy as np
+import pandas as pd
+import tools.batchTools as BT
+import tools.cacheTools as CaT
+import tools.traceTools as TT
+
+# 请求体大小上限
+MAX_BODY_BYTES = 1024 * 1024
+
+HTTP_STATUS = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden', 404: 'Not Found',
+               405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+# 股票代码只允许字母和数字（代码会用于本地缓存文件路径）
+SYMBOL_PATTERN = re.compile(r'[0-9A-Za-z]{1,10}')
+
+# 本机地址的主机名
+LOCAL_HOSTNAMES = {'localhost', '127.0.0.1', '::1'}
+
+
+def is_local_host(host):
+    """host（可带端口，IPv6地址可带方括号）是否为本机地址"""
+    host = (host or '').strip().lower()
+    if host.startswith('['):
+        host = host[1:].split(']', 1)[0]
+    elif host.count(':') == 1:
+        host = host.split(':', 1)[0]
+    if host in LOCAL_HOSTNAMES:
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+# ---------- 工作进程 ----------
+# 计算函数在工作进程中执行，返回值与命令行中缓存的结果相同，因此服务与命令行共用磁盘结果缓存
+
+def _init_worker():
+    """工作进程启动时导入分析模块，第一个请求不再承担导入耗时；分析过程的打印对服务没有意义，一律关闭"""
+    TT.set_quiet(True)
+    import analysis.LEVELanalysis.level
+    import analysis.HISAnalysis.getHis
+    import analysis.getPCA
+
+
+def _warm_up():
+    """占用工作进程一小段时间，使进程池在启动时就创建全部工作进程"""
+    time.sleep(0.2)
+    return os.getpid()
+
+
+def _compute_level(stock_data, valuation_data, config):
+    import analysis.LEVELanalysis.level as level
+    return level.getLevel(stock_data, valuation_data, config['current_pe'], config['current_pb'],
+                          ma_windows=config['ma_windows'], profile_windows=config['profile_windows'],
+                          indicator_params=config['indicator_params'])
+
+
+def _compute_his(history_data, quantity_data, analysis_target, symbol):
+    import analysis.HISAnalysis.getHis as getHis
+    import analysis.HISAnalysis.sortedCache as sortedCache
+    # 工作进程常驻，有序索引缓存在同一股票的后续请求中复用
+    return getHis.getHisAnalysis(history_data, quantity_data, analysis_target,
+                                 symbol=symbol, cache=sortedCache.DEFAULT_CACHE)
+
+
+def _compute_pca(features, stock_data):
+    import analysis.getPCA as getPCA
+    return getPCA.fitPCA(features, stock_data)
+
+
+# ---------- 结果转为JSON ----------
+
+def to_jsonable(value):
+    """把分析结果中的numpy、pandas类型转为可JSON序列化的Python对象，NaN转为None"""
+    if isinstance(value, dict):
+        return {str(key): to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, pd.DataFrame):
+        return to_jsonable(value.reset_index().to_dict(orient='records'))
+    if isinstance(value, pd.Series):
+        return to_jsonable(value.to_dict())
+    if isinstance(value, np.ndarray):
+        return to_jsonable(value.tolist())
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        return None if math.isnan(value) or math.isinf(value) else value
+    if isinstance(value, (pd.Timestamp, datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if value is None or isinstance(value, (str, int, bool)):
+        return value
+    return str(value)
+
+
+def coerce_param(value, default):
+    """把查询字符串中的参数按配置默认值的类型转换"""
+    if isinstance(value, list) and not isinstance(default, list):
+        value = value[-1]
+    if not isinstance(value, str):
+        return value
+    if isinstance(default, bool):
+        return value.lower() in ('1', 'true', 'yes')
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, float):
+        return float(value)
+    if isinstance(default, list):
+        return [value]
+    if isinstance(default, dict):
+        return json.loads(value)
+    return value
+
+
+def _validate_targets(targets, columns):
+    """外部传入的分析目标或特征只能是列名、技术指标名或它们的四则运算表达式"""
+    import analysis.HISAnalysis.getHis as getHis
+    for target in [targets] if isinstance(targets, str) else targets:
+        getHis.validate_target(target, list(columns))
+
+
+class AnalysisServer:
+    """
+    常驻分析服务
+
+    - 行情数据：DataStore按股票缓存，跨日时自动清空（本地数据缓存按日期命名，跨日需重新获取）
+    - 分析结果：ResultCache按(分析, 股票, 数据指纹, 参数)缓存，命中时直接返回
+    - 相同的请求同时到达时只计算一次
+    """
+
+    def __init__(self, workers=2, cfg_dir=BT.CFG_DIR, result_cache=None, token=None, local_only=True):
+        """
+        token: 访问令牌，为空时不校验
+        local_only: 只接受Host为本机地址的请求（监听本机地址时开启，防止DNS重绑定）
+        """
+        self.workers = max(1, workers)
+        self.token = token or None
+        self.local_only = local_only
+        self.configs = {name: BT.load_config(BT.ANALYSES[name][1], cfg_dir) for name in ('level', 'his', 'pca')}
+        self.cache = result_cache or CaT.DEFAULT_RESULT_CACHE
+        self.pool = None
+        self._store = BT.DataStore()
+        self._store_date = datetime.date.today()
+        self._inflight = {}
+        self.requests = 0
+        self.started = time.time()
+        # 路径: (处理函数, 允许的方法)
+        self.routes = {
+            '/health': (self.health, ('GET',)),
+            '/stats': (self.stats, ('GET',)),
+            '/refresh': (self.refresh, ('POST',)),
+            '/level': (self.level, ('GET', 'POST')),
+            '/his': (self.his, ('GET', 'POST')),
+            '/pca': (self.pca, ('GET', 'POST'))
+        }
+
+    # ---------- 状态 ----------
+
+    def store(self):
+        """当天的DataStore，跨日时换新"""
+        today = datetime.date.today()
+        if today != self._store_date:
+            self._store = BT.DataStore()
+            self._store_date = today
+        return self._store
+
+    async def health(self, params):
+        return {'状态': '运行中', '运行时间(s)': round(time.time() - self.started, 1), '工作进程数': self.workers}
+
+    async def stats(self, params):
+        return {
+            '请求数': self.requests,
+            '缓存股票数': len(self.store()._frames),
+            '结果缓存': {'内存命中': self.cache.hits, '磁盘命中': self.cache.disk_hits, '未命中': self.cache.misses,
+                      '内存条目': len(self.cache._memory)}
+        }
+
+    async def refresh(self, params):
+        self._store = BT.DataStore()
+        return {'状态': '已清空行情数据'}
+
+    # ---------- 分析 ----------
+
+    def params(self, name, request):
+        """请求参数与配置文件默认值合并"""
+        cfg = self.configs[name]
+        params = {key: coerce_param(request[key], BT.config_value(cfg, key)) if key in request
+                  else BT.config_value(cfg, key) for key in cfg}
+        symbol = request.get('symbol', request.get('stock_code'))
+        if isinstance(symbol, list):
+            symbol = symbol[-1]
+        if not symbol:
+            raise ValueError("缺少参数symbol")
+        if not SYMBOL_PATTERN.fullmatch(str(symbol)):
+            raise ValueError(f"无效的股票代码: {symbol}")
+        params['stock_code'] = str(symbol)
+        return params
+
+    async def fetch(self, symbol, days, valuation=False):
+        """在线程池中读取行情（或估值）数据"""
+        store = self.store()
+        loader = store.get_valuation if valuation else store.get
+        return await asyncio.get_running_loop().run_in_executor(None, loader, symbol, days)
+
+    async def cached(self, analysis, symbol, frames, config, func, *args):
+        """
+        查结果缓存，未命中时在进程池中计算并写入缓存
+
+        返回:
+        tuple: (结果, 是否命中缓存)
+        """
+        loop = asyncio.get_running_loop()
+        key = self.cache.key(analysis, symbol, await loop.run_in_executor(None, CaT.data_fingerprint, *frames), config)
+        # 磁盘命中需要读文件，同样放到线程池
+        hit, value = await loop.run_in_executor(None, self.cache.get, key)
+        if hit:
+            return value, True
+        # 相同请求正在计算时等待其结果
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key]), False
+
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            value = await loop.run_in_executor(self.pool, func, *args)
+            await loop.run_in_executor(None, self.cache.put, key, value, analysis, symbol)
+            future.set_result(value)
+            return value, False
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免"exception was never retrieved"警告
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def level(self, params):
+        params = self.params('level', params)
+        symbol = params['stock_code']
+        stock_data = await self.fetch(symbol, params['days'])
+        if stock_data is None or stock_data.empty:
+            raise ValueError(f"未获取到{symbol}的数据")
+        valuation_data = None
+        if params.get('valuation_days'):
+            valuation_data = await self.fetch(symbol, params['valuation_days'], valuation=True)
+        # 与getLevel.levelResult的缓存参数一致，和命令行共用缓存
+        config = {'current_pe': None, 'current_pb': None, 'ma_windows': params['ma_windows'],
+                  'profile_windows': params['profile_windows'], 'indicator_params': params['indicator_params']}
+        result, hit = await self.cached('level', symbol, [stock_data, valuation_data], config,
+                                        _compute_level, stock_data, valuation_data, config)
+        return result, hit
+
+    async def his(self, params):
+        params = self.params('his', params)
+        symbol = params['stock_code']
+        history_days, quantity_days = params['history_days'], params['quantity_days']
+        await self.fetch(symbol, max(history_days, quantity_days))
+        history_data = await self.fetch(symbol, history_days)
+        quantity_data = await self.fetch(symbol, quantity_days)
+        if history_data is None or history_data.empty:
+            raise ValueError(f"未获取到{symbol}的数据")
+        # 与getHisAnalysis.hisResult的缓存参数一致
+        target = params['analysis_target']
+        _validate_targets(target, history_data.columns)
+        result, hit = await self.cached('his', symbol, [history_data, quantity_data], {'analysis_target': target},
+                                        _compute_his, history_data, quantity_data, target, symbol)
+        return result, hit
+
+    async def pca(self, params):
+        params = self.params('pca', params)
+        symbol = params['stock_code']
+        stock_data = await self.fetch(symbol, params['days'])
+        if stock_data is None or stock_data.empty:
+            raise ValueError(f"未获取到{symbol}的数据")
+        features = params['features']
+        _validate_targets(features, stock_data.columns)
+        # 与getPCA.pcaResult的缓存参数一致，缓存拟合好的模型
+        (analyzer, rankings), hit = await self.cached('pca', symbol, [stock_data], {'features': features},
+                                                      _compute_pca, features, stock_data)
+        summary = analyzer.get_pca_summary()
+        return {
+            '特征排名': [{'特征': name, '得分': score} for name, score in rankings],
+            '特征方向': [{'特征': name, '得分': score, '方向': direction}
+                     for name, score, direction, _ in analyzer.rank_features_with_direction()],
+            '主成分数量': summary['n_components'],
+            '方差解释比例': summary['explained_variance_ratio'],
+            '累计方差解释': summary['cumulative_variance_ratio']
+        }, hit
+
+    # ---------- HTTP ----------
+
+    def authorize(self, headers):
+        """
+        检查请求来源和令牌
+
+        返回:
+        tuple: (HTTP状态码, 错误信息)，允许时为(None, None)
+        """
+        if self.local_only and 'host' in headers and not is_local_host(headers['host']):
+            return 403, f"拒绝非本机Host的请求: {headers['host']}"
+        origin = headers.get('origin')
+        if origin and origin != 'null' and not is_local_host(urlsplit(origin).netloc):
+            return 403, f"拒绝来自其他网站的请求: {origin}"
+        if origin == 'null' or headers.get('sec-fetch-site', 'none') not in ('none', 'same-origin'):
+            return 403, "拒绝来自其他网站的请求"
+        if self.token:
+            supplied = headers.get('x-auth-token') or ''
+            scheme, _, credential = headers.get('authorization', '').partition(' ')
+            if scheme.lower() == 'bearer':
+                supplied = credential.strip()
+            if not hmac.compare_digest(supplied.encode('utf-8'), self.token.encode('utf-8')):
+                return 401, "缺少或错误的访问令牌"
+        return None, None
+
+    async def dispatch(self, method, target, body):
+        """
+        处理一个请求（访问控制在handle_connection中已检查）
+
+        返回:
+        tuple: (HTTP状态码, 响应dict)
+        """
+        url = urlsplit(target)
+        route = self.routes.get(url.path.rstrip('/') or '/')
+        if route is None:
+            return 404, {'ok': False, 'error': f"未知的路径: {url.path}，可用: {', '.join(self.routes)}"}
+        handler, methods = route
+        if method not in methods:
+            return 405, {'ok': False, 'error': f"{url.path}不支持{method}，可用: {', '.join(methods)}"}
+
+        params = {key: values if len(values) > 1 else values[0]
+                  for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+        if body:
+            try:
+                params.update(json.loads(body))
+            except (ValueError, TypeError) as e:
+                return 400, {'ok': False, 'error': f"请求体不是有效的JSON对象: {e}"}
+
+        self.requests += 1
+        start = time.perf_counter()
+        try:
+            with TT.span(f"serve{url.path}", symbol=params.get('symbol')) as sp:
+                output = await handler(params)
+                hit = None
+                if isinstance(output, tuple):
+                    output, hit = output
+                    sp.set(cache_hit=hit)
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {'ok': False, 'error': str(e)}
+        except Exception as e:
+            print(f"{url.path}请求处理失败: {e}")
+            return 500, {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+
+        response = {'ok': True, 'result': output, '耗时(ms)': round((time.perf_counter() - start) * 1000, 2)}
+        if hit is not None:
+            response['缓存命中'] = hit
+        return 200, response
+
+    async def handle_connection(self, reader, writer):
+        """HTTP/1.1连接，支持keep-alive"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    # 有的客户端在路径中直接发送未编码的中文
+                    method, target, version = request_line.decode('utf-8', 'replace').strip().split(' ')
+                except ValueError:
+                    await self._respond(writer, 400, {'ok': False, 'error': "无效的请求行"}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0) or 0)
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {'ok': False, 'error': "请求体过大"}, False)
+                    break
+                body = (await reader.readexactly(length)).decode('utf-8') if length else ''
+
+                status, error = self.authorize(headers)
+                if status is None:
+                    status, response = await self.dispatch(method.upper(), target, body)
+                else:
+                    response = {'ok': False, 'error': error}
+                await self._respond(writer, status, response, keep_alive)
+                TT.log(f"{method} {target} {status}" + (f" {response['耗时(ms)']}ms" if '耗时(ms)' in response else ''))
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, response, keep_alive):
+        payload = json.dumps(to_jsonable(response), ensure_ascii=False).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {HTTP_STATUS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + payload)
+        await writer.drain()
+
+    # ---------- 启动 ----------
+
+    async def preload(self, symbols):
+        """启动时预先读取常用股票的数据，并计算各分析的结果"""
+        for symbol in symbols:
+            for path in ('/level', '/his', '/pca'):
+                status, response = await self.dispatch('GET', f"{path}?symbol={symbol}", '')
+                if status != 200:
+                    print(f"预热{symbol} {path}失败: {response.get('error')}")
+
+    async def serve(self, host='127.0.0.1', port=8765, unix_socket=None, preload_symbols=None):
+        """启动服务，直到被中断"""
+        if not unix_socket and not is_local_host(host) and not self.token:
+            raise ValueError(f"监听非本机地址{host}时必须在服务配置中设置token")
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        try:
+            if unix_socket:
+                if os.path.exists(unix_socket):
+                    os.remove(unix_socket)
+                server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+                address = unix_socket
+            else:
+                server = await asyncio.start_server(self.handle_connection, host, port)
+                address = f"http://{host}:{port}"
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[loop.run_in_executor(self.pool, _warm_up) for _ in range(self.workers)])
+            if preload_symbols:
+                print(f"🔥 预热{len(preload_symbols)}只股票...")
+                await self.preload(preload_symbols)
+            print(f"🚀 分析服务已启动: {address}（工作进程{self.workers}个）")
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            if unix_socket and os.path.exists(unix_socket):
+                os.remove(unix_socket)
+
+
+def run_server(cfg_dir=BT.CFG_DIR, config_file='server_config.json', host=None, port=None, unix_socket=None,
+               workers=None, quiet=False):
+    """
+    按配置启动常驻分析服务，命令行参数优先于配置文件
+
+    参数:
+    cfg_dir: 配置目录，各分析的默认参数也从这里读取
+    config_file: 服务配置文件
+    host/port: TCP监听地址
+    unix_socket: Unix socket路径，提供时不监听TCP
+    workers: 计算进程数
+    quiet: 不打印请求日志和数据获取等过程信息
+    """
+    cfg = BT.load_config(config_file, cfg_dir)
+    TT.set_quiet(quiet)
+    host = host or BT.config_value(cfg, "host", '127.0.0.1')
+    unix_socket = unix_socket or BT.config_value(cfg, "unix_socket") or None
+    server = AnalysisServer(workers or BT.config_value(cfg, "workers", 2), cfg_dir,
+                            token=BT.config_value(cfg, "token") or os.environ.get('ANALYSIS_SERVER_TOKEN'),
+                            local_only=bool(unix_socket) or is_local_host(host))
+    preload_symbols = BT.config_value(cfg, "preload_symbols", [])
+    watchlist = BT.config_value(cfg, "preload_watchlist", "")
+    if watchlist:
+        preload_symbols = list(dict.fromkeys(list(preload_symbols) + BT.read_watchlist(watchlist)))
+    try:
+        asyncio.run(server.serve(host, port or BT.config_value(cfg, "port", 8765), unix_socket, preload_symbols))
+    except ValueError as e:
+        print(f"分析服务启动失败: {e}")
+    except KeyboardInterrupt:
+        print("\n分析服务已停止")
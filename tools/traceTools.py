@@ -0,0 +1,328 @@
+"""
+运行过程的耗时跟踪
+
+- span(name, **attrs): 计时区间，可嵌套，记录耗时、行列数和（开启时）内存分配
+- log(...): 过程性输出，安静模式下不打印（错误信息仍直接print）
+- 导出为JSON lines（每个区间一行）或火焰图使用的折叠栈格式（flamegraph.pl、speedscope可直接读取）
+
+默认不开启跟踪，此时span只返回一个空对象，几乎没有开销。用法:
+
+    import tools.traceTools as TT
+    TT.enable()
+    with TT.span('reshape_stock_data', symbol='600519') as sp:
+        df = ...
+        sp.set_shape(df)
+    TT.export_jsonl('trace.jsonl')
+    TT.export_folded('trace.folded')
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+import pandas as pd
+
+_state = {'enabled': False, 'memory': False, 'quiet': False}
+_records = []
+_records_lock = threading.Lock()
+# 每个线程各自的区间栈
+_local = threading.local()
+
+
+def enable(memory=False):
+    """
+    开启跟踪
+
+    参数:
+    memory: 是否用tracemalloc统计每个区间的内存分配（开销较大；tracemalloc为进程全局，
+            多线程并发时各线程的分配会计入同一时段内的所有区间）
+    """
+    _state['enabled'] = True
+    _state['memory'] = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    """关闭跟踪（已记录的区间保留）"""
+    if _state['memory'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _state['enabled'] = False
+    _state['memory'] = False
+
+
+def is_enabled():
+    return _state['enabled']
+
+
+def set_quiet(quiet=True):
+    """安静模式：log()不再打印"""
+    _state['quiet'] = quiet
+
+
+def is_quiet():
+    return _state['quiet']
+
+
+@contextlib.contextmanager
+def quiet():
+    """在with块内临时进入安静模式"""
+    previous = _state['quiet']
+    _state['quiet'] = True
+    try:
+        yield
+    finally:
+        _state['quiet'] = previous
+
+
+def log(*args, **kwargs):
+    """过程性输出，用法同print，安静模式下忽略"""
+    if not _state['quiet']:
+        print(*args, **kwargs)
+
+
+def state():
+    """当前设置，用于传给子进程的configure"""
+    return dict(_state)
+
+
+def configure(enabled=False, memory=False, quiet=False):
+    """按state()的结果恢复设置（子进程中调用），并清空以fork方式启动时从父进程继承的记录和区间栈"""
+    reset()
+    _local.stack = []
+    if enabled:
+        enable(memory)
+    else:
+        disable()
+    set_quiet(quiet)
+
+
+class _NullSpan:
+    """未开启跟踪时使用的空区间"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def set_shape(self, data):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """一个计时区间，由span()创建"""
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.parent = None
+        self._peak_seen = 0
+
+    def set(self, **attrs):
+        """附加属性，如股票代码、是否命中缓存"""
+        self.attrs.update(attrs)
+
+    def set_shape(self, data):
+        """记录DataFrame或ndarray的行数和列数"""
+        shape = getattr(data, 'shape', None)
+        if shape is None:
+            return
+        self.attrs['rows'] = int(shape[0]) if len(shape) > 0 else 1
+        self.attrs['columns'] = int(shape[1]) if len(shape) > 1 else 1
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        self.path = (self.parent.path if self.parent else ()) + (self.name,)
+        self.child_time = 0.0
+        self.memory = _state['memory'] and tracemalloc.is_tracing()
+        if self.memory:
+            # tracemalloc只有一个全局峰值：进入子区间前先把目前的峰值记到父区间，再重置
+            current, peak = tracemalloc.get_traced_memory()
+            if self.parent is not None:
+                self.parent._peak_seen = max(self.parent._peak_seen, peak)
+            tracemalloc.reset_peak()
+            self._memory_start = current
+        stack.append(self)
+        self.start_wall = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+
+        record = {
+            'name': self.name,
+            'stack': ';'.join(self.path),
+            'start': self.start_wall,
+            'duration_ms': duration * 1000,
+            'self_ms': max(duration - self.child_time, 0.0) * 1000,
+            'pid': os.getpid(),
+            'thread': threading.current_thread().name
+        }
+        if self.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(self._peak_seen, peak)
+            record['alloc_net_kb'] = (current - self._memory_start) / 1024
+            record['alloc_peak_kb'] = (peak - self._memory_start) / 1024
+            if self.parent is not None:
+                self.parent._peak_seen = max(self.parent._peak_seen, peak)
+        if exc_type is not None:
+            record['error'] = f"{exc_type.__name__}: {exc}"
+        record.update(self.attrs)
+        if self.parent is not None:
+            self.parent.child_time += duration
+
+        with _records_lock:
+            _records.append(record)
+        return False
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def span(name, **attrs):
+    """
+    计时区间（with语句使用），未开启跟踪时返回空对象
+
+    参数:
+    name: 区间名称，通常为函数或阶段名
+    attrs: 附加属性，如symbol='600519'
+
+    返回:
+    Span: 可调用set()/set_shape()补充属性
+    """
+    if not _state['enabled']:
+        return _NULL_SPAN
+    return Span(name, dict(attrs))
+
+
+def traced(name=None):
+    """装饰器：把整个函数调用作为一个区间，返回值为DataFrame或ndarray时记录其行列数"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state['enabled']:
+                return func(*args, **kwargs)
+            with span(span_name) as sp:
+                result = func(*args, **kwargs)
+                sp.set_shape(result)
+                return result
+
+        return wrapper
+    return decorator
+
+
+def records():
+    """已记录的区间（副本）"""
+    with _records_lock:
+        return list(_records)
+
+
+def drain():
+    """取出并清空已记录的区间，用于把子进程的记录传回主进程"""
+    with _records_lock:
+        result = list(_records)
+        _records.clear()
+    return result
+
+
+def merge(new_records):
+    """合并其他进程的记录"""
+    with _records_lock:
+        _records.extend(new_records)
+
+
+def reset():
+    """清空已记录的区间"""
+    with _records_lock:
+        _records.clear()
+
+
+def export_jsonl(path, trace_records=None):
+    """每个区间写成一行JSON"""
+    trace_records = records() if trace_records is None else trace_records
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in trace_records:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+    return len(trace_records)
+
+
+def folded_stacks(trace_records=None):
+    """
+    折叠栈：{"父;子;孙": 自身耗时(微秒)}
+
+    每个区间只计自身耗时（扣除子区间），火焰图中父区间的宽度由其下所有行相加得到
+    """
+    trace_records = records() if trace_records is None else trace_records
+    folded = defaultdict(float)
+    for record in trace_records:
+        folded[record['stack']] += record['self_ms'] * 1000
+    return dict(folded)
+
+
+def export_folded(path, trace_records=None):
+    """按flamegraph.pl的折叠栈格式写出（"栈 权重"每行一条，权重为微秒）"""
+    folded = folded_stacks(trace_records)
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, micros in sorted(folded.items()):
+            # 折叠栈格式用空格分隔栈和权重，区间名中的空格替换掉
+            f.write(f"{stack.replace(' ', '_')} {max(int(round(micros)), 1)}\n")
+    return len(folded)
+
+
+def summary(trace_records=None):
+    """
+    按区间名称汇总
+
+    返回:
+    DataFrame: 调用次数、总耗时、自身耗时、平均和最大耗时、处理行数、峰值内存，按总耗时降序
+    """
+    trace_records = records() if trace_records is None else trace_records
+    if not trace_records:
+        return pd.DataFrame()
+    df = pd.DataFrame(trace_records)
+    for column in ['rows', 'alloc_peak_kb']:
+        if column not in df.columns:
+            df[column] = float('nan')
+    grouped = df.groupby('name')
+    table = pd.DataFrame({
+        '调用次数': grouped.size(),
+        '总耗时(s)': grouped['duration_ms'].sum() / 1000,
+        '自身耗时(s)': grouped['self_ms'].sum() / 1000,
+        '平均耗时(ms)': grouped['duration_ms'].mean(),
+        '最大耗时(ms)': grouped['duration_ms'].max(),
+        '处理行数': grouped['rows'].sum(min_count=1),
+        '峰值内存(MB)': grouped['alloc_peak_kb'].max() / 1024
+    })
+    return table.sort_values('总耗时(s)', ascending=False)
+
+
+def print_summary(trace_records=None):
+    """打印按区间名称的汇总"""
+    table = summary(trace_records)
+    if table.empty:
+        print("没有跟踪记录")
+        return table
+    print("\n⏱️ 耗时统计:")
+    print(table.to_string(float_format=lambda x: f"{x:.3f}"))
+    return table
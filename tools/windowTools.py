@@ -0,0 +1,55 @@
+import operator
+from collections import deque
+import numpy as np
+
+
+def rolling_max(values, window, min_periods=None):
+    """
+    滑动窗口最大值（单调队列，O(n)）
+
+    参数:
+    values: 一维数组
+    window: 窗口长度（包含当前值）
+    min_periods: 窗口内至少需要的数据个数，默认等于window，不足时输出NaN
+
+    返回:
+    ndarray: 与values等长的滑动最大值，空值不参与比较
+    """
+    return _rolling_extreme(values, window, min_periods, operator.ge)
+
+
+def rolling_min(values, window, min_periods=None):
+    """滑动窗口最小值（单调队列，O(n)），参数同rolling_max"""
+    return _rolling_extreme(values, window, min_periods, operator.le)
+
+
+def _rolling_extreme(values, window, min_periods, dominates):
+    values = np.asarray(values, dtype=float)
+    values_list = values.tolist()
+    if min_periods is None:
+        min_periods = window
+
+    result = np.full(len(values), np.nan)
+    candidates = deque()  # 保存下标，对应的值单调
+    valid_count = 0
+    valid = ~np.isnan(values)
+
+    for i, value in enumerate(values_list):
+        if valid[i]:
+            valid_count += 1
+            # 新值“支配”队尾时，队尾不可能再成为窗口极值
+            while candidates and dominates(value, values_list[candidates[-1]]):
+                candidates.pop()
+            candidates.append(i)
+
+        # 移出窗口外的下标
+        if i >= window:
+            if valid[i - window]:
+                valid_count -= 1
+            if candidates and candidates[0] <= i - window:
+                candidates.popleft()
+
+        if candidates and valid_count >= min_periods:
+            result[i] = values_list[candidates[0]]
+
+    return result